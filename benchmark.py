@@ -0,0 +1,379 @@
+"""
+LocalWhisper Offline Benchmark
+Headless, reproducible replay of a labelled audio corpus through the real pipeline:
+AudioEngine segmenter -> Transcriber -> (optional) IntelligenceEngine.
+
+Corpus layout: any directory tree of .wav/.flac files, each with a reference transcript
+next to it (same name, .txt). Files without a reference are still timed, but get no WER/CER.
+
+Run:
+  python benchmark.py path/to/corpus --out results.json
+  python benchmark.py path/to/corpus --device cpu --compute-type int8 --model small
+  python benchmark.py path/to/corpus --refine        # also time/score Ollama refinement
+
+No microphone is needed: audio is fed to the segmenter through an ArrayCapture.
+"""
+
+import sys
+import os
+
+# --- CUDA DLL FIX ---
+try:
+    venv_base = os.path.dirname(os.path.dirname(sys.executable))
+    nvidia_base = os.path.join(venv_base, "Lib", "site-packages", "nvidia")
+    for root, dirs, files in os.walk(nvidia_base):
+        for d in dirs:
+            if d == "bin" or d == "lib":
+                path = os.path.join(root, d)
+                os.environ["PATH"] += os.pathsep + path
+except Exception:
+    pass
+# --------------------
+
+import argparse
+import glob
+import json
+import platform
+import re
+import time
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+
+import config
+from core.settings import manager as settings
+
+AUDIO_EXTENSIONS = (".wav", ".flac")
+
+# Settings that change what the benchmark measures; recorded with every run.
+SETTINGS_PREFIXES = ("decode_", "voice_activation_", "vad_", "auto_language_", "conf_", "reject_", "llm_refine_")
+
+
+# --- Scoring ---
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation (keeping in-word apostrophes), collapse whitespace."""
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    t = t.replace("’", "'")
+    t = re.sub(r"[^\w\s']", " ", t)
+    t = re.sub(r"(?<!\w)'|'(?!\w)", " ", t)
+    return " ".join(t.split())
+
+
+def edit_distance(ref: list, hyp: list) -> int:
+    """Levenshtein distance between two token sequences."""
+    if not ref:
+        return len(hyp)
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1]
+
+
+def score(reference: str, hypothesis: str) -> dict:
+    ref = normalize_text(reference)
+    hyp = normalize_text(hypothesis)
+    ref_words, hyp_words = ref.split(), hyp.split()
+    word_edits = edit_distance(ref_words, hyp_words)
+    char_edits = edit_distance(list(ref), list(hyp))
+    return {
+        "word_edits": word_edits,
+        "ref_words": len(ref_words),
+        "char_edits": char_edits,
+        "ref_chars": len(ref),
+        "wer": round(word_edits / len(ref_words), 4) if ref_words else None,
+        "cer": round(char_edits / len(ref), 4) if ref else None,
+    }
+
+
+def corpus_rates(scores: list) -> dict:
+    """Corpus-level (micro-averaged) WER/CER: total edits over total reference length."""
+    words = sum(s["ref_words"] for s in scores)
+    chars = sum(s["ref_chars"] for s in scores)
+    return {
+        "wer": round(sum(s["word_edits"] for s in scores) / words, 4) if words else None,
+        "cer": round(sum(s["char_edits"] for s in scores) / chars, 4) if chars else None,
+        "files": len(scores),
+    }
+
+
+def percentiles(values: list) -> dict:
+    vals = [float(v) for v in values if v is not None]
+    if not vals:
+        return {"n": 0}
+    arr = np.asarray(vals, dtype=np.float64)
+    return {
+        "n": int(arr.size),
+        "mean": round(float(arr.mean()), 4),
+        "p50": round(float(np.percentile(arr, 50)), 4),
+        "p95": round(float(np.percentile(arr, 95)), 4),
+        "p99": round(float(np.percentile(arr, 99)), 4),
+        "max": round(float(arr.max()), 4),
+    }
+
+
+# --- Corpus ---
+
+def load_corpus(root: str, limit: int | None = None) -> list[dict]:
+    files = []
+    for ext in AUDIO_EXTENSIONS:
+        files.extend(glob.glob(os.path.join(root, "**", f"*{ext}"), recursive=True))
+    files = sorted(set(files))
+    if limit:
+        files = files[:limit]
+
+    items = []
+    for path in files:
+        ref_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(ref_path):
+            with open(ref_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+        items.append({"path": path, "name": os.path.relpath(path, root), "reference": reference})
+    return items
+
+
+def load_audio(path: str) -> np.ndarray:
+    # faster-whisper ships a PyAV-based decoder (wav/flac/...), resampled to mono 16 kHz.
+    from faster_whisper import decode_audio
+    return decode_audio(path, sampling_rate=config.SAMPLE_RATE).astype(np.float32, copy=False)
+
+
+# --- Replay ---
+
+def iter_segments(audio_engine, audio: np.ndarray, timing: dict):
+    """
+    Yields (audio, info) for each accepted segment of `audio`, as the live segmenter
+    would cut it. Wall time spent inside the segmenter is accumulated in timing["segmenter_s"].
+    """
+    from core.sources import ArrayCapture
+
+    capacity_s = float(settings.get("voice_activation_max_segment_s")) + 5.0
+    capture = ArrayCapture(audio, audio_engine.sample_rate, blocksize=512, capacity_s=capacity_s)
+    segments = audio_engine.stream_segments(capture=capture)
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                event = next(segments)
+            except StopIteration:
+                timing["segmenter_s"] += time.perf_counter() - t0
+                return
+            timing["segmenter_s"] += time.perf_counter() - t0
+            if event.kind == "discard":
+                timing["discarded"] += 1
+            elif event.kind == "end":
+                stats = event.stats or {}
+                sr = float(audio_engine.sample_rate)
+                yield event.audio, {
+                    "start_s": round(event.start_pos / sr, 3),
+                    "end_s": round(event.end_pos / sr, 3),
+                    # Algorithmic endpointing delay: last speech chunk -> segment closed.
+                    "endpoint_ms": round((event.end_pos - stats.get("last_speech_pos", event.end_pos)) / sr * 1000.0, 1),
+                }
+    finally:
+        segments.close()
+        capture.close()
+
+
+def run_file(item: dict, audio_engine, transcriber, intelligence, args) -> dict:
+    audio = load_audio(item["path"])
+    duration_s = len(audio) / float(config.SAMPLE_RATE)
+    lang_code = settings.get("transcription_language")
+    if lang_code == "auto":
+        lang_code = None
+
+    timing = {"segmenter_s": 0.0, "discarded": 0}
+    if args.whole_file:
+        source = iter([(audio, {"start_s": 0.0, "end_s": round(duration_s, 3), "endpoint_ms": None})])
+    else:
+        source = iter_segments(audio_engine, audio, timing)
+
+    segments = []
+    for seg_audio, info in source:
+        t0 = time.perf_counter()
+        raw_text = transcriber.transcribe(seg_audio, language=lang_code) or ""
+        transcribe_s = time.perf_counter() - t0
+        stats = dict(getattr(transcriber, "last_stats", {}) or {})
+
+        final_text = raw_text
+        refine_s = None
+        if intelligence is not None and raw_text:
+            t1 = time.perf_counter()
+            final_text = intelligence.refine_text(raw_text)
+            refine_s = time.perf_counter() - t1
+
+        audio_s = len(seg_audio) / float(config.SAMPLE_RATE)
+        segments.append({
+            **info,
+            "audio_s": round(audio_s, 3),
+            "transcribe_s": round(transcribe_s, 4),
+            "refine_s": None if refine_s is None else round(refine_s, 4),
+            "total_s": round(transcribe_s + (refine_s or 0.0) + (info["endpoint_ms"] or 0.0) / 1000.0, 4),
+            "rtf": round(transcribe_s / audio_s, 4) if audio_s else None,
+            "decode_passes": stats.get("decode_passes"),
+            "confidence": getattr(transcriber, "last_confidence", "unknown"),
+            "lang": stats.get("lang"),
+            "model": stats.get("model"),
+            "raw_text": raw_text,
+            "final_text": final_text,
+        })
+
+    hypothesis_raw = " ".join(s["raw_text"].strip() for s in segments if s["raw_text"].strip())
+    hypothesis_final = " ".join(s["final_text"].strip() for s in segments if s["final_text"].strip())
+    result = {
+        "file": item["name"],
+        "duration_s": round(duration_s, 3),
+        "segmenter_s": round(timing["segmenter_s"], 4),
+        "segments": segments,
+        "discarded_segments": timing["discarded"],
+        "reference": item["reference"],
+        "hypothesis": hypothesis_final,
+    }
+    if item["reference"] is not None:
+        result["score_raw"] = score(item["reference"], hypothesis_raw)
+        if intelligence is not None:
+            result["score_final"] = score(item["reference"], hypothesis_final)
+    return result
+
+
+def summarize(files: list[dict], refine: bool) -> dict:
+    segs = [s for f in files for s in f["segments"]]
+    audio_total = sum(f["duration_s"] for f in files)
+    processing_total = sum(f["segmenter_s"] for f in files) + sum(
+        s["transcribe_s"] + (s["refine_s"] or 0.0) for s in segs
+    )
+    passes = [s["decode_passes"] for s in segs if s["decode_passes"] is not None]
+    hist = {}
+    for p in passes:
+        hist[str(p)] = hist.get(str(p), 0) + 1
+
+    summary = {
+        "files": len(files),
+        "segments": len(segs),
+        "discarded_segments": sum(f["discarded_segments"] for f in files),
+        "audio_s": round(audio_total, 3),
+        "stages": {
+            "segmenter_s": percentiles([f["segmenter_s"] for f in files]),
+            "endpoint_ms": percentiles([s["endpoint_ms"] for s in segs]),
+            "transcribe_s": percentiles([s["transcribe_s"] for s in segs]),
+            "refine_s": percentiles([s["refine_s"] for s in segs]),
+            "total_s": percentiles([s["total_s"] for s in segs]),
+        },
+        # Processing time / audio time over the whole corpus (< 1.0 = faster than real time).
+        "rtf": round(processing_total / audio_total, 4) if audio_total else None,
+        "transcribe_rtf": percentiles([s["rtf"] for s in segs]),
+        "decode_passes": {**percentiles(passes), "histogram": hist},
+        "accuracy_raw": corpus_rates([f["score_raw"] for f in files if "score_raw" in f]),
+    }
+    if refine:
+        summary["accuracy_final"] = corpus_rates([f["score_final"] for f in files if "score_final" in f])
+    return summary
+
+
+def run_metadata(args) -> dict:
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "mode": "whole_file" if args.whole_file else "segmenter",
+        "refine": bool(args.refine),
+        "whisper_model": config.WHISPER_MODEL_SIZE,
+        "whisper_fast_model": getattr(config, "WHISPER_FAST_MODEL_SIZE", None),
+        "device": config.DEVICE,
+        "compute_type": config.COMPUTE_TYPE,
+        "num_workers": getattr(config, "WHISPER_NUM_WORKERS", 1),
+        "ollama_model": config.OLLAMA_MODEL if args.refine else None,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in sorted(settings.settings.items()) if k.startswith(SETTINGS_PREFIXES)},
+    }
+
+
+def print_summary(summary: dict):
+    print("\n" + "=" * 60)
+    print("BENCHMARK SUMMARY")
+    print("=" * 60)
+    print(f"Files: {summary['files']}  Segments: {summary['segments']}  Audio: {summary['audio_s']:.1f}s")
+    print("\n| Stage | p50 | p95 | p99 | n |")
+    print("|-------|-----|-----|-----|---|")
+    for name, p in summary["stages"].items():
+        if p.get("n"):
+            print(f"| {name} | {p['p50']:.3f} | {p['p95']:.3f} | {p['p99']:.3f} | {p['n']} |")
+    print(f"\nReal-time factor: {summary['rtf']}")
+    dp = summary["decode_passes"]
+    if dp.get("n"):
+        print(f"Decode passes/utterance: mean={dp['mean']:.2f} max={dp['max']:.0f} histogram={dp['histogram']}")
+    acc = summary["accuracy_raw"]
+    if acc["files"]:
+        print(f"WER (raw): {acc['wer']}  CER (raw): {acc['cer']}  ({acc['files']} referenced files)")
+    if "accuracy_final" in summary and summary["accuracy_final"]["files"]:
+        acc = summary["accuracy_final"]
+        print(f"WER (refined): {acc['wer']}  CER (refined): {acc['cer']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline LocalWhisper benchmark over a labelled audio corpus.")
+    parser.add_argument("corpus", help="Directory of .wav/.flac files with same-name .txt references")
+    parser.add_argument("--out", help="JSON output path (default: benchmark_results_<timestamp>.json)")
+    parser.add_argument("--refine", action="store_true", help="Run Ollama refinement on every transcript")
+    parser.add_argument("--whole-file", action="store_true", help="Skip the segmenter; transcribe each file as one utterance")
+    parser.add_argument("--model", help="Override config.WHISPER_MODEL_SIZE")
+    parser.add_argument("--device", help="Override config.DEVICE (cpu|cuda)")
+    parser.add_argument("--compute-type", help="Override config.COMPUTE_TYPE")
+    parser.add_argument("--limit", type=int, help="Only the first N files")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        config.WHISPER_MODEL_SIZE = args.model
+    if args.device:
+        config.DEVICE = args.device
+    if args.compute_type:
+        config.COMPUTE_TYPE = args.compute_type
+
+    corpus = load_corpus(args.corpus, args.limit)
+    if not corpus:
+        print(f"No {'/'.join(AUDIO_EXTENSIONS)} files under {args.corpus}")
+        return 2
+
+    print("=" * 60)
+    print("LocalWhisper Offline Benchmark")
+    print("=" * 60)
+    print(f"Corpus: {args.corpus} ({len(corpus)} files)")
+    print(f"Model: {config.WHISPER_MODEL_SIZE} on {config.DEVICE} ({config.COMPUTE_TYPE})")
+
+    from core.audio import AudioEngine
+    from core.transcriber import Transcriber
+
+    audio_engine = None if args.whole_file else AudioEngine()
+    transcriber = Transcriber()
+    transcriber.warmup()  # Keep one-time kernel/allocator init out of the first measurement.
+    intelligence = None
+    if args.refine:
+        from core.intelligence import IntelligenceEngine
+        intelligence = IntelligenceEngine()
+
+    files = []
+    for i, item in enumerate(corpus, 1):
+        result = run_file(item, audio_engine, transcriber, intelligence, args)
+        files.append(result)
+        wer = result.get("score_raw", {}).get("wer")
+        print(f"[{i}/{len(corpus)}] {item['name']}: {len(result['segments'])} seg, "
+              f"{sum(s['transcribe_s'] for s in result['segments']):.2f}s transcribe"
+              + (f", WER {wer:.3f}" if wer is not None else ""))
+
+    summary = summarize(files, args.refine)
+    print_summary(summary)
+
+    out = args.out or f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": run_metadata(args), "summary": summary, "files": files}, f, indent=2, ensure_ascii=False)
+    print(f"\nResults saved to: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
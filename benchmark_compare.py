@@ -0,0 +1,281 @@
+"""
+LocalWhisper Benchmark Comparison
+Compares benchmark result files and gates on regression budgets.
+
+The first file is the baseline; every further file is compared against it.
+Reads both benchmark.py output and the older benchmark_interactive.py result lists.
+
+Run:
+  python benchmark_compare.py base.json candidate.json
+  python benchmark_compare.py base.json candidate.json --budget transcribe_s.p95=+10% --budget wer=+0.01
+
+Budgets are "<metric>=+<limit>": a trailing % is relative to the baseline, otherwise the
+limit is absolute in the metric's unit (seconds, ms, passes, or WER/CER points).
+A budget fails only when the regression is larger than the limit AND statistically
+significant (the bootstrap confidence interval of the delta excludes zero).
+
+Exit codes: 0 = within budget, 1 = budget exceeded, 2 = bad input.
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+# Per-utterance samples (lower is better). Reported as <name>.<stat>.
+LATENCY_METRICS = ("total_s", "transcribe_s", "refine_s", "endpoint_ms", "decode_passes")
+# Per-file samples.
+FILE_METRICS = ("segmenter_s",)
+STATS = ("mean", "p50", "p95", "p99")
+# Corpus-level ratios: total edits / total reference length.
+ACCURACY_METRICS = {
+    "wer": ("score_raw", "word_edits", "ref_words"),
+    "cer": ("score_raw", "char_edits", "ref_chars"),
+    "wer_refined": ("score_final", "word_edits", "ref_words"),
+    "cer_refined": ("score_final", "char_edits", "ref_chars"),
+}
+
+
+# --- Loading ---
+
+def load_run(path: str) -> dict:
+    """
+    Normalizes a result file to {"path", "paired", "files": [{"name", "samples", "scores"}]}.
+    Each "file" is the bootstrap resampling unit (a corpus file, or one interactive cycle).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    files = []
+    if isinstance(data, dict) and "files" in data:
+        # benchmark.py
+        for fr in data["files"]:
+            samples = {m: [s.get(m) for s in fr.get("segments", []) if s.get(m) is not None] for m in LATENCY_METRICS}
+            for m in FILE_METRICS:
+                samples[m] = [fr[m]] if fr.get(m) is not None else []
+            scores = {k: fr[k] for k in ("score_raw", "score_final") if k in fr}
+            files.append({"name": fr.get("file"), "samples": samples, "scores": scores})
+        return {"path": path, "paired": True, "files": files}
+
+    if isinstance(data, list):
+        # benchmark_interactive.py: one entry per recorded cycle, no references.
+        for r in data:
+            w = r.get("whisper_only", {}) or {}
+            o = r.get("whisper_plus_ollama", {}) or {}
+            samples = {
+                "transcribe_s": [w["time_s"]] if w.get("time_s") is not None else [],
+                "refine_s": [o["ollama_time_s"]] if o.get("ollama_time_s") is not None else [],
+                "total_s": [o["total_time_s"]] if o.get("total_time_s") is not None else [],
+            }
+            files.append({"name": None, "samples": samples, "scores": {}})
+        return {"path": path, "paired": False, "files": files}
+
+    raise ValueError(f"{path}: unrecognised benchmark result format")
+
+
+# --- Statistics ---
+
+def _stat(values: np.ndarray, stat: str) -> float:
+    if values.size == 0:
+        return float("nan")
+    if stat == "mean":
+        return float(values.mean())
+    return float(np.percentile(values, float(stat[1:])))
+
+
+def metric_value(files: list[dict], key: str) -> float:
+    if key in ACCURACY_METRICS:
+        score_key, num, den = ACCURACY_METRICS[key]
+        scored = [f["scores"][score_key] for f in files if score_key in f["scores"]]
+        total = sum(s[den] for s in scored)
+        return sum(s[num] for s in scored) / total if total else float("nan")
+    name, stat = key.rsplit(".", 1)
+    values = [v for f in files for v in f["samples"].get(name, [])]
+    return _stat(np.asarray(values, dtype=np.float64), stat)
+
+
+def available_metrics(base: dict, cand: dict) -> list[str]:
+    keys = []
+    for name in LATENCY_METRICS + FILE_METRICS:
+        if any(f["samples"].get(name) for f in base["files"]) and any(f["samples"].get(name) for f in cand["files"]):
+            keys.extend(f"{name}.{s}" for s in STATS)
+    for key, (score_key, _, _) in ACCURACY_METRICS.items():
+        if any(score_key in f["scores"] for f in base["files"]) and any(score_key in f["scores"] for f in cand["files"]):
+            keys.append(key)
+    return keys
+
+
+def bootstrap_delta(base: dict, cand: dict, key: str, iterations: int, alpha: float, rng) -> dict:
+    """
+    Cluster bootstrap over files (utterances of one file stay together).
+    When both runs cover the same named files the resampling is paired, which removes
+    per-file difficulty from the variance and makes small regressions detectable.
+    """
+    b_files, c_files = base["files"], cand["files"]
+    b_val = metric_value(b_files, key)
+    c_val = metric_value(c_files, key)
+
+    paired = False
+    if base["paired"] and cand["paired"]:
+        b_map = {f["name"]: f for f in b_files}
+        c_map = {f["name"]: f for f in c_files}
+        common = sorted(set(b_map) & set(c_map))
+        if common and len(common) >= 0.9 * max(len(b_map), len(c_map)):
+            paired = True
+            b_files = [b_map[n] for n in common]
+            c_files = [c_map[n] for n in common]
+
+    deltas = []
+    for _ in range(iterations):
+        if paired:
+            idx = rng.integers(0, len(b_files), size=len(b_files))
+            b_idx = c_idx = idx
+        else:
+            b_idx = rng.integers(0, len(b_files), size=len(b_files))
+            c_idx = rng.integers(0, len(c_files), size=len(c_files))
+        d = metric_value([c_files[i] for i in c_idx], key) - metric_value([b_files[i] for i in b_idx], key)
+        if np.isfinite(d):
+            deltas.append(d)
+
+    delta = c_val - b_val
+    lo = hi = float("nan")
+    if deltas:
+        lo, hi = np.percentile(np.asarray(deltas), [100.0 * alpha / 2.0, 100.0 * (1.0 - alpha / 2.0)])
+    if lo > 0:
+        verdict = "regression"
+    elif hi < 0:
+        verdict = "improvement"
+    else:
+        verdict = "no change"
+    return {
+        "metric": key,
+        "baseline": b_val,
+        "candidate": c_val,
+        "delta": delta,
+        "delta_pct": (100.0 * delta / b_val) if b_val else None,
+        "ci_low": float(lo),
+        "ci_high": float(hi),
+        "paired": paired,
+        "verdict": verdict,
+    }
+
+
+# --- Budgets ---
+
+def parse_budget(spec: str) -> tuple[str, float, bool]:
+    """'transcribe_s.p95=+10%' -> ('transcribe_s.p95', 10.0, True)"""
+    if "=" not in spec:
+        raise ValueError(f"budget {spec!r} must look like metric=+10% or metric=+0.05")
+    key, limit = spec.split("=", 1)
+    limit = limit.strip()
+    relative = limit.endswith("%")
+    value = float(limit.rstrip("%").lstrip("+"))
+    return key.strip(), value, relative
+
+
+def check_budget(row: dict, limit: float, relative: bool) -> bool:
+    """True when the budget is exceeded."""
+    if row["verdict"] != "regression":
+        return False
+    if relative:
+        return row["delta_pct"] is not None and row["delta_pct"] > limit
+    return row["delta"] > limit
+
+
+# --- Output ---
+
+def _fmt(v) -> str:
+    if v is None or (isinstance(v, float) and not np.isfinite(v)):
+        return "n/a"
+    return f"{v:.4f}" if abs(v) < 10 else f"{v:.1f}"
+
+
+def print_comparison(base_path: str, cand_path: str, rows: list[dict], alpha: float):
+    print("\n" + "=" * 60)
+    print(f"BASELINE : {base_path}")
+    print(f"CANDIDATE: {cand_path}")
+    print("=" * 60)
+    ci = int(round(100 * (1 - alpha)))
+    print(f"\n| Metric | Baseline | Candidate | Delta | Delta % | {ci}% CI | Verdict | Budget |")
+    print("|--------|----------|-----------|-------|---------|--------|---------|--------|")
+    for r in rows:
+        pct = "n/a" if r["delta_pct"] is None else f"{r['delta_pct']:+.1f}%"
+        budget = r.get("budget_status", "")
+        print(
+            f"| {r['metric']} | {_fmt(r['baseline'])} | {_fmt(r['candidate'])} | {r['delta']:+.4f} | {pct} | "
+            f"[{_fmt(r['ci_low'])}, {_fmt(r['ci_high'])}] | {r['verdict']} | {budget} |"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results and gate on regression budgets.")
+    parser.add_argument("results", nargs="+", help="Baseline result file followed by one or more candidates")
+    parser.add_argument("--budget", action="append", default=[], help="e.g. transcribe_s.p95=+10%% or wer=+0.01 (repeatable)")
+    parser.add_argument("--alpha", type=float, default=0.05, help="Significance level (default 0.05 -> 95%% CI)")
+    parser.add_argument("--iterations", type=int, default=2000, help="Bootstrap resamples (default 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="RNG seed, for reproducible intervals")
+    parser.add_argument("--json", help="Also write the comparison to this JSON file")
+    args = parser.parse_args(argv)
+
+    if len(args.results) < 2:
+        print("Need a baseline and at least one candidate result file.")
+        return 2
+    try:
+        budgets = [parse_budget(b) for b in args.budget]
+        runs = [load_run(p) for p in args.results]
+    except Exception as e:
+        print(f"Error: {e}")
+        return 2
+
+    rng = np.random.default_rng(args.seed)
+    base = runs[0]
+    exceeded = []
+    missing = []
+    report = []
+    for cand in runs[1:]:
+        keys = available_metrics(base, cand)
+        for key, _, _ in budgets:
+            if key not in keys:
+                missing.append((cand["path"], key))
+        rows = [bootstrap_delta(base, cand, k, args.iterations, args.alpha, rng) for k in keys]
+        for row in rows:
+            for key, limit, relative in budgets:
+                if key != row["metric"]:
+                    continue
+                over = check_budget(row, limit, relative)
+                row["budget"] = f"+{limit:g}{'%' if relative else ''}"
+                row["budget_status"] = f"FAIL ({row['budget']})" if over else f"ok ({row['budget']})"
+                if over:
+                    exceeded.append((cand["path"], row))
+        print_comparison(base["path"], cand["path"], rows, args.alpha)
+        report.append({"baseline": base["path"], "candidate": cand["path"], "metrics": rows})
+
+    regressions = [(c["candidate"], r["metric"]) for c in report for r in c["metrics"] if r["verdict"] == "regression"]
+    if regressions:
+        print("\nSignificant regressions:")
+        for path, metric in regressions:
+            print(f"  {path}: {metric}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"alpha": args.alpha, "iterations": args.iterations, "comparisons": report}, f, indent=2)
+
+    if missing:
+        # A budget that cannot be checked must not pass silently (e.g. a typo like transcribe_s.p59).
+        print("\nBUDGET METRIC MISSING:")
+        for path, key in missing:
+            print(f"  {key!r} not present in both {base['path']} and {path}")
+        return 2
+    if exceeded:
+        print("\nBUDGET EXCEEDED:")
+        for path, row in exceeded:
+            pct = "" if row["delta_pct"] is None else f" ({row['delta_pct']:+.1f}%)"
+            print(f"  {path}: {row['metric']} {row['delta']:+.4f}{pct} > {row['budget']}")
+        return 1
+    print("\nAll budgets OK." if budgets else "\nNo budgets configured.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
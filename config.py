@@ -15,6 +15,14 @@ WHISPER_MODEL_SIZE = "large-v3-turbo"
 # "float16" for GPU (requires VRAM), "int8" for efficiency if needed
 COMPUTE_TYPE = "float16" # Optimized for semantic correctness on modern GPUs
 DEVICE = "cuda" # or "cpu"
+# Parallel decodes on one loaded model (CTranslate2 workers). 1 = strictly serial decoding.
+# 2 lets the FR/EN disambiguation candidates (auto_language_parallel_decode) run side by
+# side, at the cost of a second set of worker threads and decode buffers (more RAM/VRAM).
+WHISPER_NUM_WORKERS = 1
+# Optional cascade: a small model handles every utterance first and audio is only
+# re-decoded on WHISPER_MODEL_SIZE when the fast result is not confidently clean.
+# Both stay loaded. None disables the cascade. e.g. "base", "small", "distil-small.en"
+WHISPER_FAST_MODEL_SIZE = None
 
 # Ollama Settings
 USE_INTELLIGENCE = True # Set to True to enable Grammar Fixing (Mistral/Llama)
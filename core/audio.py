@@ -1,23 +1,72 @@
-import sounddevice as sd
 import numpy as np
-import onnxruntime
 import config
 import threading
 import time
 import os
-import requests
-import math
 from core.settings import manager as settings
 from core.logger import log
 from core.mmcss import get_mmcss_manager
 from core.cpu_affinity import disable_power_throttling
+from core.capture import CaptureStream, sd
+from core.sources import FedCapture, open_source
+from core.noise_floor import NoiseFloorStore
+from core.segmenter import SegmentEvent, VoiceSegmenter, load_gate_params
+from core.vad import VadService, VadStream, create_vad_session, download_vad_model, open_vad_runtime, vad_model_path
+
+class ListenMeter:
+    """Wall time, CPU time and wake-ups of the listen loop, per mode ("active" / "low_power")."""
+    MODES = ("active", "low_power")
+
+    def __init__(self):
+        self.mode = "stopped"
+        self.transitions = 0
+        self.totals = {m: {"wall_s": 0.0, "thread_cpu_s": 0.0, "process_cpu_s": 0.0, "wakeups": 0} for m in self.MODES}
+        self._stamp = None
+
+    def start(self, mode: str):
+        self.mode = mode
+        self._stamp = (time.perf_counter(), time.thread_time(), time.process_time())
+
+    def tick(self, mode: str):
+        """Charges the time since the last tick to the mode the loop was in, then switches to `mode`."""
+        now = (time.perf_counter(), time.thread_time(), time.process_time())
+        if self._stamp is not None and self.mode in self.totals:
+            t = self.totals[self.mode]
+            t["wall_s"] += now[0] - self._stamp[0]
+            t["thread_cpu_s"] += now[1] - self._stamp[1]
+            t["process_cpu_s"] += now[2] - self._stamp[2]
+            t["wakeups"] += 1
+            if mode != self.mode:
+                self.transitions += 1
+        self.mode = mode
+        self._stamp = now
+
+    def stop(self):
+        if self._stamp is not None:
+            self.tick(self.mode)
+        self.mode = "stopped"
+        self._stamp = None
+
+    def stats(self) -> dict:
+        out = {"mode": self.mode, "transitions": self.transitions}
+        for m, t in self.totals.items():
+            wall = t["wall_s"]
+            out[f"{m}_s"] = round(wall, 1)
+            # Thread = the listen loop itself; process includes the capture callback and idle model threads.
+            out[f"{m}_thread_cpu_pct"] = round(100.0 * t["thread_cpu_s"] / wall, 3) if wall else None
+            out[f"{m}_process_cpu_pct"] = round(100.0 * t["process_cpu_s"] / wall, 3) if wall else None
+            out[f"{m}_wakeups_per_s"] = round(t["wakeups"] / wall, 1) if wall else None
+        return out
+
 
 class AudioEngine:
     def __init__(self):
         self.sample_rate = config.SAMPLE_RATE
         if self.sample_rate != 16000:
             log(f"Silero VAD ONNX is tuned for 16kHz; current SAMPLE_RATE={self.sample_rate}.", "warning")
-        self.vad_model_path = os.path.join(config.BASE_DIR, "silero_vad.onnx")
+        # "v4", "v5" or a path; the backend is picked from the model's inputs, not this name.
+        self.vad_model_spec = str(settings.get("vad_model") or "v4")
+        self.vad_model_path = vad_model_path(self.vad_model_spec, config.BASE_DIR)
         self.download_vad_if_needed()
         self._running = False
         
@@ -25,87 +74,185 @@ class AudioEngine:
         self._metering = False
         self._current_vol = 0.0
         self._current_speech_prob = 0.0
-        self._meter_stream = None
-        self._meter_h = None
-        self._meter_c = None
-        
+        self._meter_thread = None
+        self._meter_reader = None
+
+        # One long-lived capture stream per device; metering, voice activation and PTT
+        # are independent readers of its ring buffer (no per-utterance device open/close).
+        self._capture = None
+        self._capture_lock = threading.Lock()
+
         # Shared Amplitude for UI Visuals (0.0 - 1.0 approx)
         self.current_amplitude = 0.0
 
+        # Reader of the running stream_segments loop, so stop_recording() can wake it at once
+        self._segment_reader = None
+
+        # Push-to-talk hold in progress: (capture, start_pos, press_time) or None
+        self._hold = None
+
         # Voice-activation state (cooldown)
         self._next_allowed_start_time = 0.0
+        self._listen_meter = ListenMeter()
 
-        # Serialize VAD inference across threads (metering vs recording)
-        self._vad_lock = threading.Lock()
-        self._meter_was_running = False
-        
-        # Force CPU for VAD
+        # Noise floor per input device, kept across segments and (if enabled) restarts.
+        persist = bool(settings.get("noise_floor_persist"))
+        self.noise_floors = NoiseFloorStore(
+            os.path.join(config.BASE_DIR, "noise_floor.json") if persist else None,
+            initial_db=VoiceSegmenter.NOISE_FLOOR_INIT_DB,
+        )
+
+        # Force CPU for VAD (single-threaded, optimized graph cached next to the model)
+        vad_threads = int(settings.get("vad_threads") or 1)
         try:
-            self.vad_session = onnxruntime.InferenceSession(self.vad_model_path, providers=['CPUExecutionProvider'])
+            self.vad_session = create_vad_session(self.vad_model_path, threads=vad_threads)
         except Exception as e:
             log(f"Error loading VAD model: {e}", "error")
             self.download_vad_if_needed()
-            self.vad_session = onnxruntime.InferenceSession(self.vad_model_path, providers=['CPUExecutionProvider'])
+            self.vad_session = create_vad_session(self.vad_model_path, threads=vad_threads)
+        self.vad_runtime = open_vad_runtime(self.vad_session, self.sample_rate)
+        log(f"VAD: Silero {self.vad_runtime.version} ({os.path.basename(self.vad_model_path)})", "info")
+
+        # One batched VAD service shared by every consumer (segmenter, metering, replay sources);
+        # each keeps its own VadStream state.
+        self.vad = VadService(
+            self.vad_runtime,
+            self.sample_rate,
+            max_batch=int(settings.get("vad_max_batch")),
+            max_wait_ms=float(settings.get("vad_batch_wait_ms")),
+        )
             
     def get_devices(self):
         return sd.query_devices()
 
-    # --- Optimised Metering ---
-    def start_metering(self):
-        """Starts a background thread/stream for volume metering."""
-        if self._metering: return
-        self._metering = True
-
-        def meter_callback(indata, frames, time, status):
-            if status:
-                print(status)
-            vol = np.sqrt(np.mean(indata**2))
-            self._current_vol = vol * 50 # Scale up for Settings Dialog
-            self.current_amplitude = min(1.0, vol * 10) # Normalized roughly for Visuals
-
+    # --- Shared Capture ---
+    def _ensure_capture(self, min_capacity_s: float = 0.0) -> CaptureStream:
+        """
+        Returns the persistent capture stream for the configured input device.
+        Re-opens only when the device changes, the stream died, or a longer ring is needed.
+        """
+        spec = str(settings.get("input_source") or "device")
+        device_idx = settings.get("input_device_index")
+        with self._capture_lock:
+            cap = self._capture
+            if cap is not None and cap.exhausted and getattr(cap, "spec", None) == spec:
+                # A replayed file/stdin source is played once; keep handing out the finished stream.
+                return cap
+            needs_open = (
+                cap is None
+                or not cap.healthy
+                or getattr(cap, "spec", "device") != spec
+                or (spec == "device" and cap.device != device_idx)
+                or cap.ring.capacity < int(min_capacity_s * self.sample_rate)
+            )
+            if needs_open:
+                if cap is not None:
+                    try:
+                        cap.close()
+                    except Exception:
+                        pass
+                capacity_s = max(min_capacity_s, self._default_capture_capacity_s())
+                cap = open_source(
+                    spec,
+                    self.sample_rate,
+                    device=device_idx,
+                    blocksize=512,
+                    capacity_s=capacity_s,
+                    realtime=bool(settings.get("input_source_realtime")),
+                )
+                cap.spec = spec
+                cap.start()
+                self._capture = cap
+                log(f"Capture stream opened (source={spec}, device={device_idx}, ring={capacity_s:.1f}s).", "info")
+            return cap
+
+    @property
+    def input_exhausted(self) -> bool:
+        """True once a replayed (file/stdin) input source has been fully consumed."""
+        cap = self._capture
+        return bool(cap is not None and cap.exhausted)
+
+    def _default_capture_capacity_s(self) -> float:
+        # Enough for the longest voice-activation segment plus pre-roll and slack.
+        try:
+            max_segment_s = float(settings.get("voice_activation_max_segment_s"))
+            pre_roll_s = float(settings.get("voice_activation_pre_roll_ms")) / 1000.0
+        except Exception:
+            max_segment_s, pre_roll_s = 60.0, 0.55
+        return max_segment_s + pre_roll_s + 2.0
+
+    def close(self):
+        """Stops all consumers and releases the input device."""
+        self._running = False
+        self.stop_metering()
+        self.noise_floors.save(force=True)
+        with self._capture_lock:
+            cap, self._capture = self._capture, None
+        if cap is not None:
             try:
-                # Estimate VAD speech probability for calibration in Settings UI.
-                # Uses a separate Silero state than the recording path.
-                if self._meter_h is None or self._meter_c is None:
-                    self._meter_h = np.zeros((2, 1, 64), dtype=np.float32)
-                    self._meter_c = np.zeros((2, 1, 64), dtype=np.float32)
-
-                chunk = indata.reshape(-1).astype(np.float32)
-                speech_prob, self._meter_h, self._meter_c = self._vad_iterator(chunk, self._meter_h, self._meter_c)
-                self._current_speech_prob = float(speech_prob)
+                cap.close()
             except Exception:
-                # Never let UI metering crash audio callback.
                 pass
 
+    # --- Optimised Metering ---
+    def start_metering(self):
+        """Starts a metering consumer on the shared capture stream."""
+        if self._metering: return
+
         try:
-            device_idx = settings.get("input_device_index")
-            # We use a persistent stream instead of opening/closing
-            self._meter_stream = sd.InputStream(
-                callback=meter_callback,
-                channels=1,
-                samplerate=self.sample_rate,
-                device=device_idx,
-                blocksize=512,
-                dtype="float32",
-            )
-            self._meter_stream.start()
-            log("Metering started.", "info")
+            self._meter_reader = self._ensure_capture().reader()
         except Exception as e:
             log(f"Metering Error: {e}", "error")
-            self._metering = False
+            return
+
+        self._metering = True
+
+        def meter_loop():
+            # Uses a separate Silero state than the recording path.
+            vad_stream = self.vad.new_stream("meter")
+            while self._metering:
+                reader = self._meter_reader
+                if reader is None:
+                    break
+                _, data = reader.read(512, timeout=0.5)
+                if data is None:
+                    # Follow the shared stream if it was re-opened (device change / unplug).
+                    if self._metering and not reader._capture.healthy:
+                        try:
+                            self._meter_reader = self._ensure_capture().reader()
+                            reader.close()
+                        except Exception:
+                            time.sleep(0.5)
+                    continue
+                vol = float(np.sqrt(np.mean(data * data)))
+                self._current_vol = vol * 50 # Scale up for Settings Dialog
+                self.current_amplitude = min(1.0, vol * 10) # Normalized roughly for Visuals
+
+                try:
+                    # Estimate VAD speech probability for calibration in Settings UI.
+                    self._current_speech_prob = self.vad.infer(vad_stream, data)
+                except Exception:
+                    # Never let UI metering crash the meter loop.
+                    pass
+
+        self._meter_thread = threading.Thread(target=meter_loop, daemon=True)
+        self._meter_thread.start()
+        log("Metering started.", "info")
 
     def stop_metering(self):
-        """Stops the metering stream."""
-        if self._meter_stream:
-            self._meter_stream.stop()
-            self._meter_stream.close()
-            self._meter_stream = None
+        """Stops the metering consumer (the capture stream stays open)."""
+        was_metering = self._metering
         self._metering = False
+        if self._meter_reader is not None:
+            self._meter_reader.close()
+            self._meter_reader = None
+        if self._meter_thread is not None:
+            self._meter_thread.join(timeout=1.0)
+            self._meter_thread = None
         self._current_vol = 0.0
         self._current_speech_prob = 0.0
-        self._meter_h = None
-        self._meter_c = None
-        log("Metering stopped.", "info")
+        if was_metering:
+            log("Metering stopped.", "info")
 
     def get_current_volume(self):
         """Returns the cached volume level (Instant)."""
@@ -117,63 +264,94 @@ class AudioEngine:
     # --------------------------
 
     def download_vad_if_needed(self):
-        if not os.path.exists(self.vad_model_path) or os.path.getsize(self.vad_model_path) < 1000000:
-            # Silero VAD v4 (v5 has different API structure - needs migration)
-            url = "https://github.com/snakers4/silero-vad/raw/v4.0/files/silero_vad.onnx"
-            try:
-                headers = {'User-Agent': 'Mozilla/5.0'}
-                r = requests.get(url, headers=headers, allow_redirects=True, timeout=10)
-                if r.status_code == 200 and len(r.content) > 1000000:
-                    with open(self.vad_model_path, 'wb') as f:
-                        f.write(r.content)
-            except Exception:
-                pass
+        # Silero v4 / v5 by name (see core.vad.VAD_MODELS); custom paths are never downloaded.
+        download_vad_model(self.vad_model_spec, self.vad_model_path)
+
+    def _vad_iterator(self, audio_chunk, stream: VadStream | None = None):
+        """One-off VAD call for any model version: returns (prob, stream); pass the stream back in to continue."""
+        if stream is None:
+            stream = self.vad.new_stream()
+        prob = self.vad.infer(stream, audio_chunk)
+        return prob, stream
+
+    def get_vad_stats(self) -> dict:
+        return self.vad.stats()
+
+    def get_noise_floor_stats(self) -> dict:
+        """Per-device noise floor (dBFS) and its convergence state."""
+        return self.noise_floors.stats()
+
+    def _noise_key(self, capture: CaptureStream) -> str | None:
+        """Stable per-device key (host API + device name, not the index, which changes with hot-plugging)."""
+        if isinstance(capture, FedCapture):
+            return None  # Replayed audio must not teach (or be calibrated by) the microphone's floor.
+        try:
+            dev = capture.device if capture.device is not None else sd.default.device[0]
+            info = sd.query_devices(dev)
+            hostapi = sd.query_hostapis(info["hostapi"])["name"]
+            return f"{hostapi}: {info['name']}"
+        except Exception:
+            return f"device:{capture.device}"
 
-    def _vad_iterator(self, audio_chunk, h, c):
-        input_data = audio_chunk[np.newaxis, :].astype(np.float32)
-        sr_data = np.array(self.sample_rate, dtype=np.int64)
-        
-        ort_inputs = {
-            self.vad_session.get_inputs()[0].name: input_data,
-            self.vad_session.get_inputs()[1].name: sr_data,
-            self.vad_session.get_inputs()[2].name: h,
-            self.vad_session.get_inputs()[3].name: c
-        }
-        with self._vad_lock:
-            ort_outs = self.vad_session.run(None, ort_inputs)
-        out, h, c = ort_outs
-        return out[0][0], h, c
+    def get_idle_stats(self) -> dict:
+        """CPU % and wake-ups/s of the voice-activation loop, split into active and low-power idle."""
+        return self._listen_meter.stats()
 
     def stop_recording(self):
+        """Ends stream_segments/listen_single_segment immediately (the blocked read is interrupted)."""
         self._running = False
-
-    def _pause_metering_if_needed(self):
-        if self._metering and self._meter_stream:
-            try:
-                self._meter_stream.stop()
-                self._meter_was_running = True
-            except Exception:
-                self._meter_was_running = False
-        else:
-            self._meter_was_running = False
-
-    def _resume_metering_if_needed(self):
-        if self._meter_was_running and self._meter_stream:
-            try:
-                self._meter_stream.start()
-            except Exception:
-                pass
-        self._meter_was_running = False
-
-    @staticmethod
-    def _rms_dbfs(samples: np.ndarray) -> float:
-        # dB relative to full-scale for float audio in [-1..1].
-        rms = float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
-        return 20.0 * math.log10(max(rms, 1e-8))
-
-    def listen_single_segment(self):
+        reader = self._segment_reader
+        if reader is not None:
+            reader.interrupt()
+
+    def _load_gate_params(self, chunk_size: int) -> dict:
+        """Snapshot of the voice-activation tuning (read once per segment so Settings changes apply live)."""
+        params = load_gate_params(self.sample_rate, chunk_size)
+        # Idle VAD window must be a length the loaded model accepts (v5: one chunk only).
+        window = params["vad_idle_window"]
+        supported = [n for n in self.vad_runtime.chunk_sizes if chunk_size <= n <= window]
+        if window not in supported:
+            fallback = max(supported, default=chunk_size)
+            if getattr(self, "_warned_idle_window", None) != window:
+                log(f"vad_idle_window={window} not supported by Silero {self.vad_runtime.version}; using {fallback}.", "warning")
+                self._warned_idle_window = window
+            params["vad_idle_window"] = fallback
+        return params
+
+    def make_segmenter(self, chunk_size: int = 512, noise=None) -> VoiceSegmenter:
+        """A VoiceSegmenter wired to this engine's Silero session and current settings."""
+        def vad(chunk, stream):
+            return self.vad.infer(stream, chunk), stream
+
+        def vad_reset():
+            return self.vad.new_stream("segmenter")
+
+        return VoiceSegmenter(self._load_gate_params(chunk_size), vad, vad_reset, self.sample_rate, chunk_size, noise=noise)
+
+    def stream_segments(self, capture: CaptureStream | None = None):
+        """
+        Continuous voice-activation segmenter over the shared capture stream.
+
+        Yields SegmentEvent objects:
+          start   - trigger confirmed; `audio` = pre-roll + confirm chunks so far
+          chunk   - one more chunk of the open segment
+          end     - end-of-speech; `audio` = the whole utterance (owned copy)
+          discard - the open segment was rejected (too short / too little speech)
+
+        `start`/`chunk` audio are zero-copy views into the capture ring: copy them if they
+        must outlive the next few seconds. Timestamps are time.monotonic() capture times.
+        Runs until stop_recording() is called or the consumer closes the generator.
+
+        `capture` replaces the shared device stream (e.g. an ArrayCapture for offline
+        replay); the generator then also ends when that source is exhausted.
+
+        Armed when called, not at the first next(): a stop_recording() issued any time after
+        this returns ends the loop, even before the generator body has started.
+        """
         self._running = True
+        return self._segment_events(capture)
 
+    def _segment_events(self, capture: CaptureStream | None):
         # CPU optimizations for real-time audio on hybrid CPUs (i9-14900K)
         mmcss_registered = False
         try:
@@ -187,175 +365,196 @@ class AudioEngine:
             log(f"Silero VAD expects 512 samples at 16kHz; overriding BLOCK_SIZE={CHUNK_SIZE} -> 512.", "warning")
             CHUNK_SIZE = 512
 
-        threshold = float(settings.get("vad_threshold"))
-        silence_dur = settings.get("silence_duration")
-        device_idx = settings.get("input_device_index") 
-
-        start_confirm_ms = int(settings.get("voice_activation_start_confirm_ms"))
-        hangover_ms = int(settings.get("voice_activation_hangover_ms"))
-        cooldown_ms = int(settings.get("voice_activation_cooldown_ms"))
-        pre_roll_ms = int(settings.get("voice_activation_pre_roll_ms"))
-        min_segment_ms = int(settings.get("voice_activation_min_segment_ms"))
-        min_speech_ms = int(settings.get("voice_activation_min_speech_ms"))
-        max_segment_s = float(settings.get("voice_activation_max_segment_s"))
-        start_speech_prob = float(settings.get("voice_activation_start_speech_prob"))
-        stop_speech_prob = float(settings.get("voice_activation_stop_speech_prob"))
-        start_db_margin = float(settings.get("voice_activation_start_db_margin"))
-        stop_db_margin = float(settings.get("voice_activation_stop_db_margin"))
-        noise_update_speech_prob = float(settings.get("voice_activation_noise_update_speech_prob"))
-        noise_ema_alpha = float(settings.get("voice_activation_noise_ema_alpha"))
-
-        # Backwards-compatible: allow the legacy single threshold to still affect gating.
-        start_speech_prob = max(start_speech_prob, threshold)
-        stop_speech_prob = min(stop_speech_prob, start_speech_prob - 0.08) if stop_speech_prob >= start_speech_prob else stop_speech_prob
-
-        chunk_ms = (CHUNK_SIZE / self.sample_rate) * 1000.0
-        start_confirm_chunks = max(1, int(math.ceil(start_confirm_ms / chunk_ms)))
-
-        h = np.zeros((2, 1, 64), dtype=np.float32)
-        c = np.zeros((2, 1, 64), dtype=np.float32)
-
-        triggered = False
-        temp_buffer = []
-        ring_buffer = [] 
-        ring_buffer_size = max(1, int(math.ceil(pre_roll_ms / chunk_ms)))
-
-        # Adaptive noise floor (dBFS)
-        # Updates only while ARMED (not recording) and not in a start-candidate streak.
-        noise_floor_db = -55.0
-        noise_floor_db = float(max(-80.0, min(-20.0, noise_floor_db)))
-        start_candidate_count = 0
-        speech_ms = 0.0
-        trigger_start_time = 0.0
-        last_speech_time = 0.0
-        max_speech_prob = 0.0
-        max_rms_db = -120.0
-
         now = time.time()
-        if now < self._next_allowed_start_time:
+        if capture is None and now < self._next_allowed_start_time:
             time.sleep(max(0.0, self._next_allowed_start_time - now))
 
+        reader = None
         try:
-            self._pause_metering_if_needed()
-            with sd.InputStream(
-                samplerate=self.sample_rate,
-                device=device_idx,
-                channels=1,
-                blocksize=CHUNK_SIZE,
-                dtype="float32",
-            ) as stream:
-                while self._running:
-                    data, overflowed = stream.read(CHUNK_SIZE)
-                    data = data.flatten()
-
-                    # RMS Gating (Optimization)
-                    # If energy is very low, skip expensive VAD inference
-                    rms_db = self._rms_dbfs(data)
-                    max_rms_db = max(max_rms_db, float(rms_db))
-                    
-                    # Update Shared Amplitude for UI
-                    # Convert dBFS roughly back to linear 0-1 range for visualizer
-                    # -60dB -> 0.0, -0dB -> 1.0
-                    lin_amp = max(0.0, (rms_db + 60) / 60)
-                    self.current_amplitude = lin_amp 
-                    
-                    # Heuristic: If we are not in a trigger candidate sequence, and energy is way below floor, skip VAD.
-                    # We need a margin below noise floor where we are "sure" it's silence.
-                    # noise_floor_db is adaptive, but let's use a hard safety floor too.
-                    skip_vad = False
-                    if start_candidate_count == 0 and not triggered:
-                        # If energy is < noise_floor_db (which is ~ambient) - 5dB, it's definitely silence.
-                        if rms_db < (noise_floor_db - 5.0): 
-                            skip_vad = True
-                            speech_prob = 0.0 # Force 0
-                            
-                    if skip_vad:
-                        # CPU optimization: sleep during obvious silence to reduce idle CPU usage
-                        time.sleep(0.01)  # 10ms
-                    else:
-                        speech_prob, h, c = self._vad_iterator(data, h, c)
-                    
-                    max_speech_prob = max(max_speech_prob, float(speech_prob))
-
-                    if not triggered:
-                        ring_buffer.append(data)
-                        if len(ring_buffer) > ring_buffer_size:
-                            ring_buffer.pop(0)
-
-                        # Update baseline noise floor only when we're not in speech and not already trending toward a trigger.
-                        if start_candidate_count == 0 and speech_prob <= noise_update_speech_prob:
-                            noise_floor_db = (1.0 - noise_ema_alpha) * noise_floor_db + noise_ema_alpha * rms_db
-                            noise_floor_db = float(max(-80.0, min(-20.0, noise_floor_db)))
-
-                        # Start gate: require sustained speech probability AND energy above baseline.
-                        start_gate = (speech_prob >= start_speech_prob) and (rms_db >= (noise_floor_db + start_db_margin))
-                        if start_gate:
-                            start_candidate_count += 1
-                        else:
-                            start_candidate_count = 0
-
-                        if start_candidate_count >= start_confirm_chunks:
-                            triggered = True
-                            trigger_start_time = time.time()
-                            last_speech_time = trigger_start_time
-                            temp_buffer.extend(ring_buffer)
-                            speech_ms = start_confirm_chunks * chunk_ms
-                    else:
-                        temp_buffer.append(data)
-
-                        # Track "speech present" with hysteresis + energy margin.
-                        speech_present = (speech_prob >= stop_speech_prob) or (rms_db >= (noise_floor_db + stop_db_margin))
-                        if speech_present:
-                            last_speech_time = time.time()
-                            speech_ms += chunk_ms
-                        # While recording, do NOT update baseline (prevents music from "teaching" the baseline mid-utterance).
-
-                        # Stop gate: end after sustained silence + hangover.
-                        effective_silence_s = float(silence_dur) + (hangover_ms / 1000.0)
-                        if (time.time() - last_speech_time) >= effective_silence_s:
-                            break
-
-                        # Safety: prevent infinite segments on continuous background noise.
-                        if (time.time() - trigger_start_time) >= max_segment_s:
-                            log("Max segment duration reached; cutting segment.", "warning")
-                            break
-
+            seg = self.make_segmenter(CHUNK_SIZE)
+            p = seg.params
+            # Ring must hold pre-roll + the longest allowed segment so assembly is one copy at the end.
+            capacity_s = (p["pre_roll_samples"] / self.sample_rate) + p["max_segment_s"] + 2.0
+            if capture is None:
+                capture = self._ensure_capture(capacity_s)
+            else:
+                capture.start()
+            seg.noise = self.noise_floors.get(self._noise_key(capture))
+            reader = capture.reader()
+            self._segment_reader = reader
             if not self._running:
+                reader.interrupt() # stop_recording() raced the setup above
+            overflow_reported = capture.overflow_count
+            meter = self._listen_meter
+            meter.start("active")
+
+            while self._running:
+                # Low-power idle: after a long quiet stretch the segmenter is energy-only, and we wake
+                # once per batch of chunks instead of once per chunk. Every chunk of the batch is still
+                # gated, so an onset re-arms VAD at the first loud chunk; only its reporting is delayed.
+                low_power = seg.low_power
+                mode = "low_power" if low_power else "active"
+                if mode != meter.mode and settings.get("voice_activation_debug"):
+                    log(f"Listening: {mode.replace('_', '-')} mode.", "info")
+                meter.tick(mode)
+                n = CHUNK_SIZE * p["low_power_read_chunks"] if low_power else CHUNK_SIZE
+                pos, data = reader.read(n, timeout=max(0.5, 2.0 * n / self.sample_rate))
+                if data is None:
+                    if capture.exhausted:
+                        break
+                    if not capture.healthy:
+                        raise RuntimeError("capture stream stopped")
+                    continue
+
+                if capture.overflow_count != overflow_reported:
+                    overflow_reported = capture.overflow_count
+                    log(f"Input overflow (total {overflow_reported}).", "warning")
+
+                was_triggered = seg.triggered
+                events = seg.process(pos, data, history_start=capture.ring.oldest_pos)
+
+                # Update Shared Amplitude for UI
+                # Convert dBFS roughly back to linear 0-1 range for visualizer
+                # -60dB -> 0.0, -0dB -> 1.0
+                self.current_amplitude = max(0.0, (seg.last_rms_db + 60) / 60)
+
+                # Open-segment audio of this read goes out as "chunk" events (a batched read can
+                # hold a trigger, so the part after "start" is emitted too).
+                open_from = pos if was_triggered else None
+                read_end = pos + data.shape[0]
+
+                for event in events:
+                    if event.kind == "start":
+                        event.t = capture.time_of(event.start_pos)
+                        event.audio = capture.ring.view(event.start_pos, event.end_pos - event.start_pos)
+                        yield event
+                        open_from = event.end_pos
+                        continue
+
+                    if open_from is not None and event.end_pos > open_from:
+                        yield SegmentEvent("chunk", capture.time_of(open_from), open_from, event.end_pos, data[open_from - pos:event.end_pos - pos])
+                    open_from = None
+
+                    event.t = capture.time_of(event.end_pos)
+                    event.stats["trigger_t"] = capture.time_of(event.stats["trigger_pos"])
+                    event.stats["onset_t"] = capture.time_of(event.stats["onset_pos"])
+                    event.stats["last_speech_t"] = capture.time_of(event.stats["last_speech_pos"])
+                    self._next_allowed_start_time = time.time() + (p["cooldown_ms"] / 1000.0)
+                    if event.kind == "end":
+                        # Single copy out of the ring for the whole utterance.
+                        event.audio = capture.ring.copy(event.start_pos, event.end_pos)
+                        if settings.get("voice_activation_debug"):
+                            st = event.stats
+                            log(
+                                f"VAD segment: dur={len(event.audio) / self.sample_rate:.2f}s max_p={st['max_speech_prob']:.2f} "
+                                f"max_rms_db={st['max_rms_db']:.1f} noise_db={st['noise_floor_db']:.1f} ({st['noise_floor_state']}) "
+                                f"speech_ms={st['speech_ms']:.0f}",
+                                "info",
+                            )
+                    yield event
+                    # New segment: pick up Settings changes.
+                    seg.params = p = self._load_gate_params(CHUNK_SIZE)
+                    self.noise_floors.save()
+
+                if open_from is not None and open_from < read_end:
+                    yield SegmentEvent("chunk", capture.time_of(open_from), open_from, read_end, data[open_from - pos:])
+
+            if not capture.exhausted:
                 log("Recording interrupted.", "info")
-                return np.array([], dtype=np.float32)
-
-            # Reject very short or likely-false triggers.
-            total_ms = (time.time() - trigger_start_time) * 1000.0 if triggered else 0.0
-            if (not triggered) or (total_ms < min_segment_ms) or (speech_ms < min_speech_ms):
-                self._next_allowed_start_time = time.time() + (cooldown_ms / 1000.0)
-                return np.array([], dtype=np.float32)
-
-            self._next_allowed_start_time = time.time() + (cooldown_ms / 1000.0)
-            audio = np.concatenate(temp_buffer).astype(np.float32)
-
-            if settings.get("voice_activation_debug"):
-                dur_s = float(len(audio) / self.sample_rate)
-                log(
-                    f"VAD segment: dur={dur_s:.2f}s max_p={max_speech_prob:.2f} "
-                    f"max_rms_db={max_rms_db:.1f} noise_db={noise_floor_db:.1f} "
-                    f"speech_ms={speech_ms:.0f}",
-                    "info",
-                )
-
-            return audio
-        except Exception as e:
-            log(f"Recording Exception: {e}", "error")
-            print(f"Recording Error: {e}")
-            time.sleep(1)
-            return np.array([], dtype=np.float32)
+            tail = seg.flush(reader.pos, "end_of_input" if capture.exhausted else "interrupted")
+            if tail is not None:
+                tail.t = capture.time_of(tail.end_pos)
+                yield tail
         finally:
+            self._listen_meter.stop()
+            self.noise_floors.save()
+            if reader is not None:
+                if self._segment_reader is reader:
+                    self._segment_reader = None
+                reader.close()
             # Unregister from MMCSS when done
             if mmcss_registered:
                 try:
                     get_mmcss_manager().unregister_audio_thread()
                 except Exception:
                     pass
-            self._resume_metering_if_needed()
+
+    def listen_single_segment(self, capture: CaptureStream | None = None):
+        """Blocks until one accepted utterance is captured; returns it (empty array if rejected/interrupted)."""
+        segments = self.stream_segments(capture)
+        try:
+            for event in segments:
+                if event.kind == "end":
+                    return event.audio
+                if event.kind == "discard":
+                    return np.array([], dtype=np.float32)
+            return np.array([], dtype=np.float32)
+        except Exception as e:
+            log(f"Recording Exception: {e}", "error")
+            print(f"Recording Error: {e}")
+            time.sleep(1)
+            return np.array([], dtype=np.float32)
+        finally:
+            segments.close()
+
+    # --- Push-to-talk hold ---
+    def prepare_hold(self):
+        """Keeps the shared capture running so the next key press has pre-roll to draw from."""
+        try:
+            self._ensure_capture()
+        except Exception as e:
+            log(f"Push-to-talk capture error: {e}", "error")
+
+    def begin_hold(self, t_press: float | None = None):
+        """
+        Key-down: marks the segment start at `t_press` (time.monotonic()) minus the pre-roll.
+        Nothing is read until key-up; the always-running ring already holds the audio.
+        """
+        t = time.monotonic() if t_press is None else float(t_press)
+        cap = self._ensure_capture()
+        try:
+            pre_roll = int(float(settings.get("push_to_talk_pre_roll_ms")) * self.sample_rate / 1000.0)
+        except Exception:
+            pre_roll = int(0.3 * self.sample_rate)
+        start = max(cap.ring.oldest_pos, cap.pos_at(t) - max(0, pre_roll))
+        self._hold = (cap, start, t)
+
+    def cancel_hold(self):
+        self._hold = None
+
+    def end_hold(self, t_release: float | None = None) -> np.ndarray:
+        """
+        Key-up: returns the audio from the press (with pre-roll) up to `t_release` exactly.
+        Only waits for the device block that contains the key-up instant (one callback period).
+        """
+        hold, self._hold = self._hold, None
+        if hold is None:
+            return np.array([], dtype=np.float32)
+        cap, start, t_press = hold
+        t = time.monotonic() if t_release is None else float(t_release)
+
+        try:
+            min_hold_s = float(settings.get("push_to_talk_min_hold_ms")) / 1000.0
+        except Exception:
+            min_hold_s = 0.15
+        if t - t_press < min_hold_s:
+            log(f"Push-to-talk hold too short ({(t - t_press) * 1000:.0f} ms); ignored.", "info")
+            return np.array([], dtype=np.float32)
+
+        end = cap.pos_at(t)
+        missing = end - cap.ring.write_pos
+        if missing > 0 and not cap.exhausted:
+            reader = cap.reader(cap.ring.write_pos)
+            try:
+                n = min(missing, cap.ring.capacity)
+                reader.read(n, timeout=max(0.05, 2.0 * n / self.sample_rate))
+            finally:
+                reader.close()
+
+        if not cap.ring.is_valid(start):
+            kept = cap.ring.capacity / float(self.sample_rate)
+            log(f"Push-to-talk hold longer than the capture ring; keeping the last {kept:.0f}s.", "warning")
+        return cap.ring.copy(start, end)
 
 if __name__ == "__main__":
     eng = AudioEngine()
@@ -363,3 +562,4 @@ if __name__ == "__main__":
     time.sleep(2)
     print(eng.get_current_volume())
     eng.stop_metering()
+    eng.close()
@@ -0,0 +1,249 @@
+import threading
+import time
+import numpy as np
+try:
+    import sounddevice as sd
+except Exception:
+    sd = None  # No PortAudio (headless/CI boxes): only core.sources replay is usable.
+
+
+class AudioRingBuffer:
+    """
+    Preallocated float32 ring buffer: one writer (the PortAudio callback), any number of readers.
+
+    Positions are absolute sample indices (a monotonic sample clock), never wrapped.
+    Storage is mirrored (2x capacity) so every window of up to `capacity` samples is one
+    contiguous slice: readers always get zero-copy views, even across the wrap point.
+    The writer publishes by bumping `write_pos` only after the samples are in place, so
+    readers never need a lock.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros(self.capacity * 2, dtype=np.float32)
+        self._write_pos = 0
+
+    @property
+    def write_pos(self) -> int:
+        return self._write_pos
+
+    @property
+    def oldest_pos(self) -> int:
+        return max(0, self._write_pos - self.capacity)
+
+    def write(self, block: np.ndarray):
+        n = int(block.shape[0])
+        if n <= 0:
+            return
+        pos = self._write_pos
+        if n > self.capacity:
+            # Only the newest `capacity` samples can survive anyway.
+            pos += n - self.capacity
+            block = block[-self.capacity:]
+            n = self.capacity
+
+        cap = self.capacity
+        d = self._data
+        start = pos % cap
+        first = min(n, cap - start)
+        d[start:start + first] = block[:first]
+        d[start + cap:start + cap + first] = block[:first]
+        rest = n - first
+        if rest:
+            d[0:rest] = block[first:]
+            d[cap:cap + rest] = block[first:]
+
+        # Publish last.
+        self._write_pos = pos + n
+
+    def is_valid(self, start: int) -> bool:
+        """True while samples from `start` onwards have not been overwritten."""
+        return start >= self.oldest_pos
+
+    def view(self, start: int, length: int) -> np.ndarray | None:
+        """
+        Zero-copy view of samples [start, start+length).
+        Returns None if the window is not fully written yet or was already overwritten.
+        Views alias the ring: copy (or finish using them) before `capacity` more samples arrive.
+        """
+        length = int(length)
+        if length <= 0 or length > self.capacity:
+            return None
+        if start < self.oldest_pos or (start + length) > self._write_pos:
+            return None
+        s = start % self.capacity
+        return self._data[s:s + length]
+
+    def copy(self, start: int, end: int) -> np.ndarray:
+        """Owned float32 copy of [start, end), clamped to what is still in the ring."""
+        start = max(int(start), self.oldest_pos)
+        end = min(int(end), self._write_pos)
+        if end <= start:
+            return np.array([], dtype=np.float32)
+        v = self.view(start, end - start)
+        return v.copy() if v is not None else np.array([], dtype=np.float32)
+
+
+class _Waiter(threading.Event):
+    """Reader wake-up event; the writer only sets it once `need` samples have been written."""
+
+    def __init__(self):
+        super().__init__()
+        self.need = 0
+
+
+class RingReader:
+    """
+    Sequential consumer cursor over an AudioRingBuffer.
+    Blocks (without polling) until the next window is available.
+    """
+
+    def __init__(self, capture: "CaptureStream", start: int):
+        self._capture = capture
+        self._ring = capture.ring
+        self.pos = int(start)
+        self.dropped_samples = 0
+        self._interrupted = False
+        self._ready = _Waiter()
+        capture._add_waiter(self._ready)
+
+    def read(self, n: int, timeout: float | None = None) -> tuple[int, np.ndarray] | tuple[None, None]:
+        """
+        Returns (start_pos, view) for the next `n` samples, or (None, None) on timeout.
+        If the reader fell more than a ring behind, it skips ahead and counts the loss.
+        """
+        if n > self._ring.capacity:
+            raise ValueError(f"read size {n} exceeds ring capacity {self._ring.capacity}")
+        while True:
+            if self._interrupted:
+                self._interrupted = False
+                return None, None
+            self._ready.clear()
+            # Large reads sleep through intermediate device blocks instead of waking on each.
+            self._ready.need = self.pos + n
+            oldest = self._ring.oldest_pos
+            if self.pos < oldest:
+                self.dropped_samples += oldest - self.pos
+                self.pos = oldest
+            if self._ring.write_pos >= self.pos + n:
+                start = self.pos
+                view = self._ring.view(start, n)
+                if view is None:
+                    continue
+                self.pos += n
+                return start, view
+            if self._capture.exhausted:
+                return None, None
+            if not self._ready.wait(timeout):
+                return None, None
+
+    def interrupt(self):
+        """Makes a blocked (or the next) read() return (None, None) at once; safe from any thread."""
+        self._interrupted = True
+        self._ready.set()
+
+    def close(self):
+        self._capture._remove_waiter(self._ready)
+        self._ready.set()
+
+
+class CaptureStream:
+    """
+    Callback-driven input stream.
+    The PortAudio callback does exactly one copy (device buffer -> ring) and wakes readers;
+    all analysis happens on consumer threads via RingReader views.
+    """
+
+    def __init__(self, sample_rate: int, device=None, blocksize: int = 512, capacity_s: float = 30.0):
+        self.sample_rate = int(sample_rate)
+        self.device = device
+        self.blocksize = int(blocksize)
+        self.ring = AudioRingBuffer(int(capacity_s * self.sample_rate))
+        self.overflow_count = 0
+        self.exhausted = False  # Live streams never run out; replay sources set this at end of input.
+        # (monotonic time, write_pos) of the latest callback: maps sample positions to capture time.
+        self._clock_ref = (time.monotonic(), 0)
+        self._stream = None
+        # Copy-on-write list so the callback can iterate without a lock.
+        self._waiters = []
+        self._waiters_lock = threading.Lock()
+
+    def _add_waiter(self, ev: threading.Event):
+        with self._waiters_lock:
+            self._waiters = self._waiters + [ev]
+
+    def _remove_waiter(self, ev: threading.Event):
+        with self._waiters_lock:
+            self._waiters = [w for w in self._waiters if w is not ev]
+
+    def _wake(self, force: bool = False):
+        """Wakes readers whose next window is complete (all of them with `force`)."""
+        wp = self.ring.write_pos
+        for ev in self._waiters:
+            if force or wp >= getattr(ev, "need", 0):
+                ev.set()
+
+    def _callback(self, indata, frames, time_info, status):
+        if status and status.input_overflow:
+            self.overflow_count += 1
+        self.ring.write(indata[:, 0])
+        self._clock_ref = (time.monotonic(), self.ring.write_pos)
+        self._wake()
+
+    def start(self):
+        if self._stream is not None:
+            return
+        if sd is None:
+            raise RuntimeError("sounddevice/PortAudio is not available")
+        self._stream = sd.InputStream(
+            callback=self._callback,
+            samplerate=self.sample_rate,
+            device=self.device,
+            channels=1,
+            blocksize=self.blocksize,
+            dtype="float32",
+        )
+        self._stream.start()
+
+    def close(self):
+        stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.stop()
+            finally:
+                stream.close()
+        self._wake(force=True)
+
+    @property
+    def healthy(self) -> bool:
+        """False once closed or if PortAudio stopped the stream (e.g. device unplugged)."""
+        stream = self._stream
+        if stream is None:
+            return False
+        try:
+            return bool(stream.active)
+        except Exception:
+            return False
+
+    def time_of(self, pos: int) -> float:
+        """Estimated time.monotonic() at which sample `pos` was captured."""
+        t_ref, pos_ref = self._clock_ref
+        return t_ref - (pos_ref - pos) / float(self.sample_rate)
+
+    def pos_at(self, t: float) -> int:
+        """Inverse of time_of: the sample position being captured at time.monotonic() `t`."""
+        t_ref, pos_ref = self._clock_ref
+        return int(round(pos_ref + (t - t_ref) * self.sample_rate))
+
+    def reader(self, start: int | None = None) -> RingReader:
+        """New cursor; defaults to 'now' (the current write position)."""
+        return RingReader(self, self.ring.write_pos if start is None else start)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
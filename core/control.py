@@ -0,0 +1,82 @@
+"""
+Capture ownership as explicit state, shared by the controller and main.py's pipeline.
+
+The capture worker used to poll `mode` / `stop_processing_flag` every 100-500 ms. It now
+blocks on this object's Condition (no timeout) and each transition notifies it at once, so
+mode switches, pauses and resumes apply immediately and an idle worker never wakes.
+"""
+
+import threading
+from core.logger import log
+
+
+class CaptureControl:
+    """
+    States:
+      listening    - voice_activation: the continuous segmenter owns the capture
+      push_to_talk - key presses own the capture; the worker only keeps the ring warm
+      paused       - Settings open (or similar); nothing captures, the recording in progress is
+                     dropped (segments already captured still go through the pipeline)
+      stopped      - shutting down
+    `on_change(fn)` hooks run after every transition as fn(before, after), on the caller's
+    thread, e.g. to interrupt a capture read blocked in the state being left.
+    """
+
+    def __init__(self, mode: str):
+        self._cond = threading.Condition()
+        self.mode = str(mode or "voice_activation")
+        self.paused = False
+        self.stopped = False
+        self.transitions = 0
+        self._hooks = []
+
+    @property
+    def state(self) -> str:
+        if self.stopped:
+            return "stopped"
+        if self.paused:
+            return "paused"
+        return "listening" if self.mode == "voice_activation" else "push_to_talk"
+
+    def on_change(self, fn):
+        self._hooks.append(fn)
+
+    def _update(self, **changes) -> str:
+        with self._cond:
+            before = self.state
+            for k, v in changes.items():
+                setattr(self, k, v)
+            after = self.state
+            if after != before:
+                self.transitions += 1
+            self._cond.notify_all()
+        if after != before:
+            log(f"Capture state: {before} -> {after}", "info")
+            for fn in list(self._hooks):
+                try:
+                    fn(before, after)
+                except Exception as e:
+                    log(f"Capture state hook error: {e}", "warning")
+        return after
+
+    def set_mode(self, mode: str) -> str:
+        return self._update(mode=str(mode or "voice_activation"))
+
+    def pause(self) -> str:
+        return self._update(paused=True)
+
+    def resume(self) -> str:
+        return self._update(paused=False)
+
+    def stop(self) -> str:
+        return self._update(stopped=True)
+
+    def wait_change(self, state: str, timeout: float | None = None) -> str:
+        """Blocks until the state differs from `state` (or `timeout`); returns the current state."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.state != state, timeout)
+            return self.state
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"state": self.state, "mode": self.mode, "transitions": self.transitions}
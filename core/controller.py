@@ -1,134 +1,161 @@
-import threading
-import time
-import queue
-from core.audio import AudioEngine
-from core.transcriber import Transcriber
-from core.intelligence import IntelligenceEngine
-from core.injector import Injector
+from core.startup import StartupOrchestrator
+from core.control import CaptureControl
+from core.pipeline import SegmentQueue, Pipeline, CaptureStage, TranscribeStage, RefineStage, InjectStage
 from core.settings import manager as settings
 from core.logger import log
+from core import tracing
+from core import metrics
 
 class CoreController:
+    """
+    The app core shared by the GUI (main.py) and the TUI: model startup, capture state and the
+    capture -> transcribe -> refine -> inject pipeline (core.pipeline).
+    """
+
     def __init__(self, ui_callback=None):
         self.ui_callback = ui_callback # Function(state: str)
-        self.audio = AudioEngine()
-        self.transcriber = Transcriber()
-        self.intelligence = IntelligenceEngine()
-        self.injector = Injector()
-        
-        self.processing_lock = threading.Lock()
-        self.stop_processing_flag = False
+        # Models load in the background; the ui_callback receives LOADING, then READY (or FAILED).
+        self.startup = StartupOrchestrator(on_state=self.update_ui)
+        self.startup.start()
+
+        # Explicit capture state (listening / push_to_talk / paused / stopped); workers block on it.
+        self.control = CaptureControl(settings.get("mode"))
+        settings.subscribe(self._on_setting_changed)
+
+        # Capture and processing are decoupled: capture keeps listening while earlier
+        # segments are transcribed/refined/injected, and each stage overlaps with the others.
+        self.segment_queue = SegmentQueue(
+            settings.get("pipeline_queue_max"),
+            str(settings.get("pipeline_queue_policy") or "drop_oldest"),
+        )
+        self.capture = CaptureStage(self.startup, self.control, self.segment_queue, on_capturing=self._update_idle_ui)
+        self.pipeline = Pipeline(
+            self.segment_queue,
+            [
+                TranscribeStage(self.startup),
+                RefineStage(self.startup, workers=int(settings.get("pipeline_refine_workers") or 1)),
+                InjectStage(self.startup),
+            ],
+            queue_max=int(settings.get("pipeline_stage_queue_max") or 2),
+            on_state=self._on_pipeline_state,
+        )
         self.running = True
-        
+
+        self._register_gauges()
+        self.metrics = metrics.start_from_settings() # None unless metrics_http_port / metrics_file is set
+
         log("CoreController initialized", "info")
 
+    @property
+    def audio(self):
+        return self.startup.audio
+
+    @property
+    def transcriber(self):
+        return self.startup.transcriber
+
+    @property
+    def intelligence(self):
+        return self.startup.intelligence
+
+    @property
+    def injector(self):
+        return self.startup.injector
+
+    @property
+    def capture_lock(self):
+        return self.capture.lock
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self.startup.wait_ready(timeout)
+
     def update_ui(self, state):
         if self.ui_callback:
             self.ui_callback(state)
 
-    def get_success_hold_s(self) -> float:
-        try:
-            return max(0.05, float(settings.get("success_hold_ms")) / 1000.0)
-        except Exception:
-            return 0.35
-
-    def should_refine_llm(self, confidence: str, raw_text: str) -> bool:
-        if not settings.get("use_intelligence"):
-            return False
-
-        try:
-            min_audio_s = float(settings.get("llm_refine_min_audio_s"))
-            audio_s = float(getattr(self.transcriber, "last_stats", {}).get("audio_seconds", 0.0))
-            if audio_s and audio_s < min_audio_s:
-                return False
-        except Exception:
-            pass
-
-        try:
-            min_words = int(settings.get("llm_refine_min_words"))
-            if min_words > 0:
-                wc = len([w for w in (raw_text or "").strip().split() if w])
-                if wc < min_words:
-                    return False
-        except Exception:
-            pass
-
-        want = str(settings.get("llm_refine_min_confidence") or "high").lower()
-        rank = {"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}
-        return rank.get(confidence, 0) >= rank.get(want, 3)
-
     def start_pipeline(self):
-        worker_thread = threading.Thread(target=self._pipeline_worker, daemon=True)
-        worker_thread.start()
-
-    def _pipeline_worker(self):
-        while self.running:
-            mode = settings.get("mode")
-            if self.stop_processing_flag:
-                time.sleep(0.5)
-                continue
-            
-            if mode != "voice_activation":
-                time.sleep(0.1)
-                continue
-                
-            with self.processing_lock:
-                 self.update_ui("LISTENING")
-                 try:
-                     audio_data = self.audio.listen_single_segment() # Blocks
-                     if self.stop_processing_flag or len(audio_data) == 0:
-                         self.update_ui("IDLE")
-                         if len(audio_data) == 0: time.sleep(0.1)
-                         continue
-                 except Exception:
-                     self.update_ui("IDLE")
-                     time.sleep(1)
-                     continue
-
-                 self.update_ui("PROCESSING")
-                 try:
-                     self.process_audio(audio_data)
-                 except Exception as e:
-                      log(f"Pipeline Error: {e}", "error")
-                 
-                 self.update_ui("IDLE")
-
-    def process_audio(self, audio_data):
-        lang_code = settings.get("transcription_language")
-        if lang_code == "auto": lang_code = None
-        
-        raw_text = self.transcriber.transcribe(audio_data, language=lang_code)
-        if raw_text:
-            if self.should_refine_llm(getattr(self.transcriber, "last_confidence", "unknown"), raw_text):
-                final_text = self.intelligence.refine_text(raw_text)
-            else:
-                final_text = raw_text 
-                
-            self.injector.type_text(final_text)
-            self.update_ui("SUCCESS")
-            time.sleep(self.get_success_hold_s())
+        self.capture.start()
+        self.pipeline.start()
+
+    def get_pipeline_stats(self) -> dict:
+        return {"capture": self.capture.stats(), **self.pipeline.stats()}
+
+    def _update_idle_ui(self):
+        if self.pipeline.busy:
+            return
+        self.update_ui("LISTENING" if self.capture.capturing else "IDLE")
+
+    def _on_pipeline_state(self, state):
+        if state is None:
+            self._update_idle_ui()
         else:
-            pass 
+            self.update_ui(state)
+
+    def _on_setting_changed(self, key, value):
+        if key == "mode":
+            self.control.set_mode(value)
+
+    def pause(self):
+        """Stops capture (e.g. while Settings is open); segments already captured are still processed."""
+        self.control.pause()
+
+    def cancel_pending(self):
+        """Explicit cancel: drops captured-but-not-yet-injected segments."""
+        self.pipeline.cancel_pending()
+
+    def resume(self):
+        self.control.resume()
 
     def trigger_ptt(self):
-        def _job():
-            if self.processing_lock.acquire(blocking=False):
-                try:
-                    if self.stop_processing_flag:
-                        return
-                    self.update_ui("LISTENING")
-                    audio_data = self.audio.listen_single_segment()
-                    if len(audio_data) > 0:
-                        self.update_ui("PROCESSING")
-                        self.process_audio(audio_data)
-                except Exception:
-                    pass
-                finally:
-                    self.update_ui("IDLE")
-                    self.processing_lock.release()
-        threading.Thread(target=_job, daemon=True).start()
+        self.capture.tap()
+
+    def ptt_press(self):
+        self.capture.press()
+
+    def ptt_release(self):
+        self.capture.release()
+
+    def _register_gauges(self):
+        # Evaluated at scrape/flush time only.
+        def queue_depths():
+            depths = {"capture": self.segment_queue.depth()}
+            for stage, q in zip(self.pipeline.stages, self.pipeline.queues):
+                depths[stage.name] = q.qsize()
+            return depths
+
+        def residency():
+            out = {"whisper": 1.0 if (self.transcriber and self.transcriber.is_loaded) else 0.0}
+            if self.startup.residency:
+                out["whisper"] = 1.0 if self.startup.residency.stats().get("loaded") else 0.0
+            return out
+
+        metrics.gauge("queue_depth", "Utterances waiting in front of each pipeline stage.", queue_depths, label="queue")
+        metrics.gauge("in_flight", "Utterances between capture hand-off and injection.", lambda: self.pipeline.in_flight)
+        metrics.gauge("vad_cpu_seconds", "Cumulative Silero VAD inference time (single-threaded session).", lambda: self.audio.vad.run_s if self.audio else None)
+        metrics.gauge("model_resident", "1 while the model is loaded in memory (residency manager may evict it when idle).", residency, label="model")
+        metrics.gauge("capture_state", "Current capture state (1 for the active one).", lambda: {st: 1.0 if self.control.state == st else 0.0 for st in ("listening", "push_to_talk", "paused", "stopped")}, label="state")
+
+    def get_metrics_text(self) -> str:
+        """Prometheus text exposition of everything recorded so far (also what the endpoint serves)."""
+        return metrics.REGISTRY.render()
+
+    def get_control_stats(self) -> dict:
+        return self.control.stats()
+
+    def get_residency_stats(self) -> dict:
+        return self.startup.residency.stats() if self.startup.residency else {}
+
+    def get_idle_stats(self) -> dict:
+        return self.audio.get_idle_stats() if self.audio else {}
+
+    def get_noise_floor_stats(self) -> dict:
+        return self.audio.get_noise_floor_stats() if self.audio else {}
 
     def shutdown(self):
         self.running = False
-        self.stop_processing_flag = True
-        if self.audio: self.audio.stop_recording()
+        if self.startup.residency: self.startup.residency.stop()
+        self.control.stop()
+        self.pipeline.stop()
+        if self.audio: self.audio.close()
+        if self.metrics: self.metrics.stop()
+        tracing.close()
@@ -32,6 +32,9 @@ def print_effective_decode_params():
     ]
     print(json.dumps({k: settings.get(k) for k in keys}, indent=2))
 
+    print("\n=== Whisper cascade / memory ===")
+    print(json.dumps(t.get_cascade_stats(), indent=2))
+
 
 def main():
     try:
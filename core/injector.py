@@ -6,6 +6,10 @@ from ctypes import wintypes
 from pynput.keyboard import Controller, Key
 from core.settings import manager as settings
 from core.logger import log
+from core import tracing
+from core import metrics
+
+CLIPBOARD_FALLBACKS = metrics.counter("clipboard_fallbacks_total", "Pastes that fell back to typing (or were skipped in terminals), by reason.")
 
 class Injector:
     def __init__(self):
@@ -402,11 +406,13 @@ class Injector:
             if not self._clipboard_set_unicode_text_unsafe(text):
                 raise RuntimeError("clipboard_busy_set")
             after_seq = self._clipboard_get_sequence()
+            tracing.mark("clipboard_set")
         finally:
             self._clipboard_close()
 
         time.sleep(max(0.01, clipboard_settle_ms / 1000.0))
         self._send_paste_hotkey(is_terminal=is_terminal)
+        tracing.mark("paste_hotkey", terminal=is_terminal)
 
         # Restore previous clipboard ONLY if unchanged (prevents clobbering user copies).
         time.sleep(max(0.30, restore_delay_ms / 1000.0))
@@ -430,6 +436,9 @@ class Injector:
                     # This confirms why we must check _is_clipboard_safe_to_restore() BEFORE this method 
                     # and abort pasting if unsafe.
                     self._clipboard_set_formats_unsafe([])
+                tracing.mark("clipboard_restore")
+            else:
+                tracing.mark("clipboard_restore", skipped=True) # User copied something meanwhile
         finally:
             self._clipboard_close()
 
@@ -454,6 +463,7 @@ class Injector:
             # Only check if we are actually considering using paste
             if not self._is_clipboard_safe_to_restore():
                 clipboard_safe = False
+                CLIPBOARD_FALLBACKS.inc(reason="unsafe_clipboard")
                 log("Clipboard contains unsafe/binary data; falling back to typing to preserve it.", "info")
 
         use_paste = clipboard_safe and (is_terminal or (len(text) > typing_max))
@@ -464,6 +474,8 @@ class Injector:
                 self._paste_via_clipboard(text, is_terminal=is_terminal)
                 return
             except Exception as e:
+                tracing.mark("clipboard_fallback", error=str(e))
+                CLIPBOARD_FALLBACKS.inc(reason="paste_failed")
                 log(f"Clipboard Injection Failed: {e}", "warning")
                 # Fallback to typing (non-terminal only).
                 if is_terminal:
@@ -478,6 +490,7 @@ class Injector:
                     time.sleep(delay)
             else:
                 self.keyboard.type(text)
+            tracing.mark("typed", chars=len(text))
         except Exception as e:
             log(f"Injection Failed: {e}", "error")
 
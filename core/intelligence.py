@@ -4,6 +4,10 @@ import requests
 import config
 from core.logger import log
 from core.settings import manager as settings
+from core import tracing
+from core import metrics
+
+LLM_REJECTIONS = metrics.counter("llm_rejections_total", "LLM refinements discarded (output kept raw), by reason.")
 
 
 class IntelligenceEngine:
@@ -117,11 +121,13 @@ class IntelligenceEngine:
         }
 
         try:
+            tracing.mark("llm_request", model=config.OLLAMA_MODEL, chars=len(text))
             response = self._session.post(
                 self.url,
                 json=payload,
                 timeout=float(settings.get("ollama_timeout_s")),
             )
+            tracing.mark("llm_response", status=response.status_code)
             response.raise_for_status()
             result = response.json()
             corrected = (result.get("response", "") or "").strip()
@@ -134,6 +140,7 @@ class IntelligenceEngine:
 
             # Safety: if the model output diverges wildly, skip refinement.
             if abs(len(corrected) - len(text)) > max(80, int(len(text) * 0.6)):
+                LLM_REJECTIONS.inc(reason="length_diverged")
                 log("LLM output length diverged; skipping refinement.", "warning")
                 return text
 
@@ -141,6 +148,7 @@ class IntelligenceEngine:
             critical = re.findall(r"(--?[A-Za-z0-9][A-Za-z0-9_-]*|[A-Za-z]:\\\\[^\\s]+|/[^\\s]+)", text)
             for token in critical:
                 if token and token not in corrected:
+                    LLM_REJECTIONS.inc(reason="critical_token")
                     log("LLM output dropped a critical token; skipping refinement.", "warning")
                     return text
 
@@ -163,14 +171,39 @@ class IntelligenceEngine:
             in_lang = guess_lang_en_fr(text)
             out_lang = guess_lang_en_fr(corrected)
             if in_lang and out_lang and in_lang != out_lang:
+                LLM_REJECTIONS.inc(reason="translated")
                 log("LLM output appears translated; skipping refinement.", "warning")
                 return text
 
             return corrected
         except Exception as e:
+            tracing.mark("llm_error", error=type(e).__name__)
+            LLM_REJECTIONS.inc(reason="error")
             log(f"Ollama Error: {e}", "warning")
             return text
 
+    def _set_residency(self, keep_alive, timeout: float) -> bool:
+        # A generate request without a prompt only loads/unloads the model (Ollama API).
+        # keep_alive None = omit it, so the server's default (OLLAMA_KEEP_ALIVE) applies.
+        payload = {"model": config.OLLAMA_MODEL, "stream": False}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        try:
+            response = self._session.post(self.url, json=payload, timeout=timeout)
+            response.raise_for_status()
+            return True
+        except Exception as e:
+            log(f"Ollama residency request failed (keep_alive={keep_alive}): {e}", "warning")
+            return False
+
+    def release(self) -> bool:
+        """Asks Ollama to evict the model from RAM/VRAM now."""
+        return self._set_residency(0, timeout=5.0)
+
+    def preload(self) -> bool:
+        """Loads the model back into memory (Ollama's default keep_alive applies afterwards)."""
+        return self._set_residency(None, timeout=60.0)
+
 
 if __name__ == "__main__":
     eng = IntelligenceEngine()
@@ -0,0 +1,56 @@
+"""
+Process memory probes for model residency reporting.
+
+Only the resident set size (RSS) of this process is measured. VRAM held by
+CTranslate2 on CUDA is not visible here, so GPU deployments should read the
+numbers as host-side memory only.
+"""
+
+import ctypes
+import os
+import platform
+
+
+class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def process_rss_mb() -> float | None:
+    """Current resident memory of this process in MiB, or None if it cannot be read."""
+    try:
+        if platform.system() == "Windows":
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            psapi = ctypes.WinDLL("psapi", use_last_error=True)
+            kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            psapi.GetProcessMemoryInfo.argtypes = [ctypes.c_void_p, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), ctypes.c_ulong]
+            if psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize / (1024.0 * 1024.0)
+            return None
+
+        if os.path.exists("/proc/self/statm"):
+            with open("/proc/self/statm", "r") as f:
+                resident_pages = int(f.read().split()[1])
+            return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024.0)
+
+        # macOS: no cheap "current RSS" without extra deps; fall back to the peak.
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024.0 * 1024.0)
+    except Exception:
+        return None
+
+
+def format_mb(value: float | None) -> str:
+    return "n/a" if value is None else f"{value:.0f} MB"
@@ -0,0 +1,249 @@
+"""
+In-process metrics: counters, gauges and latency histograms, exposed on request.
+
+Recording is always on and cheap (a lock and a few integer increments). Publishing is opt-in:
+  metrics_http_port > 0 - Prometheus text format on http://127.0.0.1:<port>/metrics
+                          (localhost only; never bound to another interface)
+  metrics_file          - the same text rewritten every metrics_flush_s seconds (atomically),
+                          e.g. for node_exporter's textfile collector
+Gauges are callbacks evaluated at scrape time, so nothing polls when nobody is looking.
+"""
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from core.logger import log
+
+PREFIX = "localwhisper_"
+
+# Seconds; covers 1 ms VAD calls up to multi-second LLM/decode tails.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in sorted(labels.items()):
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items()) or [((), 0)]
+        for key, v in items:
+            out.append(f"{self.name}{_labels(dict(key))} {_fmt(v)}")
+        return out
+
+
+class Gauge:
+    """Value read from `fn()` at scrape time; fn may return a number or {labels_tuple: number}."""
+
+    def __init__(self, name: str, help: str, fn, label: str | None = None):
+        self.name, self.help, self.fn, self.label = name, help, fn, label
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        try:
+            v = self.fn()
+        except Exception:
+            return []
+        if isinstance(v, dict):
+            for k, x in v.items():
+                if x is not None:
+                    out.append(f"{self.name}{_labels({self.label or 'name': k})} {_fmt(float(x))}")
+        elif v is not None:
+            out.append(f"{self.name} {_fmt(float(v))}")
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., +Inf], sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def count(self, **labels) -> int:
+        s = self._series.get(tuple(sorted(labels.items())))
+        return s[2] if s else 0
+
+    def render(self) -> list:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        for key, counts, total, n in items:
+            labels = dict(key)
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_labels({**labels, 'le': _fmt(le)})} {acc}")
+            out.append(f"{self.name}_sum{_labels(labels)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_labels(labels)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, *args):
+        name = PREFIX + name
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, *args)
+            return m
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def gauge(self, name: str, help: str, fn, label: str | None = None) -> Gauge:
+        """(Re)binds a callback gauge; the latest registration wins."""
+        with self._lock:
+            g = self._metrics[PREFIX + name] = Gauge(PREFIX + name, help, fn, label)
+            return g
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+gauge = REGISTRY.gauge
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # Scrapes would flood session.log
+
+
+class MetricsExporter:
+    """Starts the localhost HTTP endpoint and/or the stats-file flusher configured in settings."""
+
+    def __init__(self, port: int = 0, path: str | None = None, flush_s: float = 15.0):
+        self.port = int(port or 0)
+        self.path = path or None
+        self.flush_s = max(1.0, float(flush_s))
+        self._server = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.port > 0:
+            try:
+                self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+                self._server.daemon_threads = True
+                threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+                log(f"Metrics: http://127.0.0.1:{self.port}/metrics", "info")
+            except Exception as e:
+                log(f"Metrics endpoint failed to start on port {self.port}: {e}", "warning")
+                self._server = None
+        if self.path:
+            threading.Thread(target=self._flush_loop, name="metrics-file", daemon=True).start()
+            log(f"Metrics: writing {self.path} every {self.flush_s:.0f}s", "info")
+        return self
+
+    def flush(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(REGISTRY.render())
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log(f"Could not write metrics file: {e}", "warning")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_s):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        if self.path:
+            self.flush()
+        if self._server is not None:
+            try:
+                self._server.shutdown()
+                self._server.server_close()
+            except Exception:
+                pass
+
+
+def start_from_settings() -> MetricsExporter | None:
+    """Exporter per the metrics_* settings, or None when publishing is off (the default)."""
+    from core.settings import manager as settings
+    import config
+    port = int(settings.get("metrics_http_port") or 0)
+    path = str(settings.get("metrics_file") or "").strip()
+    if port <= 0 and not path:
+        return None
+    if path and not os.path.isabs(path):
+        path = os.path.join(config.BASE_DIR, path)
+    return MetricsExporter(port, path or None, float(settings.get("metrics_flush_s") or 15.0)).start()
+
+
+if __name__ == "__main__":
+    # Prints the exposition of whatever this process recorded (a quick format check):
+    #   python -m core.metrics
+    h = histogram("demo_seconds", "Demo latency.")
+    for v in (0.004, 0.03, 0.2, 1.2):
+        h.observe(v, stage="demo")
+    counter("demo_total", "Demo counter.").inc(3, kind="x")
+    gauge("demo_depth", "Demo gauge.", lambda: 2)
+    print(REGISTRY.render(), end="")
@@ -0,0 +1,148 @@
+"""
+Per-input-device noise-floor estimate that outlives segments, listen calls and restarts.
+
+The voice-activation start/stop gates compare chunk energy against this floor. It used to
+restart from -55 dBFS on every segment and take a few hundred milliseconds of EMA to find
+the room again; now each device keeps one NoiseFloor for the whole process and the last
+value is saved to noise_floor.json, so gating is calibrated from the first chunk.
+
+Until it has seen `warm_updates` quiet chunks a floor averages them (1/n weights) instead of
+using the slow EMA, so a cold start converges in about a second rather than several.
+"""
+
+import json
+import os
+import threading
+import time
+from core.logger import log
+
+FLOOR_MIN_DB = -80.0
+FLOOR_MAX_DB = -20.0
+
+
+class NoiseFloor:
+    """
+    States:
+      cold      - no measurement yet (starts at the initial guess)
+      restored  - loaded from disk, not yet re-confirmed in this session
+      converging - fewer than `warm_updates` quiet chunks this session
+      converged  - tracking with the normal EMA
+    """
+
+    def __init__(self, key: str | None, initial_db: float = -55.0, warm_updates: int = 32):
+        self.key = key
+        self.floor_db = float(max(FLOOR_MIN_DB, min(FLOOR_MAX_DB, initial_db)))
+        self.warm_updates = max(1, int(warm_updates))
+        self.updates = 0             # quiet chunks seen in this session
+        self.total_updates = 0       # including previous sessions
+        self.restored = False
+        self.saved_at = None
+        self.updated_at = None
+
+    @property
+    def state(self) -> str:
+        if self.updates >= self.warm_updates:
+            return "converged"
+        if self.updates:
+            return "converging"
+        return "restored" if self.restored else "cold"
+
+    @property
+    def converged(self) -> bool:
+        return self.updates >= self.warm_updates
+
+    def update(self, rms_db: float, alpha: float):
+        """One quiet chunk. EMA with `alpha`, but at least 1/n weight while warming up."""
+        self.updates += 1
+        self.total_updates += 1
+        if self.updates <= self.warm_updates and not self.restored:
+            alpha = max(alpha, 1.0 / self.updates)
+        nf = (1.0 - alpha) * self.floor_db + alpha * rms_db
+        self.floor_db = max(FLOOR_MIN_DB, min(FLOOR_MAX_DB, nf))
+        self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {"floor_db": round(self.floor_db, 2), "updates": self.total_updates, "saved_at": time.time()}
+
+    def stats(self) -> dict:
+        return {
+            "floor_db": round(self.floor_db, 2),
+            "state": self.state,
+            "updates": self.updates,
+            "total_updates": self.total_updates,
+            "restored_from_s_ago": round(time.time() - self.saved_at, 0) if self.restored and self.saved_at else None,
+        }
+
+
+class NoiseFloorStore:
+    """NoiseFloor per device key, optionally persisted to a JSON file."""
+
+    def __init__(self, path: str | None, initial_db: float = -55.0, warm_updates: int = 32, save_interval_s: float = 60.0):
+        self.path = path
+        self.initial_db = initial_db
+        self.warm_updates = warm_updates
+        self.save_interval_s = save_interval_s
+        self._floors = {}
+        self._saved = {}
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._saved = {k: v for k, v in data.items() if isinstance(v, dict) and "floor_db" in v}
+        except Exception as e:
+            log(f"Noise floor file unreadable ({e}); starting cold.", "warning")
+
+    def get(self, key: str | None) -> NoiseFloor:
+        """The floor for a device; `None` (replayed files, stdin) gets a private, unsaved one."""
+        if key is None:
+            return NoiseFloor(None, self.initial_db, self.warm_updates)
+        with self._lock:
+            nf = self._floors.get(key)
+            if nf is None:
+                nf = NoiseFloor(key, self.initial_db, self.warm_updates)
+                saved = self._saved.get(key)
+                if saved:
+                    try:
+                        nf.floor_db = max(FLOOR_MIN_DB, min(FLOOR_MAX_DB, float(saved["floor_db"])))
+                        nf.total_updates = int(saved.get("updates", 0))
+                        nf.saved_at = float(saved.get("saved_at") or 0.0) or None
+                        nf.restored = True
+                        log(f"Noise floor for {key}: {nf.floor_db:.1f} dBFS (restored)", "info")
+                    except Exception:
+                        pass
+                self._floors[key] = nf
+            return nf
+
+    def save(self, force: bool = False):
+        """Writes every device's floor (atomically). Rate-limited unless `force`."""
+        if not self.path:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_save < self.save_interval_s:
+            return
+        with self._lock:
+            floors = [nf for nf in self._floors.values() if nf.updates]
+            if not floors:
+                return
+            data = dict(self._saved)
+            for nf in floors:
+                data[nf.key] = nf.to_dict()
+            self._saved = data
+            self._last_save = now
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            log(f"Could not save noise floor: {e}", "warning")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {k: nf.stats() for k, nf in self._floors.items()}
@@ -0,0 +1,732 @@
+"""
+Capture -> transcribe -> refine -> inject, as one engine shared by the GUI (main.py) and
+the TUI (CoreController).
+
+Each step is a Stage with its own worker threads and timing; stages are connected by bounded
+queues, so utterances overlap across stages (the LLM refines N while Whisper decodes N+1).
+Capture feeds a SegmentQueue (with its backpressure policy); injection always happens in
+capture order, whatever the per-stage concurrency.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+import numpy as np
+from core.settings import manager as settings
+from core.logger import log
+from core import tracing
+from core import metrics
+
+STAGE_SECONDS = metrics.histogram("stage_seconds", "Service time of a pipeline stage per utterance (transcribe, refine, inject).")
+CAPTURE_SECONDS = metrics.histogram("capture_seconds", "End of speech (or PTT key-up) to segment queued for transcription.")
+END_TO_INJECT_SECONDS = metrics.histogram("speech_end_to_injected_seconds", "End of speech (or PTT key-up) to text injected.")
+SEGMENTS = metrics.counter("segments_total", "Segments captured, by source.")
+SEGMENTS_LOST = metrics.counter("segments_lost_total", "Segments not injected, by reason.")
+LLM_SKIPS = metrics.counter("llm_refine_skipped_total", "Utterances not sent to the LLM (policy).")
+
+
+class SegmentQueue:
+    """
+    Bounded hand-off between continuous capture (producer) and processing (consumer).
+
+    Backpressure policy when full:
+      drop_oldest - evict the oldest queued segment (capture never stalls)
+      merge       - append the new audio to the newest queued segment
+      block       - producer waits for space (the capture ring keeps recording meanwhile)
+    """
+
+    POLICIES = ("drop_oldest", "merge", "block")
+
+    def __init__(self, maxsize: int = 4, policy: str = "drop_oldest"):
+        self.maxsize = max(1, int(maxsize))
+        if policy not in self.POLICIES:
+            log(f"Unknown pipeline queue policy {policy!r}; using drop_oldest.", "warning")
+            policy = "drop_oldest"
+        self.policy = policy
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.merged = 0
+        self.max_depth = 0
+        self.blocked_s = 0.0
+
+    def put(self, audio: np.ndarray, meta: dict | None = None) -> bool:
+        """Returns False if the queue was closed before the segment could be queued."""
+        item = {"audio": audio, "meta": dict(meta or {}), "queued_at": time.monotonic()}
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == "drop_oldest":
+                    tracing.finish(self._items.popleft()["meta"].get("trace"), "dropped:queue_full")
+                    SEGMENTS_LOST.inc(reason="queue_full")
+                    self.dropped += 1
+                    log(f"Segment queue full ({self.maxsize}); dropped oldest segment.", "warning")
+                elif self.policy == "merge":
+                    last = self._items[-1]
+                    last["audio"] = np.concatenate((last["audio"], audio)).astype(np.float32, copy=False)
+                    last["meta"]["merged"] = int(last["meta"].get("merged", 0)) + 1
+                    tracing.finish(item["meta"].get("trace"), "merged")
+                    self.merged += 1
+                    self.enqueued += 1
+                    log(f"Segment queue full ({self.maxsize}); merged into newest segment.", "info")
+                    self._cond.notify_all()
+                    return True
+                else:
+                    t0 = time.monotonic()
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    self.blocked_s += time.monotonic() - t0
+                    if self._closed:
+                        return False
+
+            self._items.append(item)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: float | None = None) -> dict | None:
+        """Next segment dict ({audio, meta, queued_at}) or None on timeout/close."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self.dequeued += 1
+            self._cond.notify_all()
+            return item
+
+    def clear(self) -> int:
+        with self._cond:
+            n = len(self._items)
+            for item in self._items:
+                tracing.finish(item["meta"].get("trace"), "cancelled")
+            self._items.clear()
+            self._cond.notify_all()
+            return n
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def depth(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "maxsize": self.maxsize,
+                "policy": self.policy,
+                "enqueued": self.enqueued,
+                "dequeued": self.dequeued,
+                "dropped": self.dropped,
+                "merged": self.merged,
+                "blocked_s": round(self.blocked_s, 3),
+            }
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    return round(float(np.percentile(np.fromiter(values, dtype=np.float64), q)), 4)
+
+
+class Utterance:
+    """One captured segment on its way through the stages."""
+
+    def __init__(self, seq: int, audio: np.ndarray, meta: dict, queued_at: float, generation: int = 0):
+        self.seq = seq
+        self.audio = audio
+        self.meta = meta
+        self.queued_at = queued_at  # time.monotonic() when capture handed it over
+        self.generation = generation
+        self.raw_text = None
+        self.text = None
+        self.confidence = "unknown"
+        self.lang = None
+        self.audio_s = 0.0
+        self.dropped = False  # a stage rejected it; later stages pass it through untouched
+        self.dropped_by = None
+        self.trace = meta.get("trace")  # tracing.Trace or None
+        self.timings = {}     # "<stage>_s" (service) and "<stage>_wait_s" (queued), seconds
+        self._stage_in = queued_at
+
+
+class Stage:
+    """
+    One step of the pipeline. Subclasses implement process(utt) and return the utterance
+    to pass on, or None to drop it (e.g. nothing was transcribed).
+    """
+
+    name = "stage"
+    max_workers = None  # e.g. 1 for stages that share single-call state or must stay serial
+    ordered = False     # True: utterances arrive in capture order (reordered in front of the stage)
+
+    def __init__(self, workers: int = 1):
+        workers = max(1, int(workers))
+        if self.max_workers is not None and workers > self.max_workers:
+            log(f"Pipeline stage {self.name} supports {self.max_workers} worker(s); ignoring {workers}.", "warning")
+            workers = self.max_workers
+        self.workers = workers
+        self.pipeline = None
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.active = 0
+        self.busy_s = 0.0
+        self._service = deque(maxlen=512)
+        self._wait = deque(maxlen=512)
+
+    def process(self, utt: Utterance) -> Utterance | None:
+        raise NotImplementedError
+
+    def after(self, utt: Utterance):
+        """Runs on the same worker after process() (not timed), before the hand-off."""
+
+    def _run(self, utt: Utterance, waited_s: float) -> Utterance | None:
+        with self._lock:
+            self.active += 1
+        t0 = time.perf_counter()
+        out, failed = None, False
+        with tracing.activate(utt.trace):
+            tracing.mark(f"{self.name}_start")
+            try:
+                out = self.process(utt)
+            except Exception as e:
+                failed = True
+                log(f"Pipeline Error ({self.name}): {e}", "error")
+            tracing.mark(f"{self.name}_end")
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, stage=self.name)
+        utt.timings[f"{self.name}_s"] = round(dt, 4)
+        utt.timings[f"{self.name}_wait_s"] = round(waited_s, 4)
+        with self._lock:
+            self.active -= 1
+            self.processed += 1
+            self.busy_s += dt
+            self.errors += int(failed)
+            self.dropped += int(out is None)
+            self._service.append(dt)
+            self._wait.append(waited_s)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            service, wait = list(self._service), list(self._wait)
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "busy_s": round(self.busy_s, 3),
+                "service_p50_s": _percentile(service, 50),
+                "service_p95_s": _percentile(service, 95),
+                "wait_p50_s": _percentile(wait, 50),
+                "wait_p95_s": _percentile(wait, 95),
+            }
+
+
+class CaptureStage:
+    """
+    Source stage: owns the microphone as CaptureControl says and feeds the SegmentQueue.
+      listening    - continuous voice-activation segmenter
+      push_to_talk - press()/release() hold capture, or tap() for one VAD-gated utterance
+    One capture owner at a time (`lock`): the voice loop, a PTT hold or a PTT tap.
+    """
+
+    name = "capture"
+
+    def __init__(self, startup, control, out: SegmentQueue, on_capturing=None):
+        self.startup = startup
+        self.control = control
+        self.out = out
+        self.on_capturing = on_capturing # Function() called when `capturing` flips
+        self.lock = threading.Lock()
+        self.capturing = False
+        self._holding = False # PTT key is down (hold mode); owns `lock` until key-up
+        self._pressed_at = 0.0
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.audio_s = 0.0
+        self._lengths = deque(maxlen=512)
+        self._handoff = deque(maxlen=512) # end of speech / key-up -> queued
+        control.on_change(self._on_control_change)
+
+    @property
+    def audio(self):
+        return self.startup.audio
+
+    def start(self):
+        threading.Thread(target=self._worker, name="pipeline-capture", daemon=True).start()
+
+    def _set_capturing(self, value: bool):
+        self.capturing = value
+        if self.on_capturing:
+            self.on_capturing()
+
+    def _emit(self, audio_data, meta: dict):
+        if self.control.state in ("paused", "stopped") or len(audio_data) == 0:
+            return
+        if meta.get("trace") is not None:
+            meta["trace"].mark("enqueued")
+        self.out.put(audio_data, meta)
+        with self._lock:
+            self.segments += 1
+            seconds = len(audio_data) / float(self.audio.sample_rate)
+            self.audio_s += seconds
+            self._lengths.append(seconds)
+            if meta.get("captured_at"):
+                self._handoff.append(time.monotonic() - float(meta["captured_at"]))
+                CAPTURE_SECONDS.observe(self._handoff[-1])
+        SEGMENTS.inc(source=meta.get("source", "unknown"))
+        depth = self.out.depth()
+        if depth > 1:
+            log(f"Segment queue depth: {depth}", "info")
+
+    def _on_control_change(self, before: str, after: str):
+        if (before == "listening" or after in ("paused", "stopped")) and self.audio:
+            self.audio.stop_recording() # Wakes the blocked capture read now, not at its next chunk
+        if after in ("paused", "stopped") and self.audio:
+            self.audio.cancel_hold()
+
+    def _worker(self):
+        if not self.startup.wait_ready():
+            return
+        # Blocks on CaptureControl between states: no polling, transitions apply at once.
+        state = self.control.state
+        while state != "stopped":
+            timeout = None
+            if state == "push_to_talk":
+                self.audio.prepare_hold() # Keep the ring live: key presses draw their pre-roll from it
+            elif state == "listening":
+                if not self._voice_activation_pass():
+                    timeout = 1.0 # Capture error: retry shortly unless the state changes first
+                elif not self.audio.input_exhausted:
+                    state = self.control.state
+                    continue
+                # else: replayed file/stdin input is finished; nothing more to segment
+            state = self.control.wait_change(state, timeout)
+
+    def _voice_activation_pass(self) -> bool:
+        """Runs the segmenter until the state leaves `listening`; False on a capture error."""
+        with self.lock:
+            self._set_capturing(True)
+            segments = self.audio.stream_segments()
+            try:
+                if self.control.state != "listening":
+                    # Left `listening` before stream_segments() armed: that transition's stop_recording()
+                    # was overwritten, so nothing would interrupt the read. Later ones are not lost.
+                    return True
+                for event in segments:
+                    if event.kind == "start" and self.startup.residency:
+                        self.startup.residency.wake() # Reload evicted models while the user speaks
+                    if event.kind == "end":
+                        st = event.stats
+                        trace = tracing.Trace("voice_activation")
+                        trace.mark("speech_onset", st.get("onset_t"))
+                        trace.mark("trigger_confirm", st.get("trigger_t"))
+                        trace.mark("speech_end", st.get("last_speech_t"))
+                        trace.mark("stream_close", event.t)
+                        self._emit(event.audio, {"source": "voice_activation", "captured_at": event.t, "trace": trace})
+                    if self.control.state != "listening":
+                        break
+                return True
+            except Exception as e:
+                log(f"Capture Error: {e}", "error")
+                return False
+            finally:
+                segments.close()
+                self._set_capturing(False)
+
+    def _ready_for_ptt(self) -> bool:
+        if not self.startup.ready.is_set():
+            log("Push-to-talk ignored: models still loading.", "info")
+            return False
+        return self.control.state == "push_to_talk"
+
+    def tap(self):
+        """A press starts one VAD-gated utterance (ends on silence)."""
+        if not self._ready_for_ptt():
+            return
+        if self.startup.residency: self.startup.residency.wake()
+        def _job():
+            if self.lock.acquire(blocking=False):
+                try:
+                    self._set_capturing(True)
+                    trace = tracing.Trace("push_to_talk")
+                    trace.mark("key_down")
+                    audio_data = self.audio.listen_single_segment()
+                    trace.mark("stream_close")
+                    self._emit(audio_data, {"source": "push_to_talk", "trace": trace})
+                except Exception:
+                    pass
+                finally:
+                    self.lock.release()
+                    self._set_capturing(False)
+        threading.Thread(target=_job, daemon=True).start()
+
+    def press(self):
+        """Hold mode key-down: starts recording (with pre-roll). Key auto-repeat is ignored."""
+        t = time.monotonic()
+        if self._holding or not self._ready_for_ptt():
+            return
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            self.audio.begin_hold(t)
+        except Exception as e:
+            log(f"Push-to-talk Error: {e}", "error")
+            self.lock.release()
+            return
+        self._holding = True
+        self._pressed_at = t
+        if self.startup.residency: self.startup.residency.wake() # Reload evicted models while the key is held
+        self._set_capturing(True)
+
+    def release(self):
+        """Hold mode key-up: the segment ends now and goes straight to the transcriber."""
+        t = time.monotonic()
+        if not self._holding:
+            return
+        self._holding = False
+        t_press = self._pressed_at
+        def _job():
+            try:
+                audio_data = self.audio.end_hold(t)
+                trace = tracing.Trace("push_to_talk_hold")
+                trace.mark("key_down", t_press)
+                trace.mark("key_up", t)
+                trace.mark("stream_close")
+                self._emit(audio_data, {"source": "push_to_talk", "captured_at": t, "trace": trace})
+            except Exception as e:
+                log(f"Push-to-talk Error: {e}", "error")
+            finally:
+                self.lock.release()
+                self._set_capturing(False)
+        threading.Thread(target=_job, daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lengths, handoff = list(self._lengths), list(self._handoff)
+            return {
+                "state": self.control.state,
+                "capturing": self.capturing,
+                "segments": self.segments,
+                "audio_s": round(self.audio_s, 2),
+                "segment_p50_s": _percentile(lengths, 50),
+                "segment_p95_s": _percentile(lengths, 95),
+                "handoff_p50_s": _percentile(handoff, 50),
+                "handoff_p95_s": _percentile(handoff, 95),
+            }
+
+
+class TranscribeStage(Stage):
+    # The transcriber reports per-call results through last_stats/last_confidence and already
+    # spreads a decode over WHISPER_NUM_WORKERS, so one caller at a time.
+    name = "transcribe"
+    max_workers = 1
+
+    def __init__(self, startup, workers: int = 1):
+        super().__init__(workers)
+        self.startup = startup
+
+    def process(self, utt):
+        lang_code = settings.get("transcription_language")
+        if lang_code == "auto": lang_code = None
+
+        transcriber = self.startup.transcriber
+        raw_text = transcriber.transcribe(utt.audio, language=lang_code)
+        if self.startup.residency: self.startup.residency.touch()
+        if not raw_text:
+            return None
+        stats = getattr(transcriber, "last_stats", {}) or {}
+        utt.raw_text = raw_text
+        utt.confidence = getattr(transcriber, "last_confidence", "unknown")
+        utt.lang = (stats.get("lang") or "").lower() or None
+        utt.audio_s = float(stats.get("audio_seconds") or 0.0)
+        utt.audio = None # Whisper is done with it; don't hold the samples through the LLM
+        return utt
+
+
+class RefineStage(Stage):
+    """Optional LLM grammar pass (Ollama); utterances that don't qualify pass through as-is."""
+
+    name = "refine"
+
+    def __init__(self, startup, workers: int = 1):
+        super().__init__(workers)
+        self.startup = startup
+        self.skipped = 0
+
+    @staticmethod
+    def should_refine(utt: Utterance) -> bool:
+        if not settings.get("use_intelligence"):
+            return False # Raw Mode wins over the per-language lists
+
+        lang = utt.lang or ""
+        if lang and lang in [str(x).lower() for x in (settings.get("llm_refine_skip_languages") or [])]:
+            return False
+        if lang and lang in [str(x).lower() for x in (settings.get("llm_refine_force_languages") or [])]:
+            return True
+
+        # Extra safety: skip LLM on short utterances (most common place for unintended "translation").
+        try:
+            min_audio_s = float(settings.get("llm_refine_min_audio_s"))
+            if utt.audio_s and utt.audio_s < min_audio_s:
+                return False
+        except Exception:
+            pass
+
+        try:
+            min_words = int(settings.get("llm_refine_min_words"))
+            if min_words > 0:
+                wc = len([w for w in (utt.raw_text or "").strip().split() if w])
+                if wc < min_words:
+                    return False
+        except Exception:
+            pass
+
+        want = str(settings.get("llm_refine_min_confidence") or "high").lower()
+        rank = {"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}
+        return rank.get(utt.confidence, 0) >= rank.get(want, 3)
+
+    def process(self, utt):
+        if self.should_refine(utt) and self.startup.intelligence:
+            utt.text = self.startup.intelligence.refine_text(utt.raw_text)
+        else:
+            with self._lock:
+                self.skipped += 1
+            LLM_SKIPS.inc()
+            utt.text = utt.raw_text # Raw Mode
+        return utt
+
+    def stats(self) -> dict:
+        return {**super().stats(), "skipped": self.skipped}
+
+
+class InjectStage(Stage):
+    """Types the text into the focused window, strictly in capture order."""
+
+    name = "inject"
+    max_workers = 1
+    ordered = True
+
+    def __init__(self, startup):
+        super().__init__(1)
+        self.startup = startup
+
+    @staticmethod
+    def success_hold_s() -> float:
+        try:
+            return max(0.05, float(settings.get("success_hold_ms")) / 1000.0)
+        except Exception:
+            return 0.35
+
+    def process(self, utt):
+        if not utt.text:
+            return None
+        self.startup.injector.type_text(utt.text)
+        return utt
+
+    def after(self, utt):
+        if utt.dropped:
+            return
+        self.pipeline.notify("SUCCESS")
+        if self.pipeline.in_flight <= 1:
+            time.sleep(self.success_hold_s()) # Let the overlay show SUCCESS; nothing else is waiting
+        else:
+            self.pipeline.notify("PROCESSING")
+
+
+class Pipeline:
+    """
+    Runs `stages` over utterances taken from `source` (the capture SegmentQueue).
+
+    `on_state(state)` gets "PROCESSING" when work arrives, "SUCCESS" from the inject stage, and
+    None when the last in-flight utterance is finished (the caller shows IDLE/LISTENING).
+    """
+
+    def __init__(self, source: SegmentQueue, stages: list, queue_max: int = 2, on_state=None):
+        self.source = source
+        self.stages = list(stages)
+        self.queues = [queue.Queue(maxsize=max(1, int(queue_max))) for _ in self.stages]
+        self.on_state = on_state
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._in_flight = 0
+        self._next_seq = [0] * len(self.stages)
+        self._pending = [{} for _ in self.stages]
+        self._order_locks = [threading.Lock() for _ in self.stages]
+        self._draining = [False] * len(self.stages)
+        self._feeder = None
+        self._workers = [[] for _ in self.stages]
+        self.completed = 0
+        self.cancelled = 0
+        self._latency = deque(maxlen=512)   # queued -> injected
+        self._after_end = deque(maxlen=512) # end of speech / key-up -> injected
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def busy(self) -> bool:
+        return self._in_flight > 0
+
+    def start(self):
+        for stage in self.stages:
+            stage.pipeline = self
+        self._feeder = self._spawn(self._feed, "pipeline-feed")
+        for idx, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                self._workers[idx].append(self._spawn(self._work, f"pipeline-{stage.name}-{n}", idx))
+
+    def _spawn(self, target, name, *args) -> threading.Thread:
+        t = threading.Thread(target=target, args=args, name=name, daemon=True)
+        t.start()
+        return t
+
+    def notify(self, state):
+        if self.on_state:
+            try:
+                self.on_state(state)
+            except Exception:
+                pass
+
+    def cancel_pending(self):
+        """Drops everything captured so far (queued or mid-pipeline); work already running finishes unused."""
+        with self._lock:
+            self.generation += 1
+        self.source.clear()
+
+    def _feed(self):
+        while True:
+            item = self.source.get() # Blocks until capture hands over a segment (None once closed)
+            if item is None:
+                return
+            with self._lock:
+                utt = Utterance(self._seq, item["audio"], item["meta"], item["queued_at"], self.generation)
+                self._seq += 1
+                self._in_flight += 1
+                first = self._in_flight == 1
+            if first:
+                self.notify("PROCESSING")
+            self._hand_off(0, utt)
+
+    def _hand_off(self, idx: int, utt: Utterance):
+        if idx >= len(self.stages):
+            self._finish(utt)
+            return
+        utt._stage_in = time.monotonic()
+        if not self.stages[idx].ordered:
+            self.queues[idx].put(utt)
+            return
+        # Ordered stage: park the utterance, then one thread at a time releases the in-order run.
+        # The (possibly blocking) put happens outside the order lock, so a full downstream queue
+        # only stalls the releasing thread; everyone else just parks their utterance and moves on.
+        with self._order_locks[idx]:
+            self._pending[idx][utt.seq] = utt
+            if self._draining[idx]:
+                return # The releasing thread will pick it up
+            self._draining[idx] = True
+        while True:
+            with self._order_locks[idx]:
+                nxt = self._pending[idx].pop(self._next_seq[idx], None)
+                if nxt is None:
+                    self._draining[idx] = False
+                    return
+                self._next_seq[idx] += 1
+            self.queues[idx].put(nxt)
+
+    def _work(self, idx: int):
+        stage, q = self.stages[idx], self.queues[idx]
+        while True:
+            utt = q.get()
+            if utt is None:
+                return
+            if utt.generation != self.generation:
+                utt.dropped = True
+            if not utt.dropped:
+                if stage._run(utt, time.monotonic() - utt._stage_in) is None:
+                    utt.dropped = True
+                    utt.dropped_by = stage.name
+                stage.after(utt)
+            self._hand_off(idx + 1, utt)
+
+    def _finish(self, utt: Utterance):
+        now = time.monotonic()
+        cancelled = utt.generation != self.generation
+        tracing.finish(
+            utt.trace,
+            "cancelled" if cancelled else (f"dropped:{utt.dropped_by}" if utt.dropped else "ok"),
+            seq=utt.seq, lang=utt.lang, confidence=utt.confidence, audio_s=round(utt.audio_s, 2),
+            chars=len(utt.text or ""), refined=bool(utt.text and utt.text != utt.raw_text),
+        )
+        with self._lock:
+            self._in_flight -= 1
+            idle = self._in_flight == 0
+            if cancelled:
+                self.cancelled += 1
+                SEGMENTS_LOST.inc(reason="cancelled")
+            elif utt.dropped:
+                SEGMENTS_LOST.inc(reason=f"dropped_{utt.dropped_by}")
+            else:
+                self.completed += 1
+                self._latency.append(now - utt.queued_at)
+                captured_at = utt.meta.get("captured_at")
+                if captured_at:
+                    self._after_end.append(now - float(captured_at))
+                    END_TO_INJECT_SECONDS.observe(self._after_end[-1])
+        if idle:
+            self.notify(None)
+
+    def stop(self, timeout: float = 3.0):
+        """
+        Closes the source and ends the workers stage by stage: each stage gets its sentinels once the
+        stage in front of it has exited, so a full queue only delays them instead of losing them.
+        """
+        self.source.close()
+        deadline = time.monotonic() + max(0.0, timeout)
+        upstream = [self._feeder] if self._feeder else []
+        for idx, stage in enumerate(self.stages):
+            for t in upstream:
+                t.join(max(0.0, deadline - time.monotonic()))
+            for _ in self._workers[idx]:
+                try:
+                    self.queues[idx].put(None, timeout=max(0.05, deadline - time.monotonic()))
+                except queue.Full:
+                    log(f"Pipeline stop: {stage.name} queue still full after {timeout:.0f}s; its workers are left running.", "warning")
+                    break
+            upstream = self._workers[idx]
+        for t in upstream:
+            t.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            latency, after_end = list(self._latency), list(self._after_end)
+            out = {
+                "capture_queue": self.source.stats(),
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "queued_to_injected_p50_s": _percentile(latency, 50),
+                "queued_to_injected_p95_s": _percentile(latency, 95),
+                "speech_end_to_injected_p50_s": _percentile(after_end, 50),
+                "speech_end_to_injected_p95_s": _percentile(after_end, 95),
+            }
+        out["stages"] = {s.name: {**s.stats(), "queued": self.queues[i].qsize()} for i, s in enumerate(self.stages)}
+        return out
@@ -0,0 +1,127 @@
+import threading
+import time
+from core.settings import manager as settings
+from core.logger import log
+from core.memory import process_rss_mb, format_mb
+
+
+class ResidencyManager:
+    """
+    Unloads Whisper (and releases the Ollama model) after `idle_unload_timeout_s` without
+    dictation, and reloads them on demand.
+
+    Callers report:
+      touch() - an utterance was processed (resets the idle clock)
+      wake()  - speech onset or a PTT press: start reloading now, in the background,
+                so the load overlaps with the user still speaking
+    Transcriber.transcribe() also reloads synchronously as a last resort.
+    """
+
+    def __init__(self, transcriber, intelligence=None):
+        self.transcriber = transcriber
+        self.intelligence = intelligence
+        self._last_activity = time.monotonic()
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._ollama_released = False
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self.unloads = 0
+        self.reloads = 0
+        self.last_reload_s = 0.0
+        self.total_reload_s = 0.0
+        self.last_reclaimed_mb = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._monitor, name="model-residency", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _timeout_s(self) -> float:
+        try:
+            return max(0.0, float(settings.get("idle_unload_timeout_s")))
+        except Exception:
+            return 0.0
+
+    def touch(self):
+        self._last_activity = time.monotonic()
+
+    def wake(self):
+        self.touch()
+        with self._lock:
+            if self._reloading or (self.transcriber.is_loaded and not self._ollama_released):
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="model-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            if self._ollama_released and self.intelligence is not None:
+                # Fire and forget: Ollama loads on its own process while Whisper loads here.
+                threading.Thread(target=self.intelligence.preload, daemon=True).start()
+                self._ollama_released = False
+            loaded_s = self.transcriber.ensure_loaded()
+            if loaded_s > 0:
+                self.reloads += 1
+                self.last_reload_s = loaded_s
+                self.total_reload_s += loaded_s
+                log(f"Models reloaded on demand in {loaded_s:.2f}s", "info")
+        except Exception as e:
+            log(f"Model reload failed: {e}", "error")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _unload(self):
+        rss_before = process_rss_mb()
+        unloaded = self.transcriber.unload()
+        rss_after = process_rss_mb()
+        released = False
+        if settings.get("idle_unload_ollama") and self.intelligence is not None and not self._ollama_released:
+            released = self.intelligence.release()
+            self._ollama_released = released
+        if not (unloaded or released):
+            return
+        self.unloads += 1
+        if rss_before is not None and rss_after is not None:
+            self.last_reclaimed_mb = round(rss_before - rss_after, 1)
+        log(
+            f"Idle for {self._timeout_s():.0f}s: unloaded Whisper (reclaimed {format_mb(self.last_reclaimed_mb)} host RSS)"
+            + ("; released Ollama model" if released else ""),
+            "info",
+        )
+
+    def _monitor(self):
+        while not self._stop.is_set():
+            timeout = self._timeout_s()
+            if timeout <= 0:
+                self._stop.wait(30.0)
+                continue
+            idle = time.monotonic() - self._last_activity
+            if not self.transcriber.is_loaded or self._reloading:
+                self._stop.wait(min(30.0, timeout))
+                continue
+            if idle >= timeout:
+                try:
+                    self._unload()
+                except Exception as e:
+                    log(f"Idle unload failed: {e}", "error")
+                continue
+            self._stop.wait(max(1.0, min(30.0, timeout - idle)))
+
+    def stats(self) -> dict:
+        return {
+            "loaded": bool(self.transcriber.is_loaded),
+            "idle_s": round(time.monotonic() - self._last_activity, 1),
+            "unloads": self.unloads,
+            "reloads": self.reloads,
+            "last_reload_s": round(self.last_reload_s, 3),
+            "avg_reload_s": round(self.total_reload_s / self.reloads, 3) if self.reloads else 0.0,
+            "last_reclaimed_mb": self.last_reclaimed_mb,
+        }
@@ -0,0 +1,362 @@
+"""
+Voice-activation segmenter: a pure state machine over sample-indexed audio.
+
+No device reads, no wall-clock time: positions are absolute sample indices and every
+duration (start confirm, hangover, cooldown, max segment) is counted in samples.
+The live path (AudioEngine.stream_segments) and offline tools feed the same class, so a
+recording segments exactly as it would have live.
+
+RMS/dBFS is computed for a whole block of chunks at once; the per-chunk gate is scalar.
+The VAD model only runs on chunks that are not obviously below the noise floor.
+
+Low-power idle: after `low_power_after_samples` of quiet (no speech, energy within
+`low_power_rearm_db` of the floor), VAD stops running and only the energy gate is
+evaluated; the first chunk above floor + rearm_db runs VAD again. `low_power` tells the
+driver it may switch to larger, less frequent reads; every chunk of a batch is still gated,
+so no onset is lost.
+
+While disarmed (no segment, no start candidate) the VAD can run on a reduced schedule:
+every `vad_idle_stride`-th chunk, over the last `vad_idle_window` samples. Skipped chunks
+hold the previous probability. The first chunk that rises above the noise floor, and every
+chunk once a start candidate appears, is evaluated at full rate.
+"""
+
+import math
+import numpy as np
+from core.settings import manager as settings
+from core.logger import log
+from core.noise_floor import NoiseFloor
+
+
+class SegmentEvent:
+    """One step of a streamed voice-activation segment (see AudioEngine.stream_segments)."""
+    __slots__ = ("kind", "t", "start_pos", "end_pos", "audio", "stats")
+
+    def __init__(self, kind: str, t: float, start_pos: int, end_pos: int, audio=None, stats=None):
+        self.kind = kind              # start|chunk|end|discard
+        self.t = t                    # time.monotonic() at which `start_pos` (chunk/start) or `end_pos` (end/discard) was captured
+        self.start_pos = start_pos    # absolute sample positions on the capture clock
+        self.end_pos = end_pos
+        self.audio = audio
+        self.stats = stats or {}
+
+    def __repr__(self):
+        return f"SegmentEvent({self.kind}, t={self.t:.3f}, samples=[{self.start_pos},{self.end_pos}))"
+
+
+def load_gate_params(sample_rate: int, chunk_size: int) -> dict:
+    """Snapshot of the voice-activation tuning (read once per segment so Settings changes apply live)."""
+    threshold = float(settings.get("vad_threshold"))
+    silence_dur = float(settings.get("silence_duration"))
+
+    start_confirm_ms = int(settings.get("voice_activation_start_confirm_ms"))
+    hangover_ms = int(settings.get("voice_activation_hangover_ms"))
+    cooldown_ms = int(settings.get("voice_activation_cooldown_ms"))
+    pre_roll_ms = int(settings.get("voice_activation_pre_roll_ms"))
+    start_speech_prob = float(settings.get("voice_activation_start_speech_prob"))
+    stop_speech_prob = float(settings.get("voice_activation_stop_speech_prob"))
+    max_segment_s = float(settings.get("voice_activation_max_segment_s"))
+
+    # Backwards-compatible: allow the legacy single threshold to still affect gating.
+    start_speech_prob = max(start_speech_prob, threshold)
+    stop_speech_prob = min(stop_speech_prob, start_speech_prob - 0.08) if stop_speech_prob >= start_speech_prob else stop_speech_prob
+
+    chunk_ms = (chunk_size / sample_rate) * 1000.0
+    pre_roll_chunks = max(1, int(math.ceil(pre_roll_ms / chunk_ms)))
+    return {
+        "chunk_ms": chunk_ms,
+        "start_confirm_chunks": max(1, int(math.ceil(start_confirm_ms / chunk_ms))),
+        "pre_roll_samples": pre_roll_chunks * chunk_size,
+        # Timing runs on the capture sample clock (absolute sample positions), not wall time,
+        # so a consumer delayed by the GIL still measures silence/hangover exactly.
+        "effective_silence_samples": int((silence_dur + (hangover_ms / 1000.0)) * sample_rate),
+        "max_segment_samples": int(max_segment_s * sample_rate),
+        "max_segment_s": max_segment_s,
+        "cooldown_samples": int((cooldown_ms / 1000.0) * sample_rate),
+        "cooldown_ms": cooldown_ms,
+        "min_segment_ms": int(settings.get("voice_activation_min_segment_ms")),
+        "min_speech_ms": int(settings.get("voice_activation_min_speech_ms")),
+        "start_speech_prob": start_speech_prob,
+        "stop_speech_prob": stop_speech_prob,
+        "start_db_margin": float(settings.get("voice_activation_start_db_margin")),
+        "stop_db_margin": float(settings.get("voice_activation_stop_db_margin")),
+        "noise_update_speech_prob": float(settings.get("voice_activation_noise_update_speech_prob")),
+        "noise_ema_alpha": float(settings.get("voice_activation_noise_ema_alpha")),
+        # Low-power idle: after this much audio below the energy gate, the driver reads in larger blocks.
+        "low_power_after_samples": int(max(0.0, float(settings.get("voice_activation_low_power_after_s") or 0.0)) * sample_rate),
+        "low_power_read_chunks": max(1, int(math.ceil(float(settings.get("voice_activation_low_power_read_ms") or 0.0) / chunk_ms))),
+        "low_power_rearm_db": float(settings.get("voice_activation_low_power_rearm_db")),
+        "vad_idle_stride": max(1, int(settings.get("vad_idle_stride") or 1)),
+        "vad_idle_window": max(chunk_size, int(settings.get("vad_idle_window") or chunk_size)),
+    }
+
+
+def chunk_rms_dbfs(frames: np.ndarray) -> np.ndarray:
+    """dBFS of each row of a (n_chunks, chunk_size) float block."""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    return 20.0 * np.log10(np.maximum(rms, 1e-8))
+
+
+class VoiceSegmenter:
+    """
+    Start-confirm / hysteresis / adaptive noise floor / hangover / cooldown / max-segment gate.
+
+    vad(chunk, state) -> (speech_prob, state) runs the VAD model on one chunk;
+    vad_reset() -> state gives a fresh recurrent state (one per segment).
+    `noise` is the device's NoiseFloor (shared across segmenters and restarts); without one
+    the segmenter keeps a private floor for its own lifetime.
+
+    process(start_pos, samples) consumes any number of whole chunks and returns the
+    SegmentEvents ("start", "end", "discard") they produced. Event `t` is the sample-clock
+    time in seconds (pos / sample_rate); `audio` is left None for the caller to fill.
+    Set `params` between segments to apply new tuning (see load_gate_params).
+    """
+
+    NOISE_FLOOR_INIT_DB = -55.0
+
+    def __init__(self, params: dict, vad, vad_reset, sample_rate: int, chunk_size: int = 512, noise: NoiseFloor | None = None):
+        self.params = params
+        self.noise = noise if noise is not None else NoiseFloor(None, self.NOISE_FLOOR_INIT_DB)
+        self.vad = vad
+        self.vad_reset = vad_reset
+        self.sample_rate = int(sample_rate)
+        self.chunk_size = int(chunk_size)
+        self.resume_pos = 0           # cooldown: chunks before this position are ignored
+        self.first_pos = None
+        self.last_rms_db = -120.0
+        self.last_speech_prob = 0.0
+        self.vad_calls = 0
+        self.chunks_seen = 0
+        # Idle VAD schedule: chunks held since the last idle evaluation, and whether the next
+        # loud chunk must be evaluated immediately (after the energy gate or a candidate).
+        self._idle_held = 0
+        self._idle_due = True
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._tail_end = None
+        # End of the last non-quiet chunk (see quiet_samples).
+        self.last_active_pos = 0
+        self.processed_pos = 0
+        self._reset_segment()
+
+    def _reset_segment(self):
+        self.vad_state = self.vad_reset()
+        self.triggered = False
+        self.start_candidate_count = 0
+        self.speech_ms = 0.0
+        self.segment_start_pos = 0
+        self.trigger_pos = 0
+        self.onset_pos = 0 # first chunk of the confirming run (speech onset as the gate saw it)
+        self.last_speech_pos = 0
+        self.max_speech_prob = 0.0
+        self.max_rms_db = -120.0
+
+    @property
+    def noise_floor_db(self) -> float:
+        """Adaptive noise floor (dBFS); updates only while armed and not in a start-candidate streak."""
+        return self.noise.floor_db
+
+    @property
+    def quiet_samples(self) -> int:
+        """Audio processed since the last chunk with speech, a trigger streak, or energy above floor + rearm_db."""
+        if self.triggered or self.start_candidate_count:
+            return 0
+        return max(0, self.processed_pos - self.last_active_pos)
+
+    @property
+    def low_power(self) -> bool:
+        """Quiet long enough that VAD only re-arms on energy (see low_power_after_samples)."""
+        after = self.params.get("low_power_after_samples", 0)
+        return bool(after) and self.quiet_samples >= after
+
+    def _stats(self) -> dict:
+        return {
+            "max_speech_prob": float(self.max_speech_prob),
+            "max_rms_db": float(self.max_rms_db),
+            "noise_floor_db": float(self.noise_floor_db),
+            "noise_floor_state": self.noise.state,
+            "speech_ms": float(self.speech_ms),
+            "trigger_pos": int(self.trigger_pos),
+            "onset_pos": int(self.onset_pos),
+            "last_speech_pos": int(self.last_speech_pos),
+        }
+
+    def process(self, start_pos: int, samples: np.ndarray, history_start: int | None = None) -> list:
+        """
+        `samples` must hold a whole number of chunks starting at absolute `start_pos`.
+        `history_start` is the oldest position still available to the caller (pre-roll
+        never reaches further back); defaults to the first position ever processed.
+        """
+        cs = self.chunk_size
+        n = samples.shape[0] // cs
+        if n == 0:
+            return []
+        if self.first_pos is None:
+            self.first_pos = int(start_pos)
+            self.last_active_pos = int(start_pos)
+        floor_pos = self.first_pos if history_start is None else int(history_start)
+
+        frames = samples[:n * cs].reshape(n, cs)
+        rms_all = chunk_rms_dbfs(frames).tolist()
+        events = []
+        p = self.params
+        stride = p.get("vad_idle_stride", 1)
+        window = p.get("vad_idle_window", cs)
+
+        # Idle windows wider than a chunk reach back into the previous block.
+        history = None
+        if window > cs:
+            tail = self._tail if self._tail_end == start_pos else self._tail[:0]
+            history = np.concatenate((tail, samples[:n * cs])) if tail.shape[0] else samples[:n * cs]
+            history_pos = start_pos - tail.shape[0]
+            keep = min(window - cs, history.shape[0])
+            self._tail = history[history.shape[0] - keep:].copy()
+            self._tail_end = start_pos + n * cs
+
+        for i in range(n):
+            pos = start_pos + i * cs
+            chunk_end = pos + cs
+            self.processed_pos = chunk_end
+            if pos < self.resume_pos:
+                continue
+            self.chunks_seen += 1
+            rms_db = rms_all[i]
+            self.last_rms_db = rms_db
+            if rms_db > self.max_rms_db:
+                self.max_rms_db = rms_db
+
+            idle = self.start_candidate_count == 0 and not self.triggered
+            rearm = rms_db >= self.noise_floor_db + p.get("low_power_rearm_db", 3.0)
+            # Energy gate: well below the noise floor and no trigger streak -> skip VAD inference.
+            if idle and rms_db < (self.noise_floor_db - 5.0):
+                speech_prob = 0.0
+                self._idle_due = True
+            elif idle and not rearm and self.low_power:
+                # Low-power idle: energy-only. Below floor + rearm_db the start gate cannot fire anyway.
+                speech_prob = 0.0
+                self._idle_due = True
+            elif idle and not self._idle_due and self._idle_held < stride - 1:
+                # Reduced idle schedule: hold the last (sub-threshold) probability.
+                speech_prob = self.last_speech_prob
+                self._idle_held += 1
+            else:
+                chunk = frames[i]
+                if idle and history is not None and chunk_end - window >= history_pos:
+                    chunk = history[chunk_end - window - history_pos:chunk_end - history_pos]
+                speech_prob, self.vad_state = self.vad(chunk, self.vad_state)
+                speech_prob = float(speech_prob)
+                self.vad_calls += 1
+                self._idle_held = 0
+                self._idle_due = not idle
+            self.last_speech_prob = speech_prob
+            if not idle or rearm or speech_prob > p["noise_update_speech_prob"]:
+                self.last_active_pos = chunk_end
+            if speech_prob > self.max_speech_prob:
+                self.max_speech_prob = speech_prob
+
+            if not self.triggered:
+                # Update baseline noise floor only when we're not in speech and not already trending toward a trigger.
+                if self.start_candidate_count == 0 and speech_prob <= p["noise_update_speech_prob"]:
+                    self.noise.update(rms_db, p["noise_ema_alpha"])
+
+                # Start gate: require sustained speech probability AND energy above baseline.
+                if speech_prob >= p["start_speech_prob"] and rms_db >= (self.noise_floor_db + p["start_db_margin"]):
+                    self.start_candidate_count += 1
+                else:
+                    self.start_candidate_count = 0
+
+                if self.start_candidate_count >= p["start_confirm_chunks"]:
+                    self.triggered = True
+                    self.trigger_pos = chunk_end
+                    self.onset_pos = max(chunk_end - p["start_confirm_chunks"] * self.chunk_size, floor_pos)
+                    self.last_speech_pos = chunk_end
+                    # Pre-roll is the audio just before the confirming chunk.
+                    self.segment_start_pos = max(chunk_end - p["pre_roll_samples"], floor_pos)
+                    self.speech_ms = p["start_confirm_chunks"] * p["chunk_ms"]
+                    events.append(SegmentEvent("start", self.segment_start_pos / self.sample_rate, self.segment_start_pos, chunk_end))
+                continue
+
+            # Track "speech present" with hysteresis + energy margin.
+            if speech_prob >= p["stop_speech_prob"] or rms_db >= (self.noise_floor_db + p["stop_db_margin"]):
+                self.last_speech_pos = chunk_end
+                self.speech_ms += p["chunk_ms"]
+            # While recording, do NOT update baseline (prevents music from "teaching" the baseline mid-utterance).
+
+            # Stop gate: end after sustained silence + hangover.
+            ended = (chunk_end - self.last_speech_pos) >= p["effective_silence_samples"]
+            # Safety: prevent infinite segments on continuous background noise.
+            if not ended and (chunk_end - self.trigger_pos) >= p["max_segment_samples"]:
+                log("Max segment duration reached; cutting segment.", "warning")
+                ended = True
+            if ended:
+                events.append(self._close(chunk_end))
+
+        return events
+
+    def _close(self, end_pos: int) -> SegmentEvent:
+        p = self.params
+        stats = self._stats()
+        start_pos = self.segment_start_pos
+        # Cooldown on the sample clock: ignore audio right after a segment.
+        self.resume_pos = end_pos + p["cooldown_samples"]
+
+        # Reject very short or likely-false triggers.
+        total_ms = ((end_pos - self.trigger_pos) / self.sample_rate) * 1000.0
+        if total_ms < p["min_segment_ms"] or self.speech_ms < p["min_speech_ms"]:
+            event = SegmentEvent("discard", end_pos / self.sample_rate, start_pos, end_pos, None, {**stats, "reason": "too_short"})
+        else:
+            event = SegmentEvent("end", end_pos / self.sample_rate, start_pos, end_pos, None, stats)
+        self._reset_segment()
+        return event
+
+    def flush(self, end_pos: int, reason: str = "end_of_input") -> SegmentEvent | None:
+        """Abandons an open segment (input ended / recording stopped)."""
+        if not self.triggered:
+            return None
+        event = SegmentEvent("discard", end_pos / self.sample_rate, self.segment_start_pos, end_pos, None, {**self._stats(), "reason": reason})
+        self._reset_segment()
+        return event
+
+
+def segment_array(audio: np.ndarray, segmenter: VoiceSegmenter, block_chunks: int = 256) -> list:
+    """
+    Offline segmentation of a whole signal: returns the "end" and "discard" events.
+    Trailing samples that do not fill a chunk are ignored; an open segment is flushed.
+    """
+    cs = segmenter.chunk_size
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    n = (audio.shape[0] // cs) * cs
+    step = cs * max(1, int(block_chunks))
+    out = []
+    for start in range(0, n, step):
+        out.extend(e for e in segmenter.process(start, audio[start:min(start + step, n)]) if e.kind != "start")
+    tail = segmenter.flush(n)
+    if tail is not None:
+        out.append(tail)
+    return out
+
+
+if __name__ == "__main__":
+    # Offline segmentation throughput, e.g.:  python -m core.segmenter recording.wav
+    import sys
+    import time
+    import config
+    from core.audio import AudioEngine
+    from faster_whisper import decode_audio
+
+    if len(sys.argv) < 2:
+        print("usage: python -m core.segmenter AUDIO_FILE")
+        sys.exit(2)
+    audio = decode_audio(sys.argv[1], sampling_rate=config.SAMPLE_RATE)
+    engine = AudioEngine()
+    seg = engine.make_segmenter()
+    t0 = time.perf_counter()
+    events = segment_array(audio, seg)
+    elapsed = time.perf_counter() - t0
+    sr = float(config.SAMPLE_RATE)
+    for e in events:
+        print(f"{e.kind:<7} {e.start_pos / sr:8.2f}s -> {e.end_pos / sr:8.2f}s  {e.stats.get('reason', '')}")
+    audio_s = len(audio) / sr
+    print(
+        f"\n{audio_s:.1f}s of audio in {elapsed:.3f}s (x{audio_s / elapsed if elapsed else 0:.0f} realtime); "
+        f"VAD ran on {seg.vad_calls}/{seg.chunks_seen} chunks"
+    )
@@ -8,9 +8,18 @@ class SettingsManager:
         self.settings_path = os.path.join(config.BASE_DIR, "user_settings.json")
         self.defaults = {
             "vad_threshold": 0.5,
+            "vad_model": "v4", # Silero "v4", "v5" or a path to an .onnx file (version detected from its inputs)
+            "vad_max_batch": 32, # chunks from concurrent streams stacked into one Silero run
+            "vad_batch_wait_ms": 0.0, # >0 waits this long per batch for more streams to join (adds latency)
+            "vad_threads": 1, # ONNX Runtime intra/inter-op threads for VAD (1 = no pool wake-ups on the audio path)
+            "vad_idle_stride": 1, # while disarmed, run VAD on every Nth loud chunk (1 = every chunk; onset up to N-1 chunks later)
+            "vad_idle_window": 512, # samples per idle VAD call: 512, 1024 or 1536 (v4 only); stride*512 keeps every sample heard
             "silence_duration": 0.8,
             "mode": "voice_activation", # or "push_to_talk"
             "push_to_talk_key": "space", # placeholder for logic, actual hotkey handled by pynput
+            "push_to_talk_hold": True, # record while the key is held (ends on key-up); False = a press starts one VAD-gated utterance
+            "push_to_talk_pre_roll_ms": 300, # audio kept from before key-down (speech often starts with the press)
+            "push_to_talk_min_hold_ms": 150, # shorter holds are treated as accidental taps and dropped
             "input_device_index": None, # Default device
             "use_intelligence": False, # Default to Raw Mode (User Preference)
             "transcription_language": "auto", # auto, en, fr
@@ -30,6 +39,10 @@ class SettingsManager:
             "voice_activation_stop_db_margin": 4.0,
             "voice_activation_noise_update_speech_prob": 0.20,
             "voice_activation_noise_ema_alpha": 0.04,
+            "noise_floor_persist": True, # remember each input device's noise floor across restarts (noise_floor.json)
+            "voice_activation_low_power_after_s": 10.0, # quiet this long -> low-power idle (batched reads); 0 = never
+            "voice_activation_low_power_read_ms": 256, # read size in low-power idle; no audio is lost, the start event is reported up to this late
+            "voice_activation_low_power_rearm_db": 3.0, # in low-power idle, energy this far above the noise floor re-arms VAD (must stay below start_db_margin)
 
             # Transcription stability (faster-whisper decode options)
             "decode_beam_size": 8,
@@ -46,6 +59,12 @@ class SettingsManager:
             "language_detection_threshold": 0.6,
             "language_detection_segments": 3,
 
+            # Progressive beam search: decode with a cheap beam first and only re-decode with
+            # decode_beam_size when the cheap result is below the confidence bar.
+            "decode_progressive_enabled": True,
+            "decode_progressive_first_beam_size": 1,  # 1 = greedy
+            "decode_progressive_min_confidence": "high",  # high|medium
+
             # Noisy-audio second pass (quality-first, may add ~0.2-1.0s)
             "decode_enable_noisy_second_pass": True,
             "decode_noisy_beam_size": 10,
@@ -64,6 +83,8 @@ class SettingsManager:
             "auto_language_ambiguity_min_margin": 0.12,
             "auto_language_force_on_short_utterance": True,
             "auto_language_short_utterance_s": 2.5,
+            "auto_language_parallel_decode": True,  # decode FR/EN candidates concurrently (only with config.WHISPER_NUM_WORKERS > 1; costs extra memory)
+            "auto_language_early_exit_on_high": True,  # stop at the first candidate (in preference order) with high confidence (parallel decodes already running are still awaited)
 
             # Confidence heuristics (reject likely hallucinations / noise-only captures)
             "reject_no_speech_prob": 0.85,
@@ -111,6 +132,35 @@ class SettingsManager:
             "llm_refine_min_confidence": "high",  # high|medium|low
             "llm_refine_min_audio_s": 2.5,
             "llm_refine_min_words": 6,
+            "llm_refine_skip_languages": ["en"], # detected languages never sent to the LLM
+            "llm_refine_force_languages": ["fr"], # detected languages always refined when use_intelligence is on (skips the confidence/length checks)
+
+            # Capture/processing hand-off: segments captured while an earlier one is still
+            # being transcribed/refined wait in a bounded queue.
+            "pipeline_queue_max": 4,
+            "pipeline_queue_policy": "drop_oldest",  # drop_oldest|merge|block
+            "pipeline_stage_queue_max": 2, # hand-off depth between transcribe -> refine -> inject
+            "pipeline_refine_workers": 1, # concurrent LLM requests; injection order is kept regardless
+
+            # Idle model eviction: after this many seconds without dictation, unload Whisper
+            # and ask Ollama to release its model. Speech onset / PTT reloads them.
+            "idle_unload_timeout_s": 0,  # 0 = keep models resident
+            "idle_unload_ollama": True,
+
+            # Audio input: "device" (sound card), "file:PATH" or "stdin" / "stdin:f32" (raw PCM at SAMPLE_RATE).
+            # File/stdin sources replay through the same segmenter, e.g. to reproduce false triggers.
+            "input_source": "device",
+            "input_source_realtime": False,  # pace file/stdin input at wall-clock speed
+
+            # Per-utterance latency traces (logs/traces.jsonl; summarise with `python -m core.tracing`)
+            "trace_enabled": True,
+            "trace_max_mb": 5.0, # rotate the trace file at this size
+            "trace_backups": 3, # rotated files kept (traces.jsonl.1 ...)
+
+            # Metrics publishing (off by default; recording is always in-process and cheap)
+            "metrics_http_port": 0, # >0 serves Prometheus text on http://127.0.0.1:<port>/metrics
+            "metrics_file": "", # e.g. "logs/metrics.prom": same text rewritten every metrics_flush_s
+            "metrics_flush_s": 15.0,
 
             # Voice activation debug (logs segment summaries)
             "voice_activation_debug": False,
@@ -126,6 +176,7 @@ class SettingsManager:
             "setup_completed": False
         }
         self.settings = self.load_settings()
+        self._subscribers = [] # fn(key, value) called after a set() that changes a value
 
     def _warn_and_prune_unknown_keys(self, raw: dict) -> dict:
         if not isinstance(raw, dict):
@@ -168,8 +219,19 @@ class SettingsManager:
         if key not in self.defaults:
             log(f"Attempt to set unknown setting ignored: {key}", "warning")
             return
+        changed = self.get(key) != value
         self.settings[key] = value
         self.save_settings()
+        if changed:
+            for fn in list(self._subscribers):
+                try:
+                    fn(key, value)
+                except Exception as e:
+                    log(f"Settings subscriber error ({key}): {e}", "warning")
+
+    def subscribe(self, fn):
+        """Registers fn(key, value) to run (on the caller's thread) whenever a setting changes."""
+        self._subscribers.append(fn)
 
 # Global singleton
 manager = SettingsManager()
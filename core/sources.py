@@ -0,0 +1,259 @@
+"""
+Non-device input sources for AudioEngine.
+
+Every source is a CaptureStream: it fills the same ring buffer the PortAudio callback
+fills, so the segmenter (stream_segments / listen_single_segment) runs unchanged on it.
+
+Specs (settings "input_source", or `python -m core.sources SPEC`):
+  device        - the sound card (CaptureStream, default)
+  file:PATH     - any audio file faster-whisper can decode (wav/flac/mp3/...), resampled to SAMPLE_RATE
+  stdin         - raw little-endian int16 mono PCM at SAMPLE_RATE on standard input
+  stdin:f32     - same, float32 samples
+
+Pacing:
+  realtime=True  - blocks arrive at wall-clock speed, like a microphone (slow readers get overrun)
+  realtime=False - as fast as the readers consume, in lockstep (deterministic, never overruns)
+"""
+
+import sys
+import threading
+import time
+import numpy as np
+from core.capture import CaptureStream, RingReader
+from core.logger import log
+
+
+class FedCapture(CaptureStream):
+    """
+    CaptureStream fed from `_blocks()` on a thread instead of a device callback.
+    Feeding starts with the first reader. `tail_s` of silence is appended so a segment
+    still open at the end of the input gets closed; then `exhausted` is set.
+    """
+
+    def __init__(self, sample_rate: int, blocksize: int = 512, capacity_s: float = 30.0, realtime: bool = False, tail_s: float = 2.0):
+        super().__init__(sample_rate, device=None, blocksize=blocksize, capacity_s=capacity_s)
+        self.realtime = bool(realtime)
+        self.tail_s = max(0.0, float(tail_s))
+        self._readers = []
+        self._feed_cond = threading.Condition()
+        self._feeder = None
+        self._closed = False
+
+    def _blocks(self):
+        """Yields float32 mono arrays of any length."""
+        raise NotImplementedError
+
+    def reader(self, start: int | None = None) -> RingReader:
+        r = _LockstepReader(self, self.ring.write_pos if start is None else start)
+        with self._feed_cond:
+            self._readers.append(r)
+            self._feed_cond.notify_all()
+        return r
+
+    def _release(self, reader: "_LockstepReader"):
+        with self._feed_cond:
+            self._readers = [r for r in self._readers if r is not reader]
+            self._feed_cond.notify_all()
+
+    def _consumed(self):
+        if self.realtime:
+            return
+        with self._feed_cond:
+            self._feed_cond.notify_all()
+
+    def _caught_up(self) -> bool:
+        # Every reader is blocked waiting for samples that have not been written yet.
+        wp = self.ring.write_pos
+        return self._closed or (bool(self._readers) and all(r.pos + r.want > wp for r in self._readers))
+
+    def _free_samples(self) -> int:
+        # Writing more would overwrite samples the slowest reader has not consumed yet
+        # (a ring smaller than one read plus one block). Never 0 once every reader waits.
+        if not self._readers:
+            return self.blocksize
+        return min(r.pos for r in self._readers) + self.ring.capacity - self.ring.write_pos
+
+    def _publish(self, block: np.ndarray):
+        self.ring.write(block)
+        self._clock_ref = (time.monotonic(), self.ring.write_pos)
+        self._wake()
+
+    def _all_blocks(self):
+        yield from self._blocks()
+        if self.tail_s:
+            yield np.zeros(int(self.tail_s * self.sample_rate), dtype=np.float32)
+
+    def _feed(self):
+        with self._feed_cond:
+            self._feed_cond.wait_for(lambda: self._closed or bool(self._readers))
+        t0 = time.monotonic()
+        bs = self.blocksize
+        try:
+            for data in self._all_blocks():
+                # Re-block to the device block size so pacing/overrun behave like a callback stream.
+                i = 0
+                while i < data.shape[0]:
+                    block = data[i:i + bs]
+                    if self.realtime:
+                        # A device delivers a block once its last sample has been captured.
+                        delay = t0 + (self.ring.write_pos + block.shape[0]) / float(self.sample_rate) - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    else:
+                        with self._feed_cond:
+                            self._feed_cond.wait_for(self._caught_up)
+                            block = block[:self._free_samples()]
+                    if self._closed:
+                        return
+                    self._publish(block)
+                    i += block.shape[0]
+        except Exception as e:
+            log(f"Input source failed: {e}", "error")
+        finally:
+            self.exhausted = True
+            self._wake(force=True)
+
+    def start(self):
+        if self._feeder is not None:
+            return
+        self._feeder = threading.Thread(target=self._feed, name=f"{type(self).__name__}-feed", daemon=True)
+        self._feeder.start()
+
+    def close(self):
+        with self._feed_cond:
+            self._closed = True
+            self._feed_cond.notify_all()
+        self._wake(force=True)
+
+    @property
+    def healthy(self) -> bool:
+        return not (self._closed or self.exhausted)
+
+
+class _LockstepReader(RingReader):
+    """RingReader that tells its FedCapture how much it needs before blocking."""
+
+    def __init__(self, capture: FedCapture, start: int):
+        self.want = 1
+        super().__init__(capture, start)
+
+    def read(self, n: int, timeout: float | None = None):
+        self.want = int(n)
+        self._capture._consumed()
+        return super().read(n, timeout)
+
+    def close(self):
+        super().close()
+        self._capture._release(self)
+
+
+class ArrayCapture(FedCapture):
+    """Replays an in-memory float32 signal."""
+
+    def __init__(self, audio: np.ndarray, sample_rate: int, blocksize: int = 512, capacity_s: float = 30.0, realtime: bool = False, tail_s: float = 2.0):
+        super().__init__(sample_rate, blocksize=blocksize, capacity_s=capacity_s, realtime=realtime, tail_s=tail_s)
+        self._audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+
+    def _blocks(self):
+        yield self._audio
+
+    @property
+    def duration_s(self) -> float:
+        return self._audio.shape[0] / float(self.sample_rate)
+
+
+class FileCapture(ArrayCapture):
+    """Replays an audio file (decoded and resampled up front by faster-whisper's PyAV decoder)."""
+
+    def __init__(self, path: str, sample_rate: int, blocksize: int = 512, capacity_s: float = 30.0, realtime: bool = False, tail_s: float = 2.0):
+        from faster_whisper import decode_audio
+        audio = decode_audio(path, sampling_rate=sample_rate)
+        super().__init__(audio, sample_rate, blocksize=blocksize, capacity_s=capacity_s, realtime=realtime, tail_s=tail_s)
+        self.device = f"file:{path}"
+
+
+class StdinCapture(FedCapture):
+    """Raw mono PCM from standard input (e.g. `arecord -f S16_LE -r 16000 | ...` or a recorded session)."""
+
+    DTYPES = {"s16": (np.int16, 32768.0), "f32": (np.float32, 1.0)}
+
+    def __init__(self, sample_rate: int, blocksize: int = 512, capacity_s: float = 30.0, realtime: bool = False, tail_s: float = 2.0, fmt: str = "s16", stream=None):
+        super().__init__(sample_rate, blocksize=blocksize, capacity_s=capacity_s, realtime=realtime, tail_s=tail_s)
+        if fmt not in self.DTYPES:
+            raise ValueError(f"Unknown PCM format {fmt!r} (expected one of {', '.join(self.DTYPES)})")
+        self._dtype, self._scale = self.DTYPES[fmt]
+        self._pcm = stream if stream is not None else sys.stdin.buffer
+        self.device = f"stdin:{fmt}"
+
+    def _blocks(self):
+        itemsize = np.dtype(self._dtype).itemsize
+        want = self.blocksize * itemsize
+        pending = b""
+        while not self._closed:
+            chunk = self._pcm.read(want)
+            if not chunk:
+                break
+            pending += chunk
+            usable = len(pending) - (len(pending) % itemsize)
+            if usable:
+                samples = np.frombuffer(pending[:usable], dtype=self._dtype).astype(np.float32)
+                pending = pending[usable:]
+                yield samples / self._scale if self._scale != 1.0 else samples
+
+    def close(self):
+        # Never close the process's stdin; the feeder stops at its next read.
+        with self._feed_cond:
+            self._closed = True
+            self._feed_cond.notify_all()
+        self._wake(force=True)
+
+
+def open_source(spec: str | None, sample_rate: int, device=None, blocksize: int = 512, capacity_s: float = 30.0, realtime: bool = False) -> CaptureStream:
+    """Builds a (not yet started) capture stream for a source spec; see the module docstring."""
+    spec = (spec or "device").strip()
+    if spec == "device":
+        return CaptureStream(sample_rate, device=device, blocksize=blocksize, capacity_s=capacity_s)
+    if spec.startswith("file:"):
+        return FileCapture(spec[len("file:"):], sample_rate, blocksize=blocksize, capacity_s=capacity_s, realtime=realtime)
+    if spec == "stdin" or spec.startswith("stdin:"):
+        fmt = spec.split(":", 1)[1] if ":" in spec else "s16"
+        return StdinCapture(sample_rate, blocksize=blocksize, capacity_s=capacity_s, realtime=realtime, fmt=fmt)
+    raise ValueError(f"Unknown input source {spec!r} (expected device, file:PATH, stdin or stdin:f32)")
+
+
+if __name__ == "__main__":
+    # Replays a source through the real segmenter and prints every segment event,
+    # e.g. to reproduce a false trigger from a recorded session:
+    #   python -m core.sources file:session.wav
+    #   sox session.wav -t raw -e signed -b 16 -r 16000 -c 1 - | python -m core.sources stdin --realtime
+    import argparse
+    import config
+    from core.audio import AudioEngine
+
+    parser = argparse.ArgumentParser(description="Replay an input source through the voice-activation segmenter.")
+    parser.add_argument("spec", help="file:PATH, stdin, stdin:f32 or device")
+    parser.add_argument("--realtime", action="store_true", help="Pace input at wall-clock speed")
+    args = parser.parse_args()
+
+    engine = AudioEngine()
+    capacity_s = engine._default_capture_capacity_s() + 5.0
+    capture = open_source(args.spec, engine.sample_rate, device=None, capacity_s=capacity_s, realtime=args.realtime)
+    sr = float(engine.sample_rate)
+    t_start = time.perf_counter()
+    counts = {}
+    try:
+        for event in engine.stream_segments(capture=capture):
+            counts[event.kind] = counts.get(event.kind, 0) + 1
+            if event.kind == "chunk":
+                continue
+            extra = ""
+            if event.stats:
+                extra = "  " + " ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in event.stats.items() if not k.endswith("_t"))
+            print(f"{event.kind:<7} {event.start_pos / sr:8.2f}s -> {event.end_pos / sr:8.2f}s{extra}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.close()
+    elapsed = time.perf_counter() - t_start
+    audio_s = capture.ring.write_pos / sr
+    print(f"\n{audio_s:.1f}s of audio in {elapsed:.2f}s (x{audio_s / elapsed if elapsed else 0:.1f}), events: {counts}")
@@ -0,0 +1,154 @@
+import threading
+import time
+import requests
+import config
+from core.logger import log
+from core.memory import process_rss_mb, format_mb
+
+
+class StartupOrchestrator:
+    """
+    Loads the heavy components in parallel instead of one after another:
+      vad      - AudioEngine (Silero ONNX session)
+      whisper  - Transcriber, followed by a synthetic warm-up decode
+      ollama   - model resolution (may start `ollama serve`) + LLM warm-up
+      injector - keyboard/clipboard injector
+
+    The app is READY once audio, Whisper (warmed) and the injector are up; Ollama is
+    optional and keeps resolving in the background (refinement reads config.OLLAMA_MODEL
+    at request time). Cold start therefore costs max(steps) instead of sum(steps).
+
+    States: LOADING -> READY, or FAILED if a required step raised.
+    Once READY, `residency` handles idle unloading/reloading of the models.
+    """
+
+    REQUIRED = ("vad", "whisper", "warmup", "injector")
+
+    def __init__(self, on_state=None):
+        self.on_state = on_state  # Function(state: str)
+        self.state = "LOADING"
+        self.error = None
+
+        self.audio = None
+        self.transcriber = None
+        self.intelligence = None
+        self.injector = None
+        self.residency = None
+
+        self.audio_ready = threading.Event()
+        self.ready = threading.Event()
+        self.finished = threading.Event()  # READY or FAILED
+
+        self._t0 = 0.0
+        self._lock = threading.Lock()
+        self._done = set()
+        self._finishing = False
+        self.timeline = []  # (step, start_s, end_s, ok)
+
+    def start(self):
+        from core.audio import AudioEngine
+        from core.transcriber import Transcriber
+        from core.intelligence import IntelligenceEngine
+        from core.injector import Injector
+
+        self._t0 = time.perf_counter()
+        self._set_state("LOADING")
+
+        def load_audio():
+            self.audio = AudioEngine()
+            self.audio_ready.set()
+
+        def load_whisper():
+            self.transcriber = Transcriber()
+
+        def load_and_warm_whisper():
+            if self._step("whisper", load_whisper):
+                self._step("warmup", self.transcriber.warmup)
+
+        def load_injector():
+            self.injector = Injector()
+
+        def load_ollama():
+            from core.setup import resolve_ollama_model
+            config.OLLAMA_MODEL = resolve_ollama_model() # Apply Global Config Update
+            self.intelligence.model = config.OLLAMA_MODEL
+            log(f"Using Intelligence Model: {config.OLLAMA_MODEL}", "info")
+            # Warm-up: get the LLM into memory before the first refinement.
+            try:
+                requests.post(config.OLLAMA_URL, json={
+                    "model": config.OLLAMA_MODEL,
+                    "prompt": "hi",
+                    "stream": False,
+                }, timeout=60)
+            except Exception as e:
+                log(f"Ollama warm-up failed: {e}", "warning")
+
+        # Usable until Ollama resolution finishes (refine_text reads config at call time).
+        self.intelligence = IntelligenceEngine()
+
+        threading.Thread(target=self._step, args=("vad", load_audio), name="startup-vad", daemon=True).start()
+        threading.Thread(target=load_and_warm_whisper, name="startup-whisper", daemon=True).start()
+        threading.Thread(target=self._step, args=("injector", load_injector), name="startup-injector", daemon=True).start()
+        threading.Thread(target=self._step, args=("ollama", load_ollama), name="startup-ollama", daemon=True).start()
+
+    def _step(self, name: str, fn) -> bool:
+        start = time.perf_counter() - self._t0
+        ok = True
+        try:
+            fn()
+        except Exception as e:
+            ok = False
+            log(f"Startup step '{name}' failed: {e}", "error")
+            if name in self.REQUIRED:
+                self.error = e
+                if name == "vad":
+                    self.audio_ready.set()
+                self._finish("FAILED")
+        end = time.perf_counter() - self._t0
+        with self._lock:
+            self.timeline.append((name, start, end, ok))
+            if ok:
+                self._done.add(name)
+            all_required = all(r in self._done for r in self.REQUIRED)
+        if all_required:
+            self._finish("READY")
+        return ok
+
+    def _finish(self, state: str):
+        with self._lock:
+            if self._finishing:
+                return
+            self._finishing = True
+        if state == "READY":
+            log(self.format_timeline(), "info")
+            from core.residency import ResidencyManager
+            self.residency = ResidencyManager(self.transcriber, self.intelligence)
+            self.residency.start()
+        # Publish the state before releasing waiters so their own UI updates land after it.
+        self._set_state(state)
+        if state == "READY":
+            self.ready.set()
+        self.finished.set()
+
+    def _set_state(self, state: str):
+        self.state = state
+        if self.on_state:
+            try:
+                self.on_state(state)
+            except Exception:
+                pass
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        """Blocks until READY (True) or FAILED/timeout (False)."""
+        self.finished.wait(timeout)
+        return self.ready.is_set()
+
+    def format_timeline(self) -> str:
+        with self._lock:
+            rows = sorted(self.timeline, key=lambda r: r[1])
+        total = max((r[2] for r in rows if r[0] in self.REQUIRED), default=0.0)
+        rss = process_rss_mb()
+        lines = [f"Startup timeline (ready after {total:.2f}s, process memory {format_mb(rss)} host RSS):"]
+        for name, start, end, ok in rows:
+            lines.append(f"  {name:<9} {start:6.2f}s -> {end:6.2f}s  ({end - start:5.2f}s){'' if ok else '  FAILED'}")
+        return "\n".join(lines)
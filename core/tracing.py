@@ -0,0 +1,281 @@
+"""
+Per-utterance latency traces.
+
+Every captured utterance carries a Trace (an id plus time.monotonic() marks) through the pipeline.
+Code deep in the transcriber, LLM client and injector adds marks with mark(), which attaches to
+the trace active on the current thread and is a no-op when there is none (benchmarks, warm-up).
+Finished traces go to a background writer that appends them to logs/traces.jsonl (rotated by
+size), so capture and pipeline threads never wait on the disk.
+
+    python -m core.tracing [logs/traces.jsonl ...] [--last N] [--json]
+
+prints p50/p95/max for each latency interval (onset->confirm, hangover, queue, decode, LLM,
+paste, speech end->injected ...).
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+
+_local = threading.local()
+
+
+class Trace:
+    """Marks for one utterance: (name, monotonic t, fields). Thread-safe (decode pools add marks too)."""
+
+    def __init__(self, source: str, trace_id: str | None = None):
+        self.id = trace_id or uuid.uuid4().hex[:12]
+        self.source = source
+        self.created = time.time()
+        self.fields = {}
+        self._marks = []
+        self._lock = threading.Lock()
+
+    def mark(self, name: str, t: float | None = None, **fields):
+        with self._lock:
+            self._marks.append((name, time.monotonic() if t is None else float(t), fields))
+
+    def set(self, **fields):
+        with self._lock:
+            self.fields.update(fields)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            marks = sorted(self._marks, key=lambda m: m[1])
+            fields = dict(self.fields)
+        t0 = marks[0][1] if marks else 0.0
+        return {
+            "id": self.id,
+            "source": self.source,
+            "wall_time": round(self.created, 3),
+            **fields,
+            "marks": [{"ev": name, "ms": round((t - t0) * 1000.0, 2), **f} for name, t, f in marks],
+        }
+
+
+def current() -> Trace | None:
+    return getattr(_local, "trace", None)
+
+
+class activate:
+    """`with activate(trace):` makes `trace` the target of mark() on this thread (None = no tracing)."""
+
+    def __init__(self, trace: Trace | None):
+        self.trace = trace
+
+    def __enter__(self):
+        self._prev = current()
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.trace = self._prev
+        return False
+
+
+def mark(name: str, t: float | None = None, **fields):
+    tr = getattr(_local, "trace", None)
+    if tr is not None:
+        tr.mark(name, t, **fields)
+
+
+def bind(fn):
+    """Wraps `fn` so it runs with the caller's current trace (for thread pools)."""
+    tr = current()
+    if tr is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with activate(tr):
+            return fn(*args, **kwargs)
+    return run
+
+
+class TraceWriter:
+    """Asynchronous JSONL sink: queue + listener thread + size-rotated file."""
+
+    def __init__(self, path: str, max_bytes: int = 5_000_000, backups: int = 3):
+        self.path = path
+        self.written = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max(0, int(max_bytes)), backupCount=max(0, int(backups)), encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._logger = logging.getLogger("WhisperFlow.traces")
+        self._logger.propagate = False # Not in session.log / console
+        self._logger.setLevel(logging.INFO)
+        self._handler = logging.handlers.QueueHandler(self._queue)
+        self._logger.addHandler(self._handler)
+        self._listener.start()
+
+    def write(self, trace: Trace):
+        try:
+            self._logger.info(json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+            self.written += 1
+        except Exception:
+            pass
+
+    def close(self):
+        # Detach from the shared logger first so a later writer does not feed this queue too.
+        self._logger.removeHandler(self._handler)
+        try:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+        except Exception:
+            pass
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> TraceWriter | None:
+    global _writer
+    if _writer is not None:
+        return _writer
+    from core.settings import manager as settings
+    if not settings.get("trace_enabled"):
+        return None
+    with _writer_lock:
+        if _writer is None:
+            import config
+            _writer = TraceWriter(
+                os.path.join(config.BASE_DIR, "logs", "traces.jsonl"),
+                max_bytes=int(float(settings.get("trace_max_mb")) * 1024 * 1024),
+                backups=int(settings.get("trace_backups")),
+            )
+        return _writer
+
+
+def finish(trace: Trace | None, status: str = "ok", **fields):
+    """Closes a trace and queues it for the JSONL file (if tracing is enabled)."""
+    if trace is None:
+        return
+    trace.mark("done")
+    trace.set(status=status, **fields)
+    try:
+        writer = _get_writer()
+    except Exception:
+        writer = None
+    if writer is not None:
+        writer.write(trace)
+
+
+def close():
+    if _writer is not None:
+        _writer.close()
+
+
+# --- Summaries ---
+
+# (label, from mark, to mark); an interval is counted when both marks are present.
+INTERVALS = [
+    ("onset_to_confirm", "speech_onset", "trigger_confirm"),
+    ("speech_end_to_close", "speech_end", "stream_close"),
+    ("key_up_to_close", "key_up", "stream_close"),
+    ("close_to_transcribe", "stream_close", "transcribe_start"),
+    ("transcribe", "transcribe_start", "transcribe_end"),
+    ("refine_queue", "transcribe_end", "refine_start"),
+    ("llm", "llm_request", "llm_response"),
+    ("inject_queue", "refine_end", "inject_start"),
+    ("clipboard_to_paste", "clipboard_set", "paste_hotkey"),
+    ("paste_to_restore", "paste_hotkey", "clipboard_restore"),
+    ("inject", "inject_start", "inject_end"),
+    ("speech_end_to_injected", "speech_end", "injected"),
+    ("key_up_to_injected", "key_up", "injected"),
+]
+
+# "injected" = text reached the app: the paste hotkey, or the end of typing.
+INJECTED_MARKS = ("paste_hotkey", "typed")
+
+
+def _first(marks: list, name: str):
+    names = INJECTED_MARKS if name == "injected" else (name,)
+    for m in marks:
+        if m.get("ev") in names:
+            return m["ms"]
+    return None
+
+
+def summarize(traces: list) -> dict:
+    import numpy as np
+
+    def pct(vals):
+        if not vals:
+            return None
+        a = np.asarray(vals, dtype=np.float64)
+        return {"n": int(a.size), "p50": round(float(np.percentile(a, 50)), 1), "p95": round(float(np.percentile(a, 95)), 1), "max": round(float(a.max()), 1)}
+
+    intervals = {label: [] for label, _, _ in INTERVALS}
+    decode_ms, passes, statuses, sources = [], [], {}, {}
+    for tr in traces:
+        marks = tr.get("marks") or []
+        statuses[tr.get("status", "?")] = statuses.get(tr.get("status", "?"), 0) + 1
+        sources[tr.get("source", "?")] = sources.get(tr.get("source", "?"), 0) + 1
+        for label, a, b in INTERVALS:
+            ta, tb = _first(marks, a), _first(marks, b)
+            if ta is not None and tb is not None:
+                intervals[label].append(tb - ta)
+        decodes = [m for m in marks if m.get("ev") == "decode_pass"]
+        if decodes:
+            passes.append(len(decodes))
+            decode_ms.extend(float(m.get("dur_ms") or 0.0) for m in decodes)
+    return {
+        "traces": len(traces),
+        "status": statuses,
+        "source": sources,
+        "intervals_ms": {k: pct(v) for k, v in intervals.items() if v},
+        "decode_pass_ms": pct(decode_ms),
+        "decode_passes_per_utterance": pct(passes),
+    }
+
+
+def load(paths: list, last: int = 0) -> list:
+    traces = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        try:
+                            traces.append(json.loads(line))
+                        except ValueError:
+                            pass
+        except OSError as e:
+            print(f"skip {path}: {e}")
+    traces.sort(key=lambda t: t.get("wall_time", 0))
+    return traces[-last:] if last > 0 else traces
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Summarise per-utterance latency traces (logs/traces.jsonl).")
+    ap.add_argument("paths", nargs="*", help="trace files (default: logs/traces.jsonl and its rotations)")
+    ap.add_argument("--last", type=int, default=0, help="only the newest N traces")
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = ap.parse_args()
+
+    paths = args.paths
+    if not paths:
+        import config
+        base = os.path.join(config.BASE_DIR, "logs", "traces.jsonl")
+        paths = [p for p in [base] + [f"{base}.{i}" for i in range(1, 10)] if os.path.exists(p)]
+    summary = summarize(load(paths, args.last))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['traces']} traces  status={summary['status']}  source={summary['source']}")
+        rows = list(summary["intervals_ms"].items())
+        rows += [("decode_pass", summary["decode_pass_ms"]), ("decode_passes/utt", summary["decode_passes_per_utterance"])]
+        print(f"{'interval':<24}{'n':>6}{'p50':>10}{'p95':>10}{'max':>10}")
+        for label, s in rows:
+            if s:
+                print(f"{label:<24}{s['n']:>6}{s['p50']:>10}{s['p95']:>10}{s['max']:>10}")
@@ -3,32 +3,149 @@ import config
 import os
 import time
 import inspect
+import gc
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, ExitStack
+import numpy as np
 from core.settings import manager as settings
 from core.logger import log
+from core import tracing
+from core import metrics
+from core.memory import process_rss_mb
+
+DECODE_PASSES = metrics.counter("decode_passes_total", "Whisper decode passes, by model (fast/main).")
+NOISY_SECOND_PASSES = metrics.counter("noisy_second_passes_total", "Noisy-audio second decodes, by whether their result was kept.")
+LANGUAGE_DISAMBIGUATIONS = metrics.counter("language_disambiguations_total", "Utterances re-decoded per candidate language.")
+
+
+class _CachedFeatureExtractor:
+    """Wraps WhisperModel.feature_extractor; memoizes the mel spectrogram of the active utterance."""
+
+    def __init__(self, cache: "_EncoderCache", inner):
+        self._cache = cache
+        self._inner = inner
+
+    def __call__(self, audio, *args, **kwargs):
+        return self._cache._features_for(self._inner, audio, args, kwargs)
+
+    def __getattr__(self, name):
+        # nb_max_frames, time_per_frame, sampling_rate, ... are read directly by faster-whisper.
+        return getattr(self._inner, name)
+
+
+class _EncoderCache:
+    """
+    Per-utterance memo for the expensive, deterministic front half of Whisper:
+    mel features and the encoder forward pass.
+
+    One utterance can be decoded several times (base, noisy second pass, forced FR/EN
+    passes). faster-whisper recomputes features + encoder output inside every
+    WhisperModel.transcribe call; with this cache installed, only the first pass pays
+    for them and every later pass (any beam size / forced language) decodes against
+    the cached encoder output. Keys are content hashes of the feature windows, so this
+    stays correct across faster-whisper versions that slice/pad windows differently.
+    Outside an utterance() scope everything passes straight through.
+
+    This patches private WhisperModel attributes (encode, feature_extractor); the supported
+    faster-whisper range is pinned in requirements.txt. If they are missing, decoding runs
+    uncached; if a version stops routing passes through them, that is logged once.
+    """
+
+    def __init__(self, model):
+        self._lock = threading.Lock()
+        self._active = False
+        self._audio = None
+        self._features = {}
+        self._encoded = {}
+        self.hits = 0
+        self.misses = 0
+        self._bypass_warned = False
+        self.enabled = callable(getattr(model, "encode", None)) and callable(getattr(model, "feature_extractor", None))
+        if not self.enabled:
+            log("faster-whisper internals not recognised (model.encode / model.feature_extractor); decoding uncached.", "warning")
+            return
+        self._orig_encode = model.encode
+        model.encode = self._encode
+        model.feature_extractor = _CachedFeatureExtractor(self, model.feature_extractor)
+
+    @contextmanager
+    def utterance(self, audio):
+        with self._lock:
+            self._active = self.enabled
+            self._audio = audio
+            self._features.clear()
+            self._encoded.clear()
+            self.hits = 0
+            self.misses = 0
+        try:
+            yield self
+        finally:
+            with self._lock:
+                bypassed = self._active and bool(self._features) and (self.hits + self.misses) == 0
+                self._active = False
+                self._audio = None
+                self._features.clear()
+                self._encoded.clear()
+            if bypassed and not self._bypass_warned:
+                self._bypass_warned = True
+                log("faster-whisper computed features but never called model.encode; encoder-output reuse is not taking effect.", "warning")
+
+    def stats(self) -> dict:
+        return {"encoder_cache_hits": int(self.hits), "encoder_cache_misses": int(self.misses)}
+
+    def _features_for(self, inner, audio, args, kwargs):
+        if not (self._active and audio is self._audio):
+            return inner(audio, *args, **kwargs)
+        key = (args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            cached = self._features.get(key)
+        if cached is not None:
+            return cached
+        features = inner(audio, *args, **kwargs)
+        with self._lock:
+            if self._active and audio is self._audio:
+                self._features[key] = features
+        return features
+
+    def _encode(self, features):
+        if not self._active or not isinstance(features, np.ndarray):
+            return self._orig_encode(features)
+        arr = np.ascontiguousarray(features)
+        key = (arr.shape, arr.dtype.str, hashlib.blake2b(arr.view(np.uint8), digest_size=16).digest())
+        with self._lock:
+            cached = self._encoded.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+        encoder_output = self._orig_encode(features)
+        with self._lock:
+            self.misses += 1
+            if self._active:
+                self._encoded[key] = encoder_output
+        return encoder_output
+
 
 class Transcriber:
     def __init__(self):
-        print(f"Loading Whisper Model: {config.WHISPER_MODEL_SIZE} on {config.DEVICE}...")
-        start = time.time()
-        self._compute_type_effective = config.COMPUTE_TYPE
-        try:
-            self.model = WhisperModel(
-                config.WHISPER_MODEL_SIZE,
-                device=config.DEVICE,
-                compute_type=config.COMPUTE_TYPE,
-                download_root=config.MODELS_DIR,
-            )
-        except Exception as e:
-            # Explicit fallback for reliability (VRAM/driver issues): retry with int8.
-            log(f"Whisper model load failed with compute_type={config.COMPUTE_TYPE}: {e}", "warning")
-            self._compute_type_effective = "int8"
-            self.model = WhisperModel(
-                config.WHISPER_MODEL_SIZE,
-                device=config.DEVICE,
-                compute_type="int8",
-                download_root=config.MODELS_DIR,
-            )
-        print(f"Model loaded in {time.time() - start:.2f}s (compute_type={self._compute_type_effective})")
+        self._num_workers = max(1, int(getattr(config, "WHISPER_NUM_WORKERS", 1)))
+        self._cascade_stats = {"utterances": 0, "accepted_fast": 0, "escalated": 0, "reasons": {}}
+        self._cascade_lock = threading.Lock() # get_cascade_stats() reads from UI/diagnostics threads
+        # Held for a whole utterance and around load/unload, so idle eviction never
+        # pulls the model out from under an in-flight decode.
+        self._residency_lock = threading.RLock()
+        self.fast_model = None
+        self._fast_encoder_cache = None
+        self._load_models()
+
+        self._decode_passes = 0
+        self._decode_passes_lock = threading.Lock()
+        # Progressive beam search bookkeeping: profile -> {"decodes", "escalated"}
+        self._escalation_stats = {}
+        self._escalation_lock = threading.Lock()
+        # Candidate decodes (FR/EN disambiguation) run concurrently on the model's CTranslate2 workers.
+        self._decode_pool = ThreadPoolExecutor(max_workers=self._num_workers, thread_name_prefix="whisper-decode")
 
         self._sticky_language = None
         self._sticky_set_time = 0.0
@@ -40,6 +157,49 @@ class Transcriber:
         self.last_confidence = "unknown"  # high|medium|low|silence|unknown
         self.last_stats = {}
 
+    def _load_models(self):
+        self.model, self._compute_type_effective = self._load_model(config.WHISPER_MODEL_SIZE)
+        self._encoder_cache = _EncoderCache(self.model)
+
+        # Optional small/large cascade (both resident).
+        self.fast_model = None
+        self._fast_encoder_cache = None
+        fast_size = getattr(config, "WHISPER_FAST_MODEL_SIZE", None)
+        if fast_size and fast_size != config.WHISPER_MODEL_SIZE:
+            try:
+                self.fast_model, _ = self._load_model(fast_size)
+                self._fast_encoder_cache = _EncoderCache(self.fast_model)
+            except Exception as e:
+                log(f"Fast cascade model {fast_size!r} failed to load; cascade disabled: {e}", "warning")
+                self.fast_model = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None
+
+    def unload(self) -> bool:
+        """Drops the Whisper model(s). Returns False if nothing was loaded."""
+        with self._residency_lock:
+            if self.model is None:
+                return False
+            self.model = None
+            self.fast_model = None
+            self._encoder_cache = None
+            self._fast_encoder_cache = None
+            gc.collect()
+            return True
+
+    def ensure_loaded(self) -> float:
+        """Reloads the model(s) if they were unloaded. Returns the seconds spent loading (0 if resident)."""
+        with self._residency_lock:
+            if self.model is not None:
+                return 0.0
+            start = time.time()
+            self._load_models()
+            elapsed = time.time() - start
+            log(f"Whisper reloaded in {elapsed:.2f}s", "info")
+            return elapsed
+
     def _choose_language(self, requested_language: str | None) -> str | None:
         if requested_language:
             return requested_language
@@ -50,6 +210,33 @@ class Transcriber:
         # Auto mode: let Whisper detect language per utterance.
         return None
 
+    def _load_model(self, size: str):
+        """Returns (WhisperModel, effective compute_type)."""
+        print(f"Loading Whisper Model: {size} on {config.DEVICE}...")
+        start = time.time()
+        compute_type = config.COMPUTE_TYPE
+        try:
+            model = WhisperModel(
+                size,
+                device=config.DEVICE,
+                compute_type=compute_type,
+                download_root=config.MODELS_DIR,
+                num_workers=self._num_workers,
+            )
+        except Exception as e:
+            # Explicit fallback for reliability (VRAM/driver issues): retry with int8.
+            log(f"Whisper model load failed with compute_type={compute_type}: {e}", "warning")
+            compute_type = "int8"
+            model = WhisperModel(
+                size,
+                device=config.DEVICE,
+                compute_type=compute_type,
+                download_root=config.MODELS_DIR,
+                num_workers=self._num_workers,
+            )
+        print(f"Model loaded in {time.time() - start:.2f}s (compute_type={compute_type})")
+        return model, compute_type
+
     def _get_auto_languages(self) -> list[str]:
         langs = settings.get("auto_languages")
         if isinstance(langs, list) and langs:
@@ -249,28 +436,190 @@ class Transcriber:
 
         return "low", stats
 
+    def _run_decode(self, audio_data, language, args: dict, model=None):
+        """One full WhisperModel.transcribe pass; returns (segments, text, info)."""
+        with self._decode_passes_lock:
+            self._decode_passes += 1
+        DECODE_PASSES.inc(model="fast" if (model is not None and model is self.fast_model) else "main")
+        t0 = time.monotonic()
+        segments, info = (model or self.model).transcribe(
+            audio_data,
+            task="transcribe",
+            language=language,
+            **args,
+        )
+        segments = list(segments)
+        text = " ".join([segment.text for segment in segments]).strip()
+        tracing.mark(
+            "decode_pass", t0,
+            dur_ms=round((time.monotonic() - t0) * 1000.0, 1),
+            beam_size=int(args.get("beam_size", 1)),
+            lang=language,
+            detected=getattr(info, "language", None),
+            model="fast" if (model is not None and model is self.fast_model) else "main",
+        )
+        return segments, text, info
+
+    def _decode_progressive(self, audio_data, language, args: dict, profile: str, model=None):
+        """
+        Cheap decode first (greedy by default); escalate to the configured beam only if the
+        cheap result's confidence is below decode_progressive_min_confidence.
+        The escalated pass reuses the cached encoder output, so it only costs the beam search.
+        Returns (segments, text, info, confidence, stats).
+        """
+        rank = {"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}
+        full_beam = int(args.get("beam_size", 1))
+        first_beam = int(settings.get("decode_progressive_first_beam_size"))
+        progressive = bool(settings.get("decode_progressive_enabled")) and 1 <= first_beam < full_beam
+
+        escalated = False
+        if progressive:
+            segments, text, info = self._run_decode(audio_data, language, {**args, "beam_size": first_beam}, model)
+            confidence, stats = self._classify_confidence(segments, text)
+            want = str(settings.get("decode_progressive_min_confidence") or "high").lower()
+            if rank.get(confidence, 0) < rank.get(want, 3):
+                escalated = True
+                segments, text, info = self._run_decode(audio_data, language, args, model)
+                confidence, stats = self._classify_confidence(segments, text)
+        else:
+            segments, text, info = self._run_decode(audio_data, language, args, model)
+            confidence, stats = self._classify_confidence(segments, text)
+
+        with self._escalation_lock:
+            c = self._escalation_stats.setdefault(profile, {"decodes": 0, "progressive": 0, "escalated": 0})
+            c["decodes"] += 1
+            if progressive:
+                c["progressive"] += 1
+            if escalated:
+                c["escalated"] += 1
+
+        stats = {**stats, "beam_size": full_beam if (escalated or not progressive) else first_beam, "escalated": escalated}
+        return segments, text, info, confidence, stats
+
+    def get_escalation_stats(self) -> dict:
+        """Per decode profile: how often the cheap first pass was enough vs escalated to full beam."""
+        with self._escalation_lock:
+            out = {}
+            for profile, c in self._escalation_stats.items():
+                out[profile] = {
+                    **c,
+                    "escalation_rate": round(c["escalated"] / c["progressive"], 3) if c["progressive"] else 0.0,
+                }
+            return out
+
     def transcribe(self, audio_data, language=None):
         """
         Transcribe raw audio data (numpy array).
+        All decode passes for this utterance share one mel/encoder computation.
         """
         # Faster-whisper expects float32
         if audio_data.dtype != "float32":
             audio_data = audio_data.astype("float32")
 
-        chosen_language = self._choose_language(language)
+        with ExitStack() as stack:
+            stack.enter_context(self._residency_lock)
+            self.ensure_loaded()
+            self._decode_passes = 0
+            cache = stack.enter_context(self._encoder_cache.utterance(audio_data))
+            if self.fast_model is not None:
+                stack.enter_context(self._fast_encoder_cache.utterance(audio_data))
+                text = self._transcribe_fast(audio_data, language)
+                if text is None:
+                    text = self._transcribe_utterance(audio_data, language)
+                    self.last_stats["model"] = "main"
+            else:
+                text = self._transcribe_utterance(audio_data, language)
+            self.last_stats = {**self.last_stats, "decode_passes": self._decode_passes, **cache.stats()}
+        return text
 
+    def _transcribe_fast(self, audio_data, language) -> str | None:
+        """
+        Cascade first stage: one decode on the small model.
+        Returns the text if it is clean (high confidence, unambiguous language), else None
+        so the caller re-decodes on the main model.
+        """
+        chosen_language = self._choose_language(language)
         base_args = self._validate_and_build_decode_args(noisy=False)
-        segments, info = self.model.transcribe(
-            audio_data,
-            task="transcribe",
-            language=chosen_language,
-            **base_args,
+        segments, text, info, confidence, stats = self._decode_progressive(
+            audio_data, chosen_language, base_args, "fast", model=self.fast_model
         )
+        audio_seconds = float(len(audio_data) / float(getattr(config, "SAMPLE_RATE", 16000)))
+
+        reason = None
+        if len(text) < int(settings.get("reject_min_chars")):
+            reason = "too_short"
+        elif confidence != "high":
+            reason = f"confidence_{confidence}"
+        elif chosen_language is None and settings.get("transcription_language") == "auto":
+            top_lang = str(getattr(info, "language", "") or "").lower()
+            force_on_short = bool(settings.get("auto_language_force_on_short_utterance"))
+            short_s = float(settings.get("auto_language_short_utterance_s"))
+            if (top_lang not in set(self._get_auto_languages())) or self._is_language_ambiguous(info):
+                reason = "language_ambiguous"
+            elif force_on_short and audio_seconds <= short_s:
+                reason = "language_short_utterance"
+
+        with self._cascade_lock:
+            c = self._cascade_stats
+            c["utterances"] += 1
+            if reason is not None:
+                c["escalated"] += 1
+                c["reasons"][reason] = c["reasons"].get(reason, 0) + 1
+            else:
+                c["accepted_fast"] += 1
+            report = c["utterances"] % 25 == 0
 
-        segments = list(segments)
-        text = " ".join([segment.text for segment in segments]).strip()
+        if report:
+            c = self.get_cascade_stats()
+            log(f"Cascade: {c['utterances']} utterances, escalation_rate={c['escalation_rate']:.2f}, reasons={c['reasons']}", "info")
 
-        confidence, stats = self._classify_confidence(segments, text)
+        if reason is not None:
+            return None
+
+        self.last_confidence = confidence
+        detected = str(getattr(info, "language", "") or "").lower()
+        self.last_stats = {**stats, "audio_seconds": audio_seconds, "pass": "fast", "model": "fast", "lang": detected or None}
+        if chosen_language is None and settings.get("transcription_language") == "auto":
+            self._maybe_update_sticky_language(info, audio_seconds)
+        return text
+
+    def get_cascade_stats(self) -> dict:
+        """
+        Escalation rate of the small->large cascade plus the current process RSS. Not split per
+        model: startup loads VAD, injector and Whisper in parallel, so RSS deltas around one load
+        would include the other threads' allocations.
+        """
+        with self._cascade_lock:
+            c = {**self._cascade_stats, "reasons": dict(self._cascade_stats["reasons"])}
+        return {
+            "enabled": self.fast_model is not None,
+            **c,
+            "escalation_rate": round(c["escalated"] / c["utterances"], 3) if c["utterances"] else 0.0,
+            "process_rss_mb": process_rss_mb(),
+        }
+
+    def warmup(self):
+        """
+        One short greedy decode per resident model, so CUDA/MKL kernels, allocators and
+        the tokenizer are initialized before the first real utterance instead of during it.
+        Bypasses transcribe() so stats, caches and sticky language stay untouched.
+        """
+        sr = 16000
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(sr) * 1e-3).astype(np.float32)  # ~1s of faint noise
+        for name, model in (("main", self.model), ("fast", self.fast_model)):
+            if model is None:
+                continue
+            start = time.time()
+            segments, _ = model.transcribe(audio, language="en", beam_size=1, vad_filter=False, without_timestamps=True)
+            list(segments)  # Generator: force the decode.
+            log(f"Whisper warm-up ({name}) took {time.time() - start:.2f}s", "info")
+
+    def _transcribe_utterance(self, audio_data, language):
+        chosen_language = self._choose_language(language)
+
+        base_args = self._validate_and_build_decode_args(noisy=False)
+        segments, text, info, confidence, stats = self._decode_progressive(audio_data, chosen_language, base_args, "base")
         audio_seconds = float(len(audio_data) / float(getattr(config, "SAMPLE_RATE", 16000))) if hasattr(audio_data, "__len__") else 0.0
         stats = {**stats, "audio_seconds": audio_seconds}
         self.last_confidence = confidence
@@ -285,14 +634,7 @@ class Transcriber:
         # Optional quality-first second pass when the first decode looks noisy.
         if confidence == "low" and settings.get("decode_enable_noisy_second_pass"):
             noisy_args = self._validate_and_build_decode_args(noisy=True)
-            segments2, info2 = self.model.transcribe(
-                audio_data,
-                task="transcribe",
-                language=chosen_language,
-                **noisy_args,
-            )
-            segments2 = list(segments2)
-            text2 = " ".join([s.text for s in segments2]).strip()
+            segments2, text2, info2 = self._run_decode(audio_data, chosen_language, noisy_args)
             conf2, stats2 = self._classify_confidence(segments2, text2)
 
             # Choose the higher-confidence result; tie-breaker by avg_logprob.
@@ -304,6 +646,7 @@ class Transcriber:
                 if stats2.get("avg_logprob", -9) > stats.get("avg_logprob", -9):
                     choose_second = True
 
+            NOISY_SECOND_PASSES.inc(kept=str(choose_second).lower())
             if choose_second:
                 segments, text, confidence, stats = segments2, text2, conf2, stats2
                 info = info2
@@ -340,20 +683,34 @@ class Transcriber:
                 args = noisy_args if self.last_stats.get("pass") == "noisy_second" else base_args
                 best = ({"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}.get(self.last_confidence, 0), stats.get("avg_logprob", -9.0), text, segments, info, getattr(info, "language", None))
 
-                for lang in ordered[:2]:
-                    seg_l, info_l = self.model.transcribe(
-                        audio_data,
-                        task="transcribe",
-                        language=lang,
-                        **args,
-                    )
-                    seg_l = list(seg_l)
-                    text_l = " ".join([s.text for s in seg_l]).strip()
-                    conf_l, stats_l = self._classify_confidence(seg_l, text_l)
+                # All candidates decode concurrently (segments are materialised inside the worker);
+                # results are still judged in preference order so the outcome stays deterministic.
+                candidates = ordered[:2]
+                LANGUAGE_DISAMBIGUATIONS.inc()
+                if bool(settings.get("auto_language_parallel_decode")) and self._num_workers > 1:
+                    futures = [self._decode_pool.submit(tracing.bind(self._decode_progressive), audio_data, lang, args, "language") for lang in candidates]
+                else:
+                    futures = None
+                early_exit = bool(settings.get("auto_language_early_exit_on_high"))
+
+                for i, lang in enumerate(candidates):
+                    if futures is not None:
+                        seg_l, text_l, info_l, conf_l, stats_l = futures[i].result()
+                    else:
+                        seg_l, text_l, info_l, conf_l, stats_l = self._decode_progressive(audio_data, lang, args, "language")
                     stats_l = {**stats_l, "audio_seconds": audio_seconds}
                     score = ({"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}.get(conf_l, 0), stats_l.get("avg_logprob", -9.0), text_l, seg_l, info_l, lang)
                     if score[0] > best[0] or (score[0] == best[0] and score[1] > best[1]):
                         best = score
+                    if early_exit and conf_l == "high" and (i + 1) < len(candidates):
+                        break # Good enough: the remaining candidates are not judged
+                if futures is not None:
+                    # No decode may outlive this utterance: it would run after the residency lock and
+                    # encoder-cache scope are released (racing unload()) and count towards the next
+                    # utterance's passes and trace. Cancel the ones not started, wait for the rest.
+                    for f in futures:
+                        f.cancel()
+                    wait(futures)
 
                 # Apply best candidate
                 best_conf_rank, best_logprob, best_text, best_segments, best_info, best_lang = best
@@ -0,0 +1,550 @@
+"""
+Shared Silero VAD inference for any number of audio streams.
+
+Each consumer (voice-activation segmenter, Settings metering, extra devices, replay
+sources) owns a VadStream holding its recurrent state. Chunks submitted concurrently
+by different streams are stacked along Silero's batch dimension and run as one
+`session.run`, so VAD CPU grows with the number of batches, not the number of streams.
+
+Batching is leader/follower: the first caller with no batch in flight runs one for
+everything pending (optionally waiting `max_wait_ms` for more streams to join); callers
+arriving meanwhile queue up and are served by the next batch. A single stream therefore
+pays no extra latency.
+
+VadRuntime wraps the ONNX session itself: single-threaded session options, a serialized
+optimized graph for faster later startups, cached input/output names, and an IOBinding
+over preallocated buffers for the common one-chunk-at-a-time case. SileroV4Runtime and
+SileroV5Runtime implement it per model generation; open_vad_runtime picks one from the
+model's input names, so nothing above this module knows which Silero is loaded.
+"""
+
+import os
+import threading
+import time
+import numpy as np
+from core.logger import log
+from core import metrics
+
+VAD_SECONDS = metrics.histogram("vad_seconds", "Silero VAD inference time per call (one chunk or one batch).")
+
+
+def optimized_model_path(model_path: str) -> str:
+    """Where the optimized graph for `model_path` is cached (keyed by ONNX Runtime version)."""
+    import onnxruntime
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.opt-ort{onnxruntime.__version__}{ext or '.onnx'}"
+
+
+def create_vad_session(model_path: str, threads: int = 1, optimize: bool = True):
+    """
+    CPU InferenceSession for Silero VAD.
+
+    Thread pools are pinned to `threads` (default 1): a 512-sample chunk is far too small to
+    split across cores, and extra pool threads only add wake-up jitter next to the audio thread.
+    With `optimize`, the first load runs the full graph optimizer and saves the result next to
+    the model; later loads read that file with optimization disabled. The saved graph may hold
+    CPU-specific kernels, so it is only reused when newer than the model and readable.
+    """
+    import onnxruntime
+
+    def options(level):
+        so = onnxruntime.SessionOptions()
+        so.intra_op_num_threads = max(1, int(threads))
+        so.inter_op_num_threads = max(1, int(threads))
+        so.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        so.graph_optimization_level = level
+        so.log_severity_level = 3  # Silence the "hardware specific optimizations" notice.
+        return so
+
+    providers = ["CPUExecutionProvider"]
+    if not optimize:
+        return onnxruntime.InferenceSession(model_path, options(onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL), providers=providers)
+
+    opt_path = optimized_model_path(model_path)
+    try:
+        if os.path.exists(opt_path) and os.path.getmtime(opt_path) >= os.path.getmtime(model_path):
+            return onnxruntime.InferenceSession(opt_path, options(onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL), providers=providers)
+    except Exception as e:
+        log(f"Cached optimized VAD model unusable ({e}); rebuilding.", "warning")
+        try:
+            os.remove(opt_path)
+        except OSError:
+            pass
+
+    so = options(onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    so.optimized_model_filepath = opt_path
+    try:
+        return onnxruntime.InferenceSession(model_path, so, providers=providers)
+    except Exception as e:
+        # Read-only install dir etc.: optimize in memory only.
+        log(f"Could not save optimized VAD model to {opt_path}: {e}", "warning")
+        return onnxruntime.InferenceSession(model_path, options(onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL), providers=providers)
+
+
+class VadRuntime:
+    """
+    Backend interface over one Silero ONNX session; subclasses implement a model generation.
+
+    Per-stream state is an opaque list of arrays from `new_state()`, updated in place by
+    `run_one` / `run`, so callers never depend on a model's state signature. Names are
+    resolved once, and the single-stream path copies into buffers bound to the session once
+    (IOBinding) so no per-chunk arrays or dicts are allocated.
+    """
+
+    version = ""
+
+    def __init__(self, session, sample_rate: int, chunk_size: int = 512):
+        self.session = session
+        self.sample_rate = int(sample_rate)
+        self.chunk_size = int(chunk_size)
+        self._inputs = {i.name for i in session.get_inputs()}
+        self._out_names = [o.name for o in session.get_outputs()]
+        self._sr = np.array(self.sample_rate, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._binding = None
+        try:
+            self._binding = self._bind()
+        except Exception as e:
+            log(f"VAD IOBinding unavailable, using plain session.run: {e}", "warning")
+
+    @property
+    def uses_binding(self) -> bool:
+        return self._binding is not None
+
+    @property
+    def chunk_sizes(self) -> tuple:
+        """Chunk lengths (samples) the model accepts at this sample rate."""
+        raise NotImplementedError
+
+    def new_state(self) -> list:
+        raise NotImplementedError
+
+    def run_one(self, chunk: np.ndarray, state: list) -> float:
+        """Speech probability of one chunk; `state` is updated in place."""
+        raise NotImplementedError
+
+    def run(self, chunks: np.ndarray, states: list) -> np.ndarray:
+        """Batched call: chunks (B, N), one state per row (updated in place) -> probs (B,)."""
+        raise NotImplementedError
+
+    def _bind(self):
+        return None
+
+    def _bind_outputs(self, binding, buffers):
+        for name, buf in zip(self._out_names, buffers):
+            binding.bind_output(name, "cpu", 0, np.float32, list(buf.shape), buf.ctypes.data)
+
+
+class SileroV4Runtime(VadRuntime):
+    """Silero v4: inputs input/sr/h/c, LSTM state h and c of (2, B, 64)."""
+
+    version = "v4"
+
+    @classmethod
+    def matches(cls, inputs: set) -> bool:
+        return {"input", "h", "c"} <= inputs
+
+    @property
+    def chunk_sizes(self) -> tuple:
+        base = 512 if self.sample_rate == 16000 else 256
+        return (base, 2 * base, 3 * base)
+
+    def new_state(self) -> list:
+        return [np.zeros((2, 1, 64), dtype=np.float32), np.zeros((2, 1, 64), dtype=np.float32)]
+
+    def _bind(self):
+        self._x = np.zeros((1, self.chunk_size), dtype=np.float32)
+        self._h = np.zeros((2, 1, 64), dtype=np.float32)
+        self._c = np.zeros((2, 1, 64), dtype=np.float32)
+        self._out = np.zeros((1, 1), dtype=np.float32)
+        self._hn = np.zeros((2, 1, 64), dtype=np.float32)
+        self._cn = np.zeros((2, 1, 64), dtype=np.float32)
+        b = self.session.io_binding()
+        b.bind_cpu_input("input", self._x)
+        b.bind_cpu_input("sr", self._sr)
+        b.bind_cpu_input("h", self._h)
+        b.bind_cpu_input("c", self._c)
+        self._bind_outputs(b, (self._out, self._hn, self._cn))
+        return b
+
+    def run_one(self, chunk: np.ndarray, state: list) -> float:
+        h, c = state
+        if self._binding is None or chunk.shape[0] != self.chunk_size:
+            return float(self.run(chunk.reshape(1, -1), [state])[0])
+        with self._lock:
+            np.copyto(self._x[0], chunk)
+            np.copyto(self._h, h)
+            np.copyto(self._c, c)
+            self.session.run_with_iobinding(self._binding)
+            np.copyto(h, self._hn)
+            np.copyto(c, self._cn)
+            return float(self._out[0, 0])
+
+    def run(self, chunks: np.ndarray, states: list) -> np.ndarray:
+        x = np.asarray(chunks, dtype=np.float32)
+        if len(states) == 1:
+            h, c = states[0]
+        else:
+            h = np.concatenate([s[0] for s in states], axis=1)
+            c = np.concatenate([s[1] for s in states], axis=1)
+        out, hn, cn = self.session.run(self._out_names[:3], {"input": x, "sr": self._sr, "h": h, "c": c})
+        for i, s in enumerate(states):
+            s[0][...] = hn[:, i:i + 1, :]
+            s[1][...] = cn[:, i:i + 1, :]
+        return out[:, 0]
+
+
+class SileroV5Runtime(VadRuntime):
+    """
+    Silero v5: inputs input/state(/sr), one (2, B, 128) state, and exactly 512 samples per
+    chunk at 16 kHz (256 at 8 kHz). The model also expects the last 64 (32) samples of the
+    previous chunk prepended, so that context is carried in the per-stream state.
+    """
+
+    version = "v5"
+
+    @classmethod
+    def matches(cls, inputs: set) -> bool:
+        return {"input", "state"} <= inputs
+
+    def __init__(self, session, sample_rate: int, chunk_size: int = 512):
+        self.context_size = 64 if int(sample_rate) == 16000 else 32
+        super().__init__(session, sample_rate, chunk_size)
+
+    @property
+    def chunk_sizes(self) -> tuple:
+        return (512 if self.sample_rate == 16000 else 256,)
+
+    def new_state(self) -> list:
+        return [np.zeros((2, 1, 128), dtype=np.float32), np.zeros((1, self.context_size), dtype=np.float32)]
+
+    def _feed(self, x, state) -> dict:
+        feed = {"input": x, "state": state}
+        if "sr" in self._inputs:
+            feed["sr"] = self._sr
+        return feed
+
+    def _bind(self):
+        self._x = np.zeros((1, self.context_size + self.chunk_size), dtype=np.float32)
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._out = np.zeros((1, 1), dtype=np.float32)
+        self._state_n = np.zeros((2, 1, 128), dtype=np.float32)
+        b = self.session.io_binding()
+        for name, buf in self._feed(self._x, self._state).items():
+            b.bind_cpu_input(name, buf)
+        self._bind_outputs(b, (self._out, self._state_n))
+        return b
+
+    def _check(self, n: int):
+        if n not in self.chunk_sizes:
+            raise ValueError(f"Silero v5 needs {self.chunk_sizes[0]}-sample chunks at {self.sample_rate} Hz, got {n}")
+
+    def run_one(self, chunk: np.ndarray, state: list) -> float:
+        self._check(chunk.shape[0])
+        if self._binding is None or chunk.shape[0] != self.chunk_size:
+            return float(self.run(chunk.reshape(1, -1), [state])[0])
+        st, ctx = state
+        k = self.context_size
+        with self._lock:
+            self._x[0, :k] = ctx[0]
+            self._x[0, k:] = chunk
+            np.copyto(self._state, st)
+            self.session.run_with_iobinding(self._binding)
+            np.copyto(st, self._state_n)
+            ctx[0] = self._x[0, -k:]
+            return float(self._out[0, 0])
+
+    def run(self, chunks: np.ndarray, states: list) -> np.ndarray:
+        chunks = np.asarray(chunks, dtype=np.float32)
+        self._check(chunks.shape[1])
+        k = self.context_size
+        x = np.concatenate([np.concatenate([s[1] for s in states], axis=0), chunks], axis=1)
+        st = states[0][0] if len(states) == 1 else np.concatenate([s[0] for s in states], axis=1)
+        out, st_n = self.session.run(self._out_names[:2], self._feed(x, st))
+        for i, s in enumerate(states):
+            s[0][...] = st_n[:, i:i + 1, :]
+            s[1][0] = x[i, -k:]
+        return out[:, 0]
+
+
+BACKENDS = (SileroV4Runtime, SileroV5Runtime)
+
+
+def open_vad_runtime(session, sample_rate: int, chunk_size: int = 512) -> VadRuntime:
+    """Picks the backend from the model's input signature."""
+    inputs = {i.name for i in session.get_inputs()}
+    for backend in BACKENDS:
+        if backend.matches(inputs):
+            return backend(session, sample_rate, chunk_size)
+    raise ValueError(f"Unrecognised Silero VAD model (inputs: {', '.join(sorted(inputs))})")
+
+
+# Models AudioEngine can fetch by name ("vad_model" setting); anything else is a path to an .onnx file.
+VAD_MODELS = {
+    "v4": ("silero_vad.onnx", "https://github.com/snakers4/silero-vad/raw/v4.0/files/silero_vad.onnx"),
+    "v5": ("silero_vad_v5.onnx", "https://github.com/snakers4/silero-vad/raw/v5.1.2/src/silero_vad/data/silero_vad.onnx"),
+}
+
+
+def vad_model_path(spec: str, base_dir: str) -> str:
+    spec = (spec or "v4").strip()
+    if spec in VAD_MODELS:
+        return os.path.join(base_dir, VAD_MODELS[spec][0])
+    return spec if os.path.isabs(spec) else os.path.join(base_dir, spec)
+
+
+def download_vad_model(spec: str, path: str) -> bool:
+    """Fetches a named model to `path` if it is missing or truncated. True when the file is usable."""
+    if os.path.exists(path) and os.path.getsize(path) >= 1000000:
+        return True
+    spec = (spec or "v4").strip()
+    if spec not in VAD_MODELS:
+        return os.path.exists(path)
+    try:
+        import requests
+        headers = {'User-Agent': 'Mozilla/5.0'}
+        r = requests.get(VAD_MODELS[spec][1], headers=headers, allow_redirects=True, timeout=10)
+        if r.status_code == 200 and len(r.content) > 1000000:
+            with open(path, 'wb') as f:
+                f.write(r.content)
+            return True
+    except Exception as e:
+        log(f"VAD model download failed ({spec}): {e}", "warning")
+    return False
+
+
+def load_vad_runtime(spec: str, base_dir: str, sample_rate: int, chunk_size: int = 512, threads: int = 1) -> VadRuntime:
+    """Resolves, downloads if needed, loads and wraps a VAD model ("v4", "v5" or a path)."""
+    path = vad_model_path(spec, base_dir)
+    download_vad_model(spec, path)
+    return open_vad_runtime(create_vad_session(path, threads=threads), sample_rate, chunk_size)
+
+
+class VadStream:
+    """One consumer's recurrent VAD state (backend-specific arrays from VadRuntime.new_state)."""
+    __slots__ = ("name", "state", "chunks", "_runtime")
+
+    def __init__(self, name: str = "", runtime: VadRuntime | None = None):
+        self.name = name
+        self.chunks = 0
+        self._runtime = runtime
+        self.state = runtime.new_state() if runtime is not None else None
+
+    def reset(self):
+        if self.state is None:
+            return
+        for arr in self.state:
+            arr.fill(0.0)
+
+
+class _Request:
+    __slots__ = ("stream", "chunk", "prob", "done", "error")
+
+    def __init__(self, stream: VadStream, chunk: np.ndarray):
+        self.stream = stream
+        self.chunk = chunk
+        self.prob = 0.0
+        self.done = False
+        self.error = None  # Set when the batch that carried this chunk failed
+
+
+class VadService:
+    def __init__(self, runtime, sample_rate: int, max_batch: int = 32, max_wait_ms: float = 0.0):
+        # Accepts a VadRuntime or a bare InferenceSession.
+        if not isinstance(runtime, VadRuntime):
+            runtime = open_vad_runtime(runtime, sample_rate)
+        self.runtime = runtime
+        self.session = runtime.session
+        self.sample_rate = int(sample_rate)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._busy = False
+
+        # Metrics
+        self.batches = 0
+        self.chunks = 0
+        self.max_batch_seen = 0
+        self.run_s = 0.0
+        self._batch_hist = {}
+
+    def new_stream(self, name: str = "") -> VadStream:
+        return VadStream(name, self.runtime)
+
+    def infer(self, stream: VadStream, chunk: np.ndarray) -> float:
+        """Speech probability of one chunk; advances `stream`'s state. Thread-safe."""
+        req = _Request(stream, chunk)
+        with self._cond:
+            self._pending.append(req)
+            while not req.done and self._busy:
+                self._cond.wait()
+            if req.done:
+                if req.error is not None:
+                    raise req.error # A failed inference must not read as 0.0 ("no speech")
+                return req.prob
+            self._busy = True
+
+        # Leader: run batches until our own chunk has been served.
+        batch = []
+        try:
+            if self.max_wait_s:
+                time.sleep(self.max_wait_s)  # Let other streams join this tick.
+            while not req.done:
+                with self._cond:
+                    batch = self._pending[:self.max_batch]
+                    del self._pending[:len(batch)]
+                if not batch:
+                    break
+                self._run(batch)
+                with self._cond:
+                    self._cond.notify_all()
+        except Exception as e:
+            # Fail every waiter (the failed batch and everything queued behind it) with the
+            # error, rather than leaving followers waiting forever or reporting silence.
+            log(f"VAD inference error: {e}", "error")
+            with self._cond:
+                for r in batch + self._pending:
+                    if not r.done:
+                        r.error = e
+                        r.done = True
+                self._pending.clear()
+            raise
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+        return req.prob
+
+    def infer_batch(self, streams: list, chunks: list) -> list[float]:
+        """Runs chunks for several streams directly (offline / server tick); one chunk per stream."""
+        reqs = [_Request(s, c) for s, c in zip(streams, chunks)]
+        for i in range(0, len(reqs), self.max_batch):
+            self._run(reqs[i:i + self.max_batch])
+        return [r.prob for r in reqs]
+
+    def _run(self, batch: list):
+        # Silero needs equal-length rows; streams normally all use 512-sample chunks.
+        groups = {}
+        for r in batch:
+            groups.setdefault(int(r.chunk.shape[0]), []).append(r)
+        for rows in groups.values():
+            n = len(rows)
+            t0 = time.perf_counter()
+            if n == 1:
+                r = rows[0]
+                r.prob = self.runtime.run_one(r.chunk, r.stream.state)
+            else:
+                probs = self.runtime.run(np.stack([r.chunk for r in rows]), [r.stream.state for r in rows])
+                for r, p in zip(rows, probs):
+                    r.prob = float(p)
+            dt = time.perf_counter() - t0
+            self.run_s += dt
+            VAD_SECONDS.observe(dt)
+            for r in rows:
+                r.stream.chunks += 1
+                r.done = True
+            self.batches += 1
+            self.chunks += n
+            self.max_batch_seen = max(self.max_batch_seen, n)
+            self._batch_hist[n] = self._batch_hist.get(n, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "chunks": self.chunks,
+            "avg_batch": round(self.chunks / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch_seen,
+            "per_chunk_ms": round(1000.0 * self.run_s / self.chunks, 4) if self.chunks else 0.0,
+            "per_batch_ms": round(1000.0 * self.run_s / self.batches, 4) if self.batches else 0.0,
+            "batch_histogram": dict(sorted(self._batch_hist.items())),
+        }
+
+
+if __name__ == "__main__":
+    # Per-chunk cost of the VAD session, then vs. number of concurrent streams:
+    #   python -m core.vad [v4|v5|path/to/model.onnx]
+    import sys
+    import onnxruntime
+    import config
+
+    spec = sys.argv[1] if len(sys.argv) > 1 else "v4"
+    model_path = vad_model_path(spec, config.BASE_DIR)
+    download_vad_model(spec, model_path)
+    rng = np.random.default_rng(0)
+    n_chunks = 3000
+    audio = rng.normal(0, 0.05, (n_chunks, 512)).astype(np.float32)
+
+    def per_chunk_ms(fn, repeats: int = 3) -> float:
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return 1000.0 * best / n_chunks
+
+    # Before: default SessionOptions, feed dict built on every call.
+    t0 = time.perf_counter()
+    plain = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    plain_load = time.perf_counter() - t0
+    plain_rt = open_vad_runtime(plain, config.SAMPLE_RATE)
+
+    def legacy():
+        if plain_rt.version != "v4":
+            state = plain_rt.new_state()
+            for chunk in audio:
+                plain_rt.run(chunk[np.newaxis, :], [state])
+            return
+        # The original v4 call: names and sr rebuilt and the chunk copied per call.
+        h = np.zeros((2, 1, 64), dtype=np.float32)
+        c = np.zeros((2, 1, 64), dtype=np.float32)
+        for chunk in audio:
+            ort_inputs = {
+                plain.get_inputs()[0].name: chunk[np.newaxis, :],
+                plain.get_inputs()[1].name: np.array(16000, dtype=np.int64),
+                plain.get_inputs()[2].name: h,
+                plain.get_inputs()[3].name: c,
+            }
+            _, h, c = plain.run(None, ort_inputs)
+
+    # After: pinned threads, cached optimized graph, IOBinding over preallocated buffers.
+    create_vad_session(model_path)  # Make sure the optimized graph is on disk.
+    t0 = time.perf_counter()
+    runtime = open_vad_runtime(create_vad_session(model_path), config.SAMPLE_RATE)
+    opt_load = time.perf_counter() - t0
+
+    def bound():
+        state = runtime.new_state()
+        for chunk in audio:
+            runtime.run_one(chunk, state)
+
+    before, after = per_chunk_ms(legacy), per_chunk_ms(bound)
+    print(f"model            : {model_path} (Silero {runtime.version})")
+    print(f"session load     : default {1000.0 * plain_load:.1f}ms, cached optimized {1000.0 * opt_load:.1f}ms")
+    print(f"per chunk before : {before:.4f}ms  (default options, feed dict built per call)")
+    print(f"per chunk after  : {after:.4f}ms  (1 thread, optimized graph, IOBinding={runtime.uses_binding})")
+    print(f"speedup          : x{before / after:.2f}\n")
+
+    chunks_per_stream = 400
+    for n_streams in (1, 2, 4, 8, 16):
+        svc = VadService(runtime, config.SAMPLE_RATE)
+        audio = rng.normal(0, 0.05, (n_streams, chunks_per_stream, 512)).astype(np.float32)
+
+        def worker(k):
+            s = svc.new_stream(f"s{k}")
+            for i in range(chunks_per_stream):
+                svc.infer(s, audio[k, i])
+
+        threads = [threading.Thread(target=worker, args=(k,)) for k in range(n_streams)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+        st = svc.stats()
+        print(
+            f"streams={n_streams:<3} avg_batch={st['avg_batch']:<6} per_chunk={st['per_chunk_ms']:.3f}ms "
+            f"wall/chunk={1000.0 * wall / (n_streams * chunks_per_stream):.3f}ms"
+        )
@@ -1,12 +1,8 @@
 import sys
 import threading
 import queue
-import time
 import config
 import os
-import glob
-import subprocess
-import requests
 from pynput import keyboard
 
 # Fix for 4K/High-DPI displays
@@ -36,245 +32,53 @@ except Exception:
 import faster_whisper
 import huggingface_hub
 
-from core.audio import AudioEngine
-from core.transcriber import Transcriber
-from core.intelligence import IntelligenceEngine
-from core.injector import Injector
+from core.controller import CoreController
 from core.settings import manager as settings
 from core.logger import log 
 from ui.overlay import run_overlay
 from ui.settings_dialog import SettingsDialog
 from PyQt6.QtWidgets import QApplication
 
-def resolve_ollama_model():
-    """
-    Checks for Llama 3 models and returns the EXACT name installed.
-    If none, pulls 'llama3'.
-    """
-    url = config.OLLAMA_URL.replace("/api/generate", "") # Root URL
-    wanted_model = config.OLLAMA_MODEL # "llama3"
-    
-    # 1. Ensure Server
-    try:
-        requests.get(url, timeout=0.5)
-    except Exception:
-        log("Starting Ollama...", "info")
-        try:
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            subprocess.Popen(["ollama", "serve"], startupinfo=startupinfo)
-            for _ in range(20):
-                try:
-                    requests.get(url, timeout=0.5)
-                    break
-                except:
-                    time.sleep(1)
-        except Exception:
-            pass
-
-    # 2. Find Exact Model Name
-    try:
-        tags = requests.get(f"{url}/api/tags").json()
-        models = [m['name'] for m in tags.get('models', [])]
-        
-        # Priority 1: Exact Match
-        if wanted_model in models:
-            log(f"Model '{wanted_model}' found.", "info")
-            return wanted_model
-            
-        # Priority 2: Fuzzy Match (e.g. 'llama3.2:latest')
-        for m in models:
-            if wanted_model in m: # Match 'mistral' in 'mistral:latest'
-                log(f"Model '{m}' found (Matched '{wanted_model}').", "info")
-                return m
-                
-        # Priority 3: Not Found -> Pull
-        log(f"Model '{wanted_model}' missing. Downloading... (Check new window)", "warning")
-        print(f"Downloading {wanted_model}... Check the popup terminal.")
-        
-        # BLOCKING Pull - Visible Window so user sees progress
-        # CREATE_NEW_CONSOLE = 0x00000010
-        subprocess.run(["ollama", "pull", wanted_model], creationflags=0x00000010, check=True)
-        return wanted_model
-        
-    except Exception as e:
-        log(f"Model Check Error: {e}", "error")
-        return wanted_model
-
 def main():
     log("Starting Whisper Flow clone...", "info")
     print("Initializing Core Systems...")
     
-    # --- Dynamic Model Resolution ---
-    resolved_model = resolve_ollama_model()
-    config.OLLAMA_MODEL = resolved_model # Apply Global Config Update
-    log(f"Using Intelligence Model: {config.OLLAMA_MODEL}", "info")
-    
-    # --- Warm-up ---
-    threading.Thread(target=lambda: requests.post(config.OLLAMA_URL, json={
-        "model": config.OLLAMA_MODEL, 
-        "prompt": "hi", 
-        "stream": False
-    }), daemon=True).start()
-    
     app = QApplication(sys.argv)
     ui_queue = queue.Queue()
-    
-    try:
-        audio = AudioEngine()
-        transcriber = Transcriber()
-        # Pass resolved model explicitly if needed, but config is updated
-        intelligence = IntelligenceEngine() 
-        injector = Injector()
-        log("All systems ready.", "info")
-        print("All systems ready.")
-    except Exception as e:
-        log(f"Init Error: {e}", "error")
-        sys.exit(1)
-
-    processing_lock = threading.Lock()
-    stop_processing_flag = False
-
-    def get_success_hold_s() -> float:
-        try:
-            return max(0.05, float(settings.get("success_hold_ms")) / 1000.0)
-        except Exception:
-            return 0.35
 
-    def should_refine_llm(confidence: str, raw_text: str) -> bool:
-        # Conditional grammar based on detected language:
-        # - English → NO grammar (raw transcription)
-        # - French → FORCE grammar
-        detected_lang = getattr(transcriber, "last_stats", {}).get("lang", "").lower()
-
-        if detected_lang == "en":
-            # English: skip grammar entirely
-            return False
-
-        if detected_lang == "fr":
-            # French: always use grammar (ignore other checks)
-            return True
-
-        # For other languages or unknown: use original logic
-        if not settings.get("use_intelligence"):
-            return False
-
-        # Extra safety: skip LLM on short utterances (most common place for unintended "translation").
-        try:
-            min_audio_s = float(settings.get("llm_refine_min_audio_s"))
-            audio_s = float(getattr(transcriber, "last_stats", {}).get("audio_seconds", 0.0))
-            if audio_s and audio_s < min_audio_s:
-                return False
-        except Exception:
-            pass
-
-        try:
-            min_words = int(settings.get("llm_refine_min_words"))
-            if min_words > 0:
-                wc = len([w for w in (raw_text or "").strip().split() if w])
-                if wc < min_words:
-                    return False
-        except Exception:
-            pass
-
-        want = str(settings.get("llm_refine_min_confidence") or "high").lower()
-        rank = {"high": 3, "medium": 2, "low": 1, "silence": 0, "unknown": 0}
-        return rank.get(confidence, 0) >= rank.get(want, 3)
-    
-    def pipeline_worker():
-        nonlocal stop_processing_flag
-        while True:
-            mode = settings.get("mode")
-            if stop_processing_flag:
-                time.sleep(0.5)
-                continue
-            
-            if mode != "voice_activation":
-                time.sleep(0.1)
-                continue
-                
-            with processing_lock:
-                 ui_queue.put("LISTENING")
-                 try:
-                     audio_data = audio.listen_single_segment() # Blocks
-                     if stop_processing_flag or len(audio_data) == 0:
-                         ui_queue.put("IDLE")
-                         if len(audio_data) == 0: time.sleep(0.1)
-                         continue
-                 except Exception:
-                     ui_queue.put("IDLE")
-                     time.sleep(1)
-                     continue
-
-                 ui_queue.put("PROCESSING")
-                 start_process = time.time()
-                 try:
-                     lang_code = settings.get("transcription_language")
-                     if lang_code == "auto": lang_code = None
-                     
-                     raw_text = transcriber.transcribe(audio_data, language=lang_code)
-                     if raw_text:
-                         # log(f"Raw ({time.time()-start_process:.2f}s): {raw_text}", "debug")
-                         
-                         if should_refine_llm(getattr(transcriber, "last_confidence", "unknown"), raw_text):
-                             final_text = intelligence.refine_text(raw_text)
-                         else:
-                             final_text = raw_text # Raw Mode
-                             
-                         # log(f"Final: {final_text}", "info")
-                         
-                         injector.type_text(final_text)
-                         ui_queue.put("SUCCESS")
-                         time.sleep(get_success_hold_s())
-                     else:
-                         pass 
-                 except Exception as e:
-                      log(f"Pipeline Error: {e}", "error")
-                 
-                 ui_queue.put("IDLE")
+    # --- Parallel model loading ---
+    # Whisper, VAD, the injector and Ollama load concurrently; the overlay shows LOADING
+    # until the required ones are up and Whisper has been warmed.
+    # The controller owns capture state and the capture -> transcribe -> refine -> inject
+    # pipeline (shared with the TUI).
+    controller = CoreController(ui_callback=ui_queue.put)
+    startup = controller.startup
+    startup.audio_ready.wait()
+    audio = startup.audio
+    if audio is None:
+        log(f"Init Error: {startup.error}", "error")
+        sys.exit(1)
 
-    worker_thread = threading.Thread(target=pipeline_worker, daemon=True)
-    worker_thread.start()
+    def wait_until_ready():
+        if not startup.wait_ready():
+            log(f"Init Error: {startup.error}", "error")
+            os._exit(1)
+        log("All systems ready.", "info")
+        print("All systems ready.")
+        print(startup.format_timeline())
 
-    def trigger_ptt_pass():
-        def _job():
-            if processing_lock.acquire(blocking=False):
-                try:
-                    if stop_processing_flag:
-                        return
-                    ui_queue.put("LISTENING")
-                    audio_data = audio.listen_single_segment()
-                    if len(audio_data) > 0:
-                        ui_queue.put("PROCESSING")
-                        lang_code = settings.get("transcription_language")
-                        if lang_code == "auto": lang_code = None
-                        
-                        raw_text = transcriber.transcribe(audio_data, language=lang_code)
-                        if raw_text:
-                            if should_refine_llm(getattr(transcriber, "last_confidence", "unknown"), raw_text):
-                                final_text = intelligence.refine_text(raw_text)
-                            else:
-                                final_text = raw_text
+    threading.Thread(target=wait_until_ready, daemon=True).start()
 
-                            injector.type_text(final_text)
-                            ui_queue.put("SUCCESS")
-                            time.sleep(get_success_hold_s())
-                except Exception:
-                    pass
-                finally:
-                    ui_queue.put("IDLE")
-                    processing_lock.release()
-        threading.Thread(target=_job, daemon=True).start()
+    controller.start_pipeline()
 
     def on_settings_click():
-        nonlocal stop_processing_flag
-        stop_processing_flag = True
-        if audio: audio.stop_recording()
-        time.sleep(0.5) 
+        controller.pause() # Interrupts the capture loop's read immediately
+        if controller.capture_lock.acquire(timeout=1.0): # Capture owner has let go
+            controller.capture_lock.release()
         try:
             SettingsDialog(audio).exec()
         except Exception: pass
-        stop_processing_flag = False
+        controller.resume()
 
     if not settings.get("setup_completed"):
         try:
@@ -284,11 +88,27 @@ def main():
     # Hotkey Logic (Cleaned up)
     def on_activate():
         if settings.get("mode") == "push_to_talk":
-             trigger_ptt_pass()
+            if settings.get("push_to_talk_hold"):
+                controller.ptt_press()
+            else:
+                controller.trigger_ptt()
 
     def start_hotkey():
+        # Listener + HotKey instead of GlobalHotKeys: hold mode also needs the combination's key-up.
         try:
-            l = keyboard.GlobalHotKeys({config.HOTKEY: on_activate})
+            combo = keyboard.HotKey.parse(config.HOTKEY)
+            hotkey = keyboard.HotKey(combo, on_activate)
+
+            def on_press(k):
+                hotkey.press(l.canonical(k))
+
+            def on_release(k):
+                k = l.canonical(k)
+                hotkey.release(k)
+                if k in combo:
+                    controller.ptt_release()
+
+            l = keyboard.Listener(on_press=on_press, on_release=on_release)
             l.start()
             l.join()
         except: pass
@@ -325,12 +145,23 @@ def main():
                 if not wanted or wanted in ignore_keys:
                     return
                 if normalize_key(k) == wanted:
-                    trigger_ptt_pass()
+                    if settings.get("push_to_talk_hold"):
+                        controller.ptt_press()
+                    else:
+                        controller.trigger_ptt()
+            except Exception:
+                pass
+
+        def on_release(k):
+            try:
+                wanted = str(settings.get("push_to_talk_key") or "").lower()
+                if wanted and normalize_key(k) == wanted:
+                    controller.ptt_release() # No-op unless a hold is in progress
             except Exception:
                 pass
 
         try:
-            with keyboard.Listener(on_press=on_press) as listener:
+            with keyboard.Listener(on_press=on_press, on_release=on_release) as listener:
                 listener.join()
         except Exception:
             pass
@@ -338,11 +169,9 @@ def main():
     threading.Thread(target=start_ptt_key_listener, daemon=True).start()
 
     def on_quit():
-        stop_processing_flag = True
-        if audio: audio.stop_recording()
+        controller.shutdown()
         os._exit(0)
 
-    ui_queue.put("IDLE")
     run_overlay(ui_queue, on_settings_click, app, audio_engine=audio)
     on_quit()
 
@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+
+import benchmark_compare as bc
+
+
+def write_run(path, transcribe_s):
+    files = [{"file": f"f{i}.wav", "segments": [{"transcribe_s": s}]} for i, s in enumerate(transcribe_s)]
+    path.write_text(json.dumps({"files": files}), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def runs(tmp_path):
+    base = [0.20 + 0.001 * i for i in range(20)]
+    return {
+        "base": write_run(tmp_path / "base.json", base),
+        "same": write_run(tmp_path / "same.json", base),
+        "slow": write_run(tmp_path / "slow.json", [s * 1.5 for s in base]),
+    }
+
+
+def test_parse_budget():
+    assert bc.parse_budget("transcribe_s.p95=+10%") == ("transcribe_s.p95", 10.0, True)
+    assert bc.parse_budget("wer=+0.01") == ("wer", 0.01, False)
+    with pytest.raises(ValueError):
+        bc.parse_budget("wer")
+
+
+def test_check_budget_needs_a_significant_regression():
+    row = {"verdict": "regression", "delta": 0.05, "delta_pct": 20.0}
+    assert bc.check_budget(row, 10.0, True)
+    assert not bc.check_budget(row, 25.0, True)
+    assert bc.check_budget(row, 0.01, False)
+    assert not bc.check_budget({**row, "verdict": "no change"}, 10.0, True)
+
+
+def test_paired_bootstrap_verdicts(runs):
+    base, slow = bc.load_run(runs["base"]), bc.load_run(runs["slow"])
+    rng = np.random.default_rng(0)
+
+    row = bc.bootstrap_delta(base, slow, "transcribe_s.p50", 500, 0.05, rng)
+    assert row["paired"]
+    assert row["verdict"] == "regression"
+    assert row["ci_low"] > 0
+    assert bc.bootstrap_delta(base, base, "transcribe_s.p50", 500, 0.05, rng)["verdict"] == "no change"
+    assert bc.bootstrap_delta(slow, base, "transcribe_s.p50", 500, 0.05, rng)["verdict"] == "improvement"
+
+
+def test_exit_codes(runs):
+    assert bc.main([runs["base"], runs["same"], "--budget", "transcribe_s.p95=+10%"]) == 0
+    assert bc.main([runs["base"], runs["slow"], "--budget", "transcribe_s.p95=+10%"]) == 1
+    assert bc.main([runs["base"], runs["slow"], "--budget", "transcribe_s.p95=+80%"]) == 0
+
+
+def test_missing_budget_metric_is_bad_input(runs):
+    assert bc.main([runs["base"], runs["same"], "--budget", "transcribe_s.p59=+10%"]) == 2
+    assert bc.main([runs["base"], runs["same"], "--budget", "wer=+0.01"]) == 2
@@ -0,0 +1,60 @@
+import numpy as np
+
+from core.capture import AudioRingBuffer
+
+
+def ramp(start, n):
+    return np.arange(start, start + n, dtype=np.float32)
+
+
+def test_window_across_the_wrap_point_is_one_zero_copy_view():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 7))
+    ring.write(ramp(7, 7))  # wraps: physical slots 7..9 then 0..3
+
+    assert ring.write_pos == 14
+    assert ring.oldest_pos == 4
+    v = ring.view(4, 10)
+    np.testing.assert_array_equal(v, ramp(4, 10))
+    assert np.shares_memory(v, ring._data)
+
+
+def test_overwritten_and_unwritten_windows_are_rejected():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 14))
+
+    assert ring.view(3, 2) is None           # overwritten
+    assert ring.view(12, 3) is None          # not written yet
+    assert ring.view(4, 11) is None          # longer than the ring
+    assert not ring.is_valid(3)
+    assert ring.is_valid(4)
+
+
+def test_copy_clamps_to_what_is_still_in_the_ring():
+    ring = AudioRingBuffer(10)
+    ring.write(ramp(0, 25))
+
+    out = ring.copy(0, 100)
+    np.testing.assert_array_equal(out, ramp(15, 10))
+    assert not np.shares_memory(out, ring._data)
+    assert ring.copy(30, 40).size == 0
+
+
+def test_block_larger_than_capacity_keeps_the_newest_samples():
+    ring = AudioRingBuffer(8)
+    ring.write(ramp(0, 3))
+    ring.write(ramp(3, 20))  # overrun inside one write
+
+    assert ring.write_pos == 23
+    assert ring.oldest_pos == 15
+    np.testing.assert_array_equal(ring.view(15, 8), ramp(15, 8))
+
+
+def test_many_small_writes_stay_consistent_across_wraps():
+    ring = AudioRingBuffer(37)
+    pos = 0
+    for n in (5, 11, 1, 36, 37, 2, 19) * 4:
+        ring.write(ramp(pos, n))
+        pos += n
+        start = ring.oldest_pos
+        np.testing.assert_array_equal(ring.view(start, pos - start), ramp(start, pos - start))
@@ -0,0 +1,76 @@
+import threading
+import time
+
+from core.control import CaptureControl
+
+
+def test_states_and_transitions():
+    ctl = CaptureControl("voice_activation")
+    assert ctl.state == "listening"
+
+    assert ctl.set_mode("push_to_talk") == "push_to_talk"
+    assert ctl.pause() == "paused"
+    assert ctl.set_mode("voice_activation") == "paused"  # the mode is kept for resume
+    assert ctl.resume() == "listening"
+    assert ctl.stop() == "stopped"
+    assert ctl.resume() == "stopped"  # stop wins over everything
+    assert ctl.stats() == {"state": "stopped", "mode": "voice_activation", "transitions": 4}
+
+
+def test_empty_mode_means_voice_activation():
+    assert CaptureControl(None).state == "listening"
+    ctl = CaptureControl("push_to_talk")
+    assert ctl.set_mode("") == "listening"
+
+
+def test_hooks_run_once_per_real_transition():
+    ctl = CaptureControl("voice_activation")
+    seen = []
+    ctl.on_change(lambda before, after: seen.append((before, after)))
+
+    def broken(before, after):
+        raise RuntimeError("hook failure")
+
+    ctl.on_change(broken)
+
+    ctl.set_mode("voice_activation")  # no change: no hook, no transition
+    ctl.pause()
+    ctl.pause()
+    ctl.set_mode("push_to_talk")  # paused either way
+    ctl.resume()
+    ctl.stop()
+
+    assert seen == [("listening", "paused"), ("paused", "push_to_talk"), ("push_to_talk", "stopped")]
+    assert ctl.transitions == 3
+
+
+def test_wait_change_wakes_on_transition():
+    ctl = CaptureControl("voice_activation")
+    result = {}
+
+    def waiter():
+        t0 = time.monotonic()
+        result["state"] = ctl.wait_change("listening")  # no timeout: only a transition wakes it
+        result["waited"] = time.monotonic() - t0
+
+    t = threading.Thread(target=waiter, daemon=True)
+    t.start()
+    time.sleep(0.1)
+    assert t.is_alive()
+    ctl.set_mode("voice_activation")
+    time.sleep(0.05)
+    assert t.is_alive()  # same state: keeps waiting
+
+    ctl.set_mode("push_to_talk")
+    t.join(1.0)
+    assert not t.is_alive()
+    assert result["state"] == "push_to_talk" and result["waited"] >= 0.1
+
+
+def test_wait_change_returns_at_once_or_on_timeout():
+    ctl = CaptureControl("voice_activation")
+    assert ctl.wait_change("paused", timeout=1.0) == "listening"  # already different
+
+    t0 = time.monotonic()
+    assert ctl.wait_change("listening", timeout=0.05) == "listening"
+    assert time.monotonic() - t0 >= 0.05
@@ -0,0 +1,30 @@
+from core.metrics import Counter, Histogram
+
+
+def test_histogram_bucket_bounds_are_inclusive_and_cumulative():
+    h = Histogram("x_seconds", "help", buckets=(0.1, 1.0, 0.5))
+    for v in (0.05, 0.1, 0.3, 1.0, 7.0):
+        h.observe(v, stage="a")
+
+    lines = h.render()
+    assert lines[:2] == ["# HELP x_seconds help", "# TYPE x_seconds histogram"]
+    assert lines[2:] == [
+        'x_seconds_bucket{le="0.1",stage="a"} 2',
+        'x_seconds_bucket{le="0.5",stage="a"} 3',
+        'x_seconds_bucket{le="1.0",stage="a"} 4',
+        'x_seconds_bucket{le="+Inf",stage="a"} 5',
+        'x_seconds_sum{stage="a"} 8.45',
+        'x_seconds_count{stage="a"} 5',
+    ]
+    assert h.count(stage="a") == 5
+    assert h.count(stage="b") == 0
+
+
+def test_counter_labels_and_escaping():
+    c = Counter("x_total", "help")
+    c.inc(kind='say "hi"')
+    c.inc(2, kind='say "hi"')
+
+    assert c.value(kind='say "hi"') == 3
+    assert c.render()[-1] == 'x_total{kind="say \\"hi\\""} 3'
+    assert Counter("y_total", "help").render()[-1] == "y_total 0"
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from core.noise_floor import FLOOR_MAX_DB, FLOOR_MIN_DB, NoiseFloor, NoiseFloorStore
+
+
+def test_cold_start_averages_then_tracks_with_the_ema():
+    nf = NoiseFloor("mic", initial_db=-55.0, warm_updates=4)
+    assert nf.state == "cold" and not nf.converged
+
+    readings = [-60.0, -64.0, -62.0, -66.0]
+    for i, db in enumerate(readings, 1):
+        nf.update(db, alpha=0.05)
+        assert nf.floor_db == pytest.approx(sum(readings[:i]) / i)  # 1/n weights: plain mean
+        assert nf.state == ("converged" if i == 4 else "converging")
+
+    nf.update(-40.0, alpha=0.05)
+    assert nf.floor_db == pytest.approx(0.95 * -63.0 + 0.05 * -40.0)
+    assert nf.converged and nf.updates == 5
+
+
+def test_floor_is_clamped():
+    nf = NoiseFloor(None, initial_db=-200.0, warm_updates=1)
+    assert nf.floor_db == FLOOR_MIN_DB
+    nf.update(0.0, alpha=1.0)
+    assert nf.floor_db == FLOOR_MAX_DB
+
+
+def test_restored_floor_survives_a_restart_and_keeps_the_slow_ema(tmp_path):
+    path = str(tmp_path / "noise_floor.json")
+    store = NoiseFloorStore(path, warm_updates=4)
+    nf = store.get("mic")
+    for _ in range(4):
+        nf.update(-62.0, alpha=0.05)
+    store.save(force=True)
+
+    restored = NoiseFloorStore(path, warm_updates=4).get("mic")
+    assert restored.state == "restored"
+    assert restored.floor_db == pytest.approx(-62.0)
+    assert restored.total_updates == 4 and restored.updates == 0
+    assert restored.stats()["restored_from_s_ago"] is not None
+
+    # A restored floor is already calibrated: no 1/n jump towards the first reading.
+    restored.update(-40.0, alpha=0.05)
+    assert restored.state == "converging"
+    assert restored.floor_db == pytest.approx(0.95 * -62.0 + 0.05 * -40.0)
+
+
+def test_unkeyed_floors_are_private_and_never_saved(tmp_path):
+    path = str(tmp_path / "noise_floor.json")
+    store = NoiseFloorStore(path)
+    a, b = store.get(None), store.get(None)
+    assert a is not b
+    a.update(-60.0, alpha=0.05)
+    store.save(force=True)
+    assert not os.path.exists(path)
+    assert store.get("mic") is store.get("mic")
+
+
+def test_save_is_rate_limited_unless_forced(tmp_path):
+    path = tmp_path / "noise_floor.json"
+    store = NoiseFloorStore(str(path), warm_updates=1, save_interval_s=3600)
+    nf = store.get("mic")
+
+    store.save()
+    assert not path.exists()  # nothing measured yet
+
+    nf.update(-60.0, alpha=0.05)
+    store.save()
+    assert json.loads(path.read_text())["mic"]["floor_db"] == -60.0
+
+    nf.update(-40.0, alpha=1.0)
+    store.save()
+    assert json.loads(path.read_text())["mic"]["floor_db"] == -60.0
+    store.save(force=True)
+    assert json.loads(path.read_text())["mic"]["floor_db"] == -40.0
+
+
+def test_save_is_atomic_and_keeps_other_devices(tmp_path, monkeypatch):
+    path = tmp_path / "noise_floor.json"
+    path.write_text(json.dumps({"other": {"floor_db": -50.0, "updates": 7, "saved_at": 1.0}}))
+    store = NoiseFloorStore(str(path), warm_updates=1)
+    store.get("mic").update(-60.0, alpha=0.05)
+
+    def failing_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    store.save(force=True)
+    assert set(json.loads(path.read_text())) == {"other"}  # old file untouched
+
+    monkeypatch.undo()
+    store.save(force=True)
+    data = json.loads(path.read_text())
+    assert set(data) == {"other", "mic"}
+    assert data["other"]["floor_db"] == -50.0
+    assert not (tmp_path / "noise_floor.json.tmp").exists()
+
+
+def test_unreadable_file_starts_cold(tmp_path):
+    path = tmp_path / "noise_floor.json"
+    path.write_text("{not json")
+    assert NoiseFloorStore(str(path)).get("mic").state == "cold"
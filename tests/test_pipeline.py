@@ -0,0 +1,154 @@
+import random
+import threading
+import time
+
+import numpy as np
+
+from core.pipeline import InjectStage, Pipeline, RefineStage, SegmentQueue, Stage, TranscribeStage, Utterance
+
+
+class FakeTranscriber:
+    last_confidence = "high"
+    last_stats = {}
+
+    def transcribe(self, audio, language=None):
+        time.sleep(0.01)
+        self.last_stats = {"lang": "de", "audio_seconds": 3.0}
+        return f"utt{int(audio[0])}"
+
+
+class FakeIntelligence:
+    def __init__(self, seed=0):
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def refine_text(self, text):
+        with self._lock:
+            delay = self._rng.uniform(0.0, 0.08)
+        time.sleep(delay)  # Later utterances often finish first
+        return text.upper()
+
+
+class FakeInjector:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.out = []
+
+    def type_text(self, text):
+        time.sleep(self.delay)
+        self.out.append(text)
+
+
+class FakeStartup:
+    def __init__(self, inject_delay=0.0):
+        self.transcriber = FakeTranscriber()
+        self.intelligence = FakeIntelligence()
+        self.injector = FakeInjector(inject_delay)
+        self.residency = None
+
+
+def make_pipeline(startup, refine_workers=1, queue_max=2):
+    source = SegmentQueue(32)
+    pipeline = Pipeline(
+        source,
+        [TranscribeStage(startup), RefineStage(startup, workers=refine_workers), InjectStage(startup)],
+        queue_max=queue_max,
+    )
+    return source, pipeline
+
+
+def feed(source, n):
+    for i in range(n):
+        source.put(np.full(10, i, dtype=np.float32), {"captured_at": time.monotonic()})
+
+
+def test_injection_follows_capture_order(monkeypatch):
+    from core.settings import manager as settings
+    for key, value in {"use_intelligence": True, "llm_refine_skip_languages": [], "llm_refine_min_confidence": "low",
+                       "llm_refine_min_words": 0, "llm_refine_min_audio_s": 0, "success_hold_ms": 0}.items():
+        monkeypatch.setitem(settings.settings, key, value)
+    startup = FakeStartup()
+    source, pipeline = make_pipeline(startup, refine_workers=4)
+    pipeline.start()
+
+    feed(source, 12)
+    deadline = time.monotonic() + 10
+    while pipeline.completed < 12 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+
+    assert startup.injector.out == [f"UTT{i}" for i in range(12)]
+
+
+def test_stop_drains_every_stage_with_full_queues(monkeypatch):
+    from core.settings import manager as settings
+    monkeypatch.setitem(settings.settings, "use_intelligence", False)
+    monkeypatch.setitem(settings.settings, "success_hold_ms", 0)
+    startup = FakeStartup(inject_delay=0.05)
+    source, pipeline = make_pipeline(startup, refine_workers=2, queue_max=1)
+    pipeline.start()
+
+    feed(source, 8)
+    time.sleep(0.1)  # Stage queues are full now
+    pipeline.stop(timeout=5.0)
+
+    threads = [pipeline._feeder] + [t for workers in pipeline._workers for t in workers]
+    assert not any(t.is_alive() for t in threads)
+    assert startup.injector.out == [f"utt{i}" for i in range(8)]
+
+
+class Ordered(Stage):
+    name = "ordered"
+    ordered = True
+
+
+def test_ordered_hand_off_does_not_hold_the_lock_while_downstream_is_full():
+    pipeline = Pipeline(SegmentQueue(4), [Ordered()], queue_max=1)
+    utts = [Utterance(i, None, {}, time.monotonic()) for i in range(3)]
+
+    pipeline._hand_off(0, utts[0])  # fills the stage queue
+    blocked = threading.Thread(target=pipeline._hand_off, args=(0, utts[1]), daemon=True)
+    blocked.start()
+    time.sleep(0.05)
+    assert blocked.is_alive()  # releasing utts[1]: waits for space downstream
+
+    parked = threading.Thread(target=pipeline._hand_off, args=(0, utts[2]), daemon=True)
+    parked.start()
+    parked.join(0.2)
+    assert not parked.is_alive()  # only parks; must not queue behind the blocked put
+    assert pipeline._order_locks[0].acquire(timeout=0.05)
+    pipeline._order_locks[0].release()
+
+    got = [pipeline.queues[0].get(timeout=1).seq for _ in range(3)]
+    assert got == [0, 1, 2]
+    blocked.join(1)
+
+
+LONG = "this sentence has more than six words in it"
+
+# (use_intelligence, lang, confidence, text, audio_s) -> refined? Repo defaults otherwise:
+# skip ["en"], force ["fr"], min confidence high, min 6 words, min 2.5 s.
+REFINE_POLICY = [
+    (False, "fr", "high", LONG, 5.0, False),   # Raw Mode wins over everything
+    (False, "de", "high", LONG, 5.0, False),
+    (True, "en", "high", LONG, 5.0, False),    # skip list
+    (True, "fr", "low", "oui", 0.5, True),     # force list bypasses confidence/length checks
+    (True, "de", "high", LONG, 5.0, True),
+    (True, "de", "medium", LONG, 5.0, False),  # below llm_refine_min_confidence
+    (True, "de", "high", "too short", 5.0, False),
+    (True, "de", "high", LONG, 1.0, False),
+    (True, None, "high", LONG, 5.0, True),     # unknown language: generic checks
+]
+
+
+def test_refine_policy_table(monkeypatch):
+    from core.settings import manager as settings
+    for key in ("llm_refine_skip_languages", "llm_refine_force_languages", "llm_refine_min_confidence",
+                "llm_refine_min_words", "llm_refine_min_audio_s"):
+        monkeypatch.setitem(settings.settings, key, settings.defaults[key])
+
+    for use_intelligence, lang, confidence, text, audio_s, expected in REFINE_POLICY:
+        monkeypatch.setitem(settings.settings, "use_intelligence", use_intelligence)
+        utt = Utterance(0, None, {}, 0.0)
+        utt.lang, utt.confidence, utt.raw_text, utt.audio_s = lang, confidence, text, audio_s
+        assert RefineStage.should_refine(utt) is expected, (use_intelligence, lang, confidence, text, audio_s)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import numpy as np
+
+from core.pipeline import SegmentQueue
+
+
+def seg(value, n=4):
+    return np.full(n, value, dtype=np.float32)
+
+
+def test_drop_oldest_evicts_the_oldest_segment():
+    q = SegmentQueue(2, "drop_oldest")
+    for i in range(3):
+        assert q.put(seg(i), {"i": i})
+
+    assert q.dropped == 1
+    assert [q.get(0)["meta"]["i"] for _ in range(2)] == [1, 2]
+    assert q.get(0) is None
+
+
+def test_merge_appends_to_the_newest_segment():
+    q = SegmentQueue(2, "merge")
+    q.put(seg(0), {"i": 0})
+    q.put(seg(1), {"i": 1})
+    q.put(seg(2, 3), {"i": 2})
+
+    assert q.merged == 1
+    assert q.get(0)["meta"]["i"] == 0
+    last = q.get(0)
+    assert last["meta"]["merged"] == 1
+    np.testing.assert_array_equal(last["audio"], np.concatenate((seg(1), seg(2, 3))))
+
+
+def test_block_waits_for_space():
+    q = SegmentQueue(1, "block")
+    q.put(seg(0))
+    done = threading.Event()
+    threading.Thread(target=lambda: (q.put(seg(1)), done.set()), daemon=True).start()
+
+    assert not done.wait(0.1)
+    assert q.get(0)["audio"][0] == 0
+    assert done.wait(1.0)
+    assert q.get(0)["audio"][0] == 1
+    assert q.blocked_s > 0
+
+
+def test_close_drains_then_ends_and_releases_blocked_producers():
+    q = SegmentQueue(1, "block")
+    q.put(seg(0))
+    result = []
+    t = threading.Thread(target=lambda: result.append(q.put(seg(1))), daemon=True)
+    t.start()
+    time.sleep(0.05)
+    q.close()
+    t.join(1.0)
+
+    assert result == [False]
+    assert q.get(0)["audio"][0] == 0  # queued before close: still delivered
+    assert q.get() is None             # closed and empty: no blocking
+    assert not q.put(seg(2))
+
+
+def test_unknown_policy_falls_back_to_drop_oldest():
+    assert SegmentQueue(1, "bogus").policy == "drop_oldest"
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from core.segmenter import VoiceSegmenter, load_gate_params, segment_array
+
+SR = 16000
+CS = 512
+
+
+def energy_vad(chunk, state):
+    # Stand-in for Silero: loud chunks are speech.
+    return (0.9 if float(np.sqrt(np.mean(np.square(chunk)))) > 0.05 else 0.02), state
+
+
+def make_segmenter(**overrides):
+    params = load_gate_params(SR, CS)
+    params.update({"vad_idle_stride": 1, "vad_idle_window": CS, "low_power_after_samples": 0})
+    params.update(overrides)
+    return VoiceSegmenter(params, energy_vad, lambda: None, SR, CS)
+
+
+def signal(*parts):
+    """parts: (kind, chunks) with kind "tone" or "silence"; returns audio and each part's start pos."""
+    rng = np.random.default_rng(0)
+    out, starts, pos = [], [], 0
+    for kind, chunks in parts:
+        n = chunks * CS
+        if kind == "tone":
+            x = 0.3 * np.sin(2 * np.pi * 220.0 * np.arange(pos, pos + n) / SR)
+        else:
+            x = 0.001 * rng.standard_normal(n)
+        out.append(x.astype(np.float32))
+        starts.append(pos)
+        pos += n
+    return np.concatenate(out), starts
+
+
+def test_tone_between_silence_is_one_segment():
+    seg = make_segmenter()
+    p = seg.params
+    audio, (_, tone_at, silence_at) = signal(("silence", 32), ("tone", 47), ("silence", 64))
+
+    events = segment_array(audio, seg)
+
+    assert [e.kind for e in events] == ["end"]
+    e = events[0]
+    trigger = tone_at + p["start_confirm_chunks"] * CS
+    assert e.stats["onset_pos"] == tone_at
+    assert e.stats["trigger_pos"] == trigger
+    assert e.start_pos == trigger - p["pre_roll_samples"]
+    assert e.stats["last_speech_pos"] == silence_at
+    assert e.end_pos == silence_at + p["effective_silence_samples"]
+    assert e.t == pytest.approx(e.end_pos / SR)
+
+
+def test_blip_shorter_than_start_confirm_never_triggers():
+    seg = make_segmenter()
+    blip = seg.params["start_confirm_chunks"] - 1
+    audio, _ = signal(("silence", 32), ("tone", blip), ("silence", 64))
+
+    assert segment_array(audio, seg) == []
+
+
+def test_segment_open_at_end_of_input_is_flushed_as_discard():
+    seg = make_segmenter()
+    audio, _ = signal(("silence", 32), ("tone", 40))
+
+    events = segment_array(audio, seg)
+
+    assert [e.kind for e in events] == ["discard"]
+    assert events[0].stats["reason"] == "end_of_input"
+    assert events[0].end_pos == audio.shape[0]
+
+
+def test_cooldown_ignores_audio_right_after_a_segment():
+    seg = make_segmenter()
+    p = seg.params
+    audio, (_, _, silence_at, _, _) = signal(("silence", 32), ("tone", 47), ("silence", 64), ("tone", 47), ("silence", 64))
+
+    events = segment_array(audio, seg)
+
+    assert [e.kind for e in events] == ["end", "end"]
+    assert seg.resume_pos == events[1].end_pos + p["cooldown_samples"]
+    assert events[0].end_pos == silence_at + p["effective_silence_samples"]
+
+
+def test_block_size_does_not_change_the_segmentation():
+    audio, _ = signal(("silence", 32), ("tone", 47), ("silence", 40), ("tone", 30), ("silence", 64))
+
+    def cut(block_chunks):
+        return [(e.kind, e.start_pos, e.end_pos) for e in segment_array(audio, make_segmenter(), block_chunks)]
+
+    assert cut(1) == cut(7) == cut(256)
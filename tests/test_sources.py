@@ -0,0 +1,76 @@
+import threading
+
+import numpy as np
+import pytest
+
+from core.sources import ArrayCapture
+
+SR = 16000
+
+
+def voiced(seconds, f0=120.0):
+    """Harmonic, syllable-modulated buzz: Silero scores it as speech."""
+    t = np.arange(int(seconds * SR)) / SR
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))) / SR
+    x = sum(np.sin(k * phase) / k for k in range(1, 25))
+    return (0.1 * x * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t))).astype(np.float32)
+
+
+def silence(seconds, rng):
+    return (0.001 * rng.standard_normal(int(seconds * SR))).astype(np.float32)
+
+
+def drain(capture, reader, n, out):
+    while True:
+        pos, data = reader.read(n, timeout=2.0)
+        if data is None:
+            break
+        out.append((pos, data.copy()))
+    reader.close()
+
+
+def test_lockstep_readers_never_overrun_a_small_ring():
+    audio = np.arange(5 * SR, dtype=np.float32) / SR
+    capture = ArrayCapture(audio, SR, capacity_s=0.1, tail_s=0.5)  # ring far smaller than the input
+    readers = [capture.reader(0), capture.reader(0)]
+    results = [[], []]
+    threads = [threading.Thread(target=drain, args=(capture, r, n, out)) for r, n, out in zip(readers, (512, 1536), results)]
+    for t in threads:
+        t.start()
+    capture.start()
+    for t in threads:
+        t.join(10)
+
+    assert capture.exhausted
+    expected = np.concatenate([audio, np.zeros(SR // 2, dtype=np.float32)])
+    for reader, out, n in zip(readers, results, (512, 1536)):
+        assert reader.dropped_samples == 0
+        assert [pos for pos, _ in out] == list(range(0, len(out) * n, n))
+        got = np.concatenate([data for _, data in out])
+        np.testing.assert_array_equal(got, expected[:got.shape[0]])
+        assert expected.shape[0] - got.shape[0] < n  # only a partial last read is left over
+    assert capture.overflow_count == 0
+
+
+def test_replay_through_stream_segments_is_reproducible(monkeypatch):
+    pytest.importorskip("onnxruntime")
+    from core.audio import AudioEngine
+    from core.segmenter import segment_array
+    from core.settings import manager as settings
+
+    # Low-power idle after 1 s of quiet, so the batched reads are replayed too.
+    monkeypatch.setitem(settings.settings, "voice_activation_low_power_after_s", 1.0)
+    rng = np.random.default_rng(0)
+    audio = np.concatenate([silence(3.0, rng), voiced(2.0), silence(1.5, rng), voiced(1.5), silence(1.0, rng)])
+    engine = AudioEngine()
+
+    runs = []
+    for _ in range(2):
+        capture = ArrayCapture(audio, SR, capacity_s=30.0)
+        runs.append([(e.kind, e.start_pos, e.end_pos) for e in engine.stream_segments(capture=capture) if e.kind in ("end", "discard")])
+        assert capture.exhausted
+    offline = segment_array(np.concatenate([audio, np.zeros(2 * SR, dtype=np.float32)]), engine.make_segmenter())
+
+    assert [kind for kind, _, _ in runs[0]] == ["end", "end"]
+    assert runs[0] == runs[1]
+    assert runs[0] == [(e.kind, e.start_pos, e.end_pos) for e in offline]
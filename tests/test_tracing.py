@@ -0,0 +1,82 @@
+import json
+import logging
+import threading
+
+import pytest
+
+from core import tracing
+
+
+def make_trace(source, t0, speech_end, decodes, inject, status="ok"):
+    tr = tracing.Trace(source)
+    with tracing.activate(tr):
+        tracing.mark("speech_end", t0 + speech_end)
+        tracing.mark("transcribe_start", t0 + speech_end + 0.010)
+        for i, dur in enumerate(decodes):
+            tracing.mark("decode_pass", t0 + speech_end + 0.020 + i * 0.1, dur_ms=dur, lang="en")
+        tracing.mark("transcribe_end", t0 + speech_end + 0.210)
+        tracing.mark(inject, t0 + speech_end + 0.300)
+    tr.set(status=status)
+    return tr
+
+
+def test_mark_is_a_no_op_without_an_active_trace_and_bind_carries_it():
+    tracing.mark("orphan")  # must not raise
+    tr = tracing.Trace("test")
+    with tracing.activate(tr):
+        worker = threading.Thread(target=tracing.bind(lambda: tracing.mark("decode_pass", dur_ms=5.0)))
+        worker.start()
+        worker.join()
+    assert tracing.current() is None
+    assert [m["ev"] for m in tr.to_dict()["marks"]] == ["decode_pass"]
+
+
+def test_written_traces_load_and_summarize(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    writer = tracing.TraceWriter(str(path))
+    monkeypatch.setattr(tracing, "_writer", writer)
+
+    traces = [
+        make_trace("voice_activation", 100.0, 1.0, [80.0, 60.0], "paste_hotkey"),
+        make_trace("push_to_talk", 200.0, 0.5, [120.0], "typed"),
+        make_trace("voice_activation", 300.0, 0.2, [], "paste_hotkey", status="empty"),
+    ]
+    for tr in traces:
+        tracing.finish(tr, status=tr.fields["status"], lang="en")
+    writer.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert writer.written == 3 and len(lines) == 3
+    first = json.loads(lines[0])
+    assert first["id"] == traces[0].id and first["lang"] == "en" and first["status"] == "ok"
+    marks = first["marks"]
+    assert [m["ev"] for m in marks] == ["speech_end", "transcribe_start", "decode_pass", "decode_pass", "transcribe_end", "paste_hotkey", "done"]
+    assert marks[0]["ms"] == 0.0
+    assert marks[2] == {"ev": "decode_pass", "ms": 20.0, "dur_ms": 80.0, "lang": "en"}
+
+    loaded = tracing.load([str(path), str(tmp_path / "missing.jsonl")], last=2)
+    assert [t["id"] for t in loaded] == [traces[1].id, traces[2].id]
+
+    summary = tracing.summarize(tracing.load([str(path)]))
+    assert summary["traces"] == 3
+    assert summary["status"] == {"ok": 2, "empty": 1}
+    assert summary["source"] == {"voice_activation": 2, "push_to_talk": 1}
+    iv = summary["intervals_ms"]
+    assert iv["transcribe"] == {"n": 3, "p50": 200.0, "p95": 200.0, "max": 200.0}
+    assert iv["speech_end_to_injected"]["n"] == 3  # paste_hotkey and typed both count as injected
+    assert iv["speech_end_to_injected"]["max"] == pytest.approx(300.0)
+    assert summary["decode_pass_ms"] == {"n": 3, "p50": 80.0, "p95": 116.0, "max": 120.0}
+    assert summary["decode_passes_per_utterance"]["n"] == 2
+
+
+def test_closed_writer_detaches_from_the_shared_logger(tmp_path):
+    handlers = list(logging.getLogger("WhisperFlow.traces").handlers)
+    writer = tracing.TraceWriter(str(tmp_path / "a.jsonl"))
+    writer.close()
+    second = tracing.TraceWriter(str(tmp_path / "b.jsonl"))
+    second.write(tracing.Trace("test"))
+    second.close()
+
+    assert (tmp_path / "a.jsonl").read_text() == ""
+    assert len((tmp_path / "b.jsonl").read_text().splitlines()) == 1
+    assert logging.getLogger("WhisperFlow.traces").handlers == handlers
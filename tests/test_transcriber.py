@@ -0,0 +1,132 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import config
+from core.settings import manager as settings
+from core import transcriber as tr
+
+
+def segment(text, avg_logprob):
+    return SimpleNamespace(text=text, no_speech_prob=0.1, avg_logprob=avg_logprob, compression_ratio=1.2)
+
+
+class FakeFeatureExtractor:
+    def __init__(self, model):
+        self.model = model
+        self.sampling_rate = 16000
+
+    def __call__(self, audio, *args, **kwargs):
+        self.model.feature_calls += 1
+        return np.asarray(audio[:160], dtype=np.float32).reshape(1, -1)
+
+
+class FakeWhisper:
+    """Mimics WhisperModel: transcribe() extracts features, then encodes them once per pass."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.feature_extractor = FakeFeatureExtractor(self)
+        self.feature_calls = 0
+        self.encode_calls = 0
+        self.active = 0
+        self.finished_at = {}
+        self._lock = threading.Lock()
+
+    def encode(self, features):
+        self.encode_calls += 1
+        return ("encoded", features.shape)
+
+    def transcribe(self, audio, task="transcribe", language=None, **kwargs):
+        with self._lock:
+            self.active += 1
+        try:
+            self.encode(self.feature_extractor(audio))
+            if language is None:
+                # Ambiguous FR/EN detection, medium confidence: triggers the candidate decodes.
+                info = SimpleNamespace(language="en", language_probability=0.5, all_language_probs=[("en", 0.5), ("fr", 0.45)])
+                return iter([segment("hello there", -0.7)]), info
+            time.sleep(self.delays.get(language, 0.0))
+            info = SimpleNamespace(language=language, language_probability=1.0, all_language_probs=[(language, 1.0)])
+            return iter([segment(f"text {language}", -0.2)]), info
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.finished_at[language] = time.monotonic()
+
+
+@pytest.fixture
+def make_transcriber(monkeypatch):
+    monkeypatch.setattr(config, "WHISPER_FAST_MODEL_SIZE", None)
+    monkeypatch.setitem(settings.settings, "transcription_language", "auto")
+    monkeypatch.setitem(settings.settings, "auto_languages", ["en", "fr"])
+    monkeypatch.setitem(settings.settings, "sticky_language_enabled", False)
+    monkeypatch.setitem(settings.settings, "auto_language_early_exit_on_high", True)
+    monkeypatch.setitem(settings.settings, "auto_language_parallel_decode", True)
+    monkeypatch.setitem(settings.settings, "decode_enable_noisy_second_pass", False)
+    created = []
+
+    def make(model, workers=2):
+        monkeypatch.setattr(config, "WHISPER_NUM_WORKERS", workers)
+        monkeypatch.setattr(tr.Transcriber, "_load_model", lambda self, size: (model, "int8"))
+        t = tr.Transcriber()
+        created.append(t)
+        return t
+
+    yield make
+    for t in created:
+        t._decode_pool.shutdown(wait=True)
+
+
+def test_no_candidate_decode_outlives_transcribe(make_transcriber):
+    # en wins (high) while fr is still decoding on the second worker.
+    model = FakeWhisper({"en": 0.05, "fr": 0.3})
+    t = make_transcriber(model, workers=2)
+
+    text = t.transcribe(np.ones(3 * 16000, dtype=np.float32))
+    returned_at = time.monotonic()
+
+    assert text == "text en"  # first candidate in preference order was high: early exit
+    assert t.last_stats["lang"] == "en"
+    assert model.active == 0
+    assert model.finished_at["fr"] <= returned_at
+    passes = t.last_stats["decode_passes"]
+    time.sleep(0.1)
+    assert t._decode_passes == passes  # nothing late lands in the counters
+
+
+def test_encoder_output_is_reused_across_candidate_decodes_and_cleared(make_transcriber):
+    model = FakeWhisper()
+    t = make_transcriber(model, workers=1)
+    audio = np.ones(3 * 16000, dtype=np.float32)
+
+    t.transcribe(audio)
+
+    # Base pass + candidate passes all share one feature/encoder computation.
+    assert t.last_stats["decode_passes"] >= 3
+    assert t.last_stats["encoder_cache_misses"] == 1
+    assert t.last_stats["encoder_cache_hits"] == t.last_stats["decode_passes"] - 1
+    assert model.feature_calls == 1
+    cache = t._encoder_cache
+    assert not cache._active and cache._features == {} and cache._encoded == {}
+
+    # Outside an utterance the patched attributes pass straight through.
+    model.encode(model.feature_extractor(audio))
+    assert cache.hits + cache.misses == t.last_stats["decode_passes"]
+
+
+def test_missing_internals_fall_back_to_uncached_decoding():
+    class Bare:
+        def transcribe(self, *args, **kwargs):
+            raise AssertionError("not called")
+
+    model = Bare()
+    cache = tr._EncoderCache(model)
+
+    assert not cache.enabled
+    assert not hasattr(model, "encode")
+    with cache.utterance(np.zeros(4, dtype=np.float32)):
+        assert not cache._active
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.vad import VadRuntime, VadService
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_concurrently(service, streams, chunks_per_stream):
+    """One thread per stream, all submitting their n-th chunk together; returns probs or errors."""
+    barrier = threading.Barrier(len(streams))
+    results = [[] for _ in streams]
+
+    def worker(i):
+        for chunk in chunks_per_stream[i]:
+            barrier.wait()
+            try:
+                results[i].append(service.infer(streams[i], chunk))
+            except Exception as e:
+                results[i].append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(streams))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_batched_leader_and_followers_match_per_stream_inference():
+    pytest.importorskip("onnxruntime")
+    from core.vad import create_vad_session, open_vad_runtime
+
+    runtime = open_vad_runtime(create_vad_session(os.path.join(ROOT, "silero_vad.onnx"), optimize=False), 16000)
+    rng = np.random.default_rng(0)
+    n_streams, n_chunks = 4, 12
+    t = np.arange(512 * n_chunks) / 16000.0
+    audio = [
+        (0.2 * np.sin(2 * np.pi * (150 + 60 * i) * t) * (i % 2) + rng.normal(0, 0.01, t.shape)).astype(np.float32).reshape(n_chunks, 512)
+        for i in range(n_streams)
+    ]
+
+    reference = []
+    for x in audio:
+        state = runtime.new_state()
+        reference.append([runtime.run_one(chunk, state) for chunk in x])
+
+    service = VadService(runtime, 16000, max_batch=8, max_wait_ms=5)
+    streams = [service.new_stream(f"s{i}") for i in range(n_streams)]
+    results = run_concurrently(service, streams, audio)
+
+    assert service.max_batch_seen > 1
+    np.testing.assert_allclose(np.array(results), np.array(reference), atol=1e-4)
+    assert [s.chunks for s in streams] == [n_chunks] * n_streams
+
+
+class FailingRuntime(VadRuntime):
+    def __init__(self):
+        self.session = None
+        self.calls = 0
+
+    def new_state(self):
+        return [np.zeros(1, dtype=np.float32)]
+
+    def run_one(self, chunk, state):
+        return self.run(chunk.reshape(1, -1), [state])[0]
+
+    def run(self, chunks, states):
+        self.calls += 1
+        time.sleep(0.02)
+        raise RuntimeError("ORT failure")
+
+
+def test_inference_error_reaches_every_waiter():
+    service = VadService(FailingRuntime(), 16000, max_batch=8, max_wait_ms=5)
+    streams = [service.new_stream(f"s{i}") for i in range(4)]
+    chunk = np.zeros(512, dtype=np.float32)
+
+    results = run_concurrently(service, streams, [[chunk, chunk]] * 4)
+
+    for per_stream in results:
+        assert len(per_stream) == 2
+        assert all(isinstance(r, RuntimeError) and str(r) == "ORT failure" for r in per_stream)
+    assert not service._pending and not service._busy
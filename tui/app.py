@@ -26,7 +26,7 @@ class StatusWidget(Static):
         if status == "LISTENING":
             self.styles.border = ("solid", "red")
             self.styles.color = "red"
-        elif status == "PROCESSING":
+        elif status in ("PROCESSING", "LOADING"):
             self.styles.border = ("solid", "cyan")
             self.styles.color = "cyan"
         elif status == "SUCCESS":
@@ -99,10 +99,15 @@ class WhisperTui(App):
     def _init_controller(self):
         try:
             self.controller = CoreController(ui_callback=self.update_state)
-            self.matrix.audio_engine = self.controller.audio
             self.controller.start_pipeline()
+            self.controller.startup.audio_ready.wait()
+            self.matrix.audio_engine = self.controller.audio
+            if not self.controller.wait_ready():
+                self.call_from_thread(self.log_widget.write_line, f"CRITICAL ERROR: {self.controller.startup.error}")
+                return
+            for line in self.controller.startup.format_timeline().splitlines():
+                self.call_from_thread(self.log_widget.write_line, line)
             self.call_from_thread(self.log_widget.write_line, "SYSTEM ONLINE.")
-            self.call_from_thread(self.update_state, "IDLE")
         except Exception as e:
             self.call_from_thread(self.log_widget.write_line, f"CRITICAL ERROR: {e}")
 
@@ -48,6 +48,11 @@ class OverlayBaseWidget(QWidget):
                 self.timer.setInterval(33)
 
     def set_state(self, state):
+        # Startup states reuse existing visuals: loading looks busy, ready is idle.
+        if state == "LOADING":
+            state = "PROCESSING"
+        elif state == "READY":
+            state = "IDLE"
         self.state = state
         if state != "IDLE":
              self._wake_from_eco()
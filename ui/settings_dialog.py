@@ -161,6 +161,10 @@ class SettingsDialog(QDialog):
         box_ptt.addWidget(self.key_bind_btn)
         layout.addLayout(box_ptt)
 
+        self.cb_ptt_hold = QCheckBox("Hold to talk (release to transcribe)")
+        self.cb_ptt_hold.setChecked(bool(manager.get("push_to_talk_hold")))
+        layout.addWidget(self.cb_ptt_hold)
+
         # --- AI Toggle ---
         self.cb_intelligence = QCheckBox("Enable AI Grammar (Mistral)")
         self.cb_intelligence.setChecked(manager.get("use_intelligence"))
@@ -209,6 +213,7 @@ class SettingsDialog(QDialog):
                 manager.set("mode", "voice_activation")
                 
             manager.set("push_to_talk_key", self.key_bind_btn.current_key)
+            manager.set("push_to_talk_hold", self.cb_ptt_hold.isChecked())
             manager.set("use_intelligence", self.cb_intelligence.isChecked())
             manager.set("setup_completed", True)
             
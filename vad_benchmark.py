@@ -0,0 +1,293 @@
+"""
+LocalWhisper VAD Benchmark
+Replays a corpus through the voice-activation segmenter once per VAD model and idle
+schedule and compares CPU cost and segmentation accuracy. No Whisper model is loaded.
+
+Corpus layout: as benchmark.py (.wav/.flac files). Reference speech for a file goes in
+<name>.segments.txt next to it, one interval per line in Audacity label format
+("start<TAB>end[<TAB>label]", seconds). Files without one are scored against the segments
+of the first model given (agreement, not accuracy).
+
+Run:
+  python vad_benchmark.py path/to/corpus
+  python vad_benchmark.py path/to/corpus --model v4 --model v5 --out vad_results.json
+  python vad_benchmark.py path/to/corpus --model v4 --model models/my_silero.onnx
+  python vad_benchmark.py path/to/corpus --model v4 --schedule 1:512 --schedule 2:1024 --schedule 3:1536
+
+A schedule is STRIDE:WINDOW (settings vad_idle_stride / vad_idle_window): while disarmed,
+VAD runs on every STRIDE-th loud chunk over the last WINDOW samples. The first config is
+the reference when there are no labels, so list the full-rate 1:512 schedule first.
+
+Accuracy is frame-level (10 ms) precision/recall of "inside a segment", plus missed and
+false segments. Segments include pre-roll and hangover, so precision against tight labels
+is below 1 even for a perfect detector; compare models with each other, not with 1.0.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import config
+from core.settings import manager as settings
+from benchmark import AUDIO_EXTENSIONS, SETTINGS_PREFIXES, load_audio, load_corpus
+
+FRAME_S = 0.01
+
+
+# --- References ---
+
+def load_reference_segments(audio_path: str) -> list | None:
+    path = os.path.splitext(audio_path)[0] + ".segments.txt"
+    if not os.path.exists(path):
+        return None
+    segments = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split("\t") if "\t" in line else line.split()
+            if len(parts) >= 2:
+                try:
+                    segments.append((float(parts[0]), float(parts[1])))
+                except ValueError:
+                    continue
+    return sorted(segments)
+
+
+# --- Scoring ---
+
+def _mask(segments: list, duration_s: float) -> np.ndarray:
+    mask = np.zeros(int(np.ceil(duration_s / FRAME_S)) + 1, dtype=bool)
+    for start, end in segments:
+        mask[int(start / FRAME_S):int(np.ceil(end / FRAME_S))] = True
+    return mask
+
+
+def _overlaps(a: tuple, b: tuple) -> float:
+    return max(0.0, min(a[1], b[1]) - max(a[0], b[0]))
+
+
+def score_segments(reference: list, hypothesis: list, duration_s: float) -> dict:
+    """Frame counts (tp/fp/fn) and segment matching of hypothesis intervals against reference intervals."""
+    ref, hyp = _mask(reference, duration_s), _mask(hypothesis, duration_s)
+    start_err, end_err = [], []
+    missed = 0
+    for r in reference:
+        best = max(hypothesis, key=lambda h: _overlaps(r, h), default=None)
+        if best is None or _overlaps(r, best) <= 0:
+            missed += 1
+            continue
+        start_err.append(abs(best[0] - r[0]) * 1000.0)
+        end_err.append(abs(best[1] - r[1]) * 1000.0)
+    false = sum(1 for h in hypothesis if not any(_overlaps(h, r) > 0 for r in reference))
+    return {
+        "tp": int(np.sum(ref & hyp)),
+        "fp": int(np.sum(~ref & hyp)),
+        "fn": int(np.sum(ref & ~hyp)),
+        "ref_segments": len(reference),
+        "missed": missed,
+        "false": false,
+        "start_err_ms": start_err,
+        "end_err_ms": end_err,
+    }
+
+
+def accuracy(scores: list) -> dict:
+    if not scores:
+        return {"files": 0}
+    tp, fp, fn = (sum(s[k] for s in scores) for k in ("tp", "fp", "fn"))
+    # Undefined (None) when nothing was labelled / detected, e.g. a silence-only corpus.
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    start_err = [e for s in scores for e in s["start_err_ms"]]
+    end_err = [e for s in scores for e in s["end_err_ms"]]
+    return {
+        "files": len(scores),
+        "precision": round(precision, 4) if precision is not None else None,
+        "recall": round(recall, 4) if recall is not None else None,
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision and recall else None,
+        "ref_segments": sum(s["ref_segments"] for s in scores),
+        "missed": sum(s["missed"] for s in scores),
+        "false": sum(s["false"] for s in scores),
+        "start_err_ms": round(float(np.mean(start_err)), 1) if start_err else None,
+        "end_err_ms": round(float(np.mean(end_err)), 1) if end_err else None,
+    }
+
+
+# --- Replay ---
+
+class VadConfig:
+    """One VAD variant under test (model + idle schedule): its own runtime, service and segmenter."""
+
+    def __init__(self, model: str, threads: int = 1, stride: int = 1, window: int = 512):
+        from core.segmenter import VoiceSegmenter, load_gate_params
+        from core.vad import VadService, load_vad_runtime
+
+        self.model = model
+        self.sample_rate = config.SAMPLE_RATE
+        self.chunk_size = 512
+        self.runtime = load_vad_runtime(model, config.BASE_DIR, self.sample_rate, self.chunk_size, threads=threads)
+        if window not in self.runtime.chunk_sizes:
+            raise ValueError(f"window {window} not supported by Silero {self.runtime.version} (supported: {self.runtime.chunk_sizes})")
+        self.stride, self.window = int(stride), int(window)
+        self.label = f"{model} ({self.runtime.version})" if self.runtime.version != model else model
+        if (self.stride, self.window) != (1, self.chunk_size):
+            self.label += f" s{self.stride}/w{self.window}"
+        self.service = VadService(self.runtime, self.sample_rate)
+
+        def vad(chunk, stream):
+            return self.service.infer(stream, chunk), stream
+
+        def vad_reset():
+            return self.service.new_stream("bench")
+
+        params = load_gate_params(self.sample_rate, self.chunk_size)
+        params["vad_idle_stride"] = self.stride
+        params["vad_idle_window"] = self.window
+        self._make = lambda: VoiceSegmenter(params, vad, vad_reset, self.sample_rate, self.chunk_size)
+
+    def run(self, audio: np.ndarray) -> dict:
+        from core.segmenter import segment_array
+
+        seg = self._make()
+        self.runtime.run_one(np.zeros(self.chunk_size, dtype=np.float32), self.runtime.new_state())  # warm
+        run_s0 = self.service.run_s
+        cpu0, wall0 = time.thread_time(), time.perf_counter()
+        events = segment_array(audio, seg)
+        cpu, wall = time.thread_time() - cpu0, time.perf_counter() - wall0
+        sr = float(self.sample_rate)
+        return {
+            "segments": [(round(e.start_pos / sr, 3), round(e.end_pos / sr, 3)) for e in events if e.kind == "end"],
+            "discarded": sum(1 for e in events if e.kind == "discard"),
+            "cpu_s": cpu,
+            "wall_s": wall,
+            "vad_s": self.service.run_s - run_s0,
+            "vad_calls": seg.vad_calls,
+            "chunks": seg.chunks_seen,
+        }
+
+
+def summarize(c: VadConfig, runs: list, scores: list, audio_s: float) -> dict:
+    cpu = sum(r["cpu_s"] for r in runs)
+    wall = sum(r["wall_s"] for r in runs)
+    vad_s = sum(r["vad_s"] for r in runs)
+    calls = sum(r["vad_calls"] for r in runs)
+    chunks = sum(r["chunks"] for r in runs)
+    return {
+        "config": c.label,
+        "model": c.model,
+        "vad_version": c.runtime.version,
+        "vad_idle_stride": c.stride,
+        "vad_idle_window": c.window,
+        "segments": sum(len(r["segments"]) for r in runs),
+        "discarded": sum(r["discarded"] for r in runs),
+        # Steady-state cost of voice activation: CPU time per second of audio, in % of one core.
+        "cpu_pct": round(100.0 * cpu / audio_s, 3) if audio_s else None,
+        "x_realtime": round(audio_s / wall, 1) if wall else None,
+        "vad_ms_per_call": round(1000.0 * vad_s / calls, 4) if calls else None,
+        "vad_call_ratio": round(calls / chunks, 4) if chunks else None,
+        "accuracy": accuracy(scores),
+    }
+
+
+def print_summary(rows: list, reference_kind: str):
+    print("\n" + "=" * 60)
+    print(f"VAD BENCHMARK SUMMARY (scored against {reference_kind})")
+    print("=" * 60)
+    print("\n| Config | CPU % | x realtime | ms/VAD call | VAD calls/chunk | Precision | Recall | F1 | Missed | False | Start err ms | End err ms |")
+    print("|--------|-------|------------|-------------|-----------------|-----------|--------|----|--------|-------|--------------|------------|")
+    for r in rows:
+        a = {k: "n/a" if v is None else v for k, v in r["accuracy"].items()}
+        acc = (
+            f"{a['precision']} | {a['recall']} | {a['f1']} | {a['missed']}/{a['ref_segments']} | {a['false']} | {a['start_err_ms']} | {a['end_err_ms']}"
+            if a.get("files") else "n/a | n/a | n/a | n/a | n/a | n/a | n/a"
+        )
+        print(f"| {r['config']} | {r['cpu_pct']} | {r['x_realtime']} | {r['vad_ms_per_call']} | {r['vad_call_ratio']} | {acc} |")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare VAD models and idle schedules on a replay corpus (CPU cost and segmentation accuracy).")
+    parser.add_argument("corpus", help="Directory of .wav/.flac files, optionally with <name>.segments.txt references")
+    parser.add_argument("--model", action="append", help="v4, v5 or a path to a Silero .onnx (repeatable; default: v4 and v5)")
+    parser.add_argument("--schedule", action="append", help="Idle VAD schedule STRIDE:WINDOW, e.g. 3:1536 (repeatable; default 1:512)")
+    parser.add_argument("--threads", type=int, default=1, help="ONNX Runtime threads per VAD session")
+    parser.add_argument("--out", help="JSON output path (default: vad_benchmark_<timestamp>.json)")
+    parser.add_argument("--limit", type=int, help="Only the first N files")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus, args.limit)
+    if not corpus:
+        print(f"No {'/'.join(AUDIO_EXTENSIONS)} files under {args.corpus}")
+        return 2
+
+    configs = []
+    for model in args.model or ["v4", "v5"]:
+        for schedule in args.schedule or ["1:512"]:
+            try:
+                stride, window = (int(v) for v in schedule.split(":"))
+                configs.append(VadConfig(model, threads=args.threads, stride=stride, window=window))
+            except Exception as e:
+                print(f"Skipping {model} {schedule}: {e}")
+    if not configs:
+        return 2
+
+    print("=" * 60)
+    print("LocalWhisper VAD Benchmark")
+    print("=" * 60)
+    print(f"Corpus: {args.corpus} ({len(corpus)} files)")
+    print(f"Configs: {', '.join(c.label for c in configs)}")
+
+    runs = {c.label: [] for c in configs}
+    scores = {c.label: [] for c in configs}
+    files = []
+    audio_s = 0.0
+    labelled = 0
+    for i, item in enumerate(corpus, 1):
+        audio = load_audio(item["path"])
+        duration = len(audio) / float(config.SAMPLE_RATE)
+        audio_s += duration
+        reference = load_reference_segments(item["path"])
+        labelled += reference is not None
+        entry = {"file": item["name"], "duration_s": round(duration, 3), "reference": reference, "configs": {}}
+        results = [c.run(audio) for c in configs]
+        ref = reference if reference is not None else results[0]["segments"]
+        for k, (c, r) in enumerate(zip(configs, results)):
+            runs[c.label].append(r)
+            if reference is not None or k > 0:
+                scores[c.label].append(score_segments(ref, r["segments"], duration))
+            entry["configs"][c.label] = {key: v for key, v in r.items() if key != "chunks"}
+        files.append(entry)
+        print(f"[{i}/{len(corpus)}] {item['name']}: " + ", ".join(f"{c.label} {len(runs[c.label][-1]['segments'])} seg" for c in configs))
+
+    rows = [summarize(c, runs[c.label], scores[c.label], audio_s) for c in configs]
+    if labelled == len(corpus):
+        reference_kind = "reference labels"
+    elif labelled:
+        reference_kind = f"reference labels ({labelled} files) / {configs[0].label} (the rest)"
+    else:
+        reference_kind = f"{configs[0].label} (no labels found: agreement only)"
+    print_summary(rows, reference_kind)
+
+    out = args.out or f"vad_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "corpus": os.path.abspath(args.corpus),
+        "audio_s": round(audio_s, 3),
+        "reference": reference_kind,
+        "threads": args.threads,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in sorted(settings.settings.items()) if k.startswith(SETTINGS_PREFIXES)},
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "summary": rows, "files": files}, f, indent=2, ensure_ascii=False)
+    print(f"\nResults saved to: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())